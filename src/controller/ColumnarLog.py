@@ -0,0 +1,398 @@
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from controller.NdjsonWriter import BufferedNdjsonWriter
+
+# --- Formato binário colunar (.ocol) ---
+#
+# Arquivo = MAGIC + sequência de blocos "<cI" (tipo, tamanho do payload) + payload:
+#
+#   b"T"  Tabela de tags (dicionário): JSON [[tag_id, node_id, nome, data_type], ...].
+#         Só as tags novas desde o último bloco "T" são gravadas.
+#   b"C"  Chunk de dados: "<qqH" (t_min_us, t_max_us, n_series) e, por série:
+#         "<IIBBq" (tag_id, count, codigo_valor, codigo_delta, primeiro_ts_us),
+#         os (count - 1) deltas de timestamp e os count valores como array tipado.
+#
+# Timestamps são inteiros em µs desde a época Unix. O leitor só lê os
+# cabeçalhos dos blocos para montar o índice e pula os chunks fora do
+# intervalo pedido; os arrays são views (np.frombuffer) sobre o arquivo mapeado.
+
+MAGIC = b"OPCUACOL\x01"
+BLOCK_HEADER = struct.Struct("<cI")
+CHUNK_HEADER = struct.Struct("<qqH")
+SERIES_HEADER = struct.Struct("<IIBBq")
+
+# Códigos dos arrays de valores
+VALUE_DTYPES = {0: np.dtype("u1"), 1: np.dtype("<i4"), 2: np.dtype("<i8"), 3: np.dtype("<f4"), 4: np.dtype("<f8")}
+VALUE_JSON = 5
+DATA_TYPE_CODES = {
+    "Boolean": 0,
+    "SByte": 1, "Byte": 1, "Int16": 1, "UInt16": 1, "Int32": 1,
+    "UInt32": 2, "Int64": 2,
+    "Float": 3,
+    "Double": 4,
+}
+
+# Códigos da largura dos deltas de timestamp
+DELTA_DTYPES = {1: np.dtype("<u2"), 2: np.dtype("<u4"), 3: np.dtype("<i8")}
+
+
+def _to_us(timestamp: Any, naive_utc: bool = False) -> int:
+    """
+    Converte epoch (s), ISO 8601 ou datetime para µs desde a época Unix.
+    Datetimes sem fuso são hora local, exceto com naive_utc=True (os
+    timestamps OPC UA do python-opcua são UTC sem tzinfo).
+    """
+    if isinstance(timestamp, (int, float)):
+        return int(round(timestamp * 1_000_000))
+    if isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    if naive_utc and timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return int(round(timestamp.timestamp() * 1_000_000))
+
+
+class LogSample(NamedTuple):
+    """ Uma amostra normalizada, independente do formato NDJSON de origem. """
+    node_id: str
+    name: str
+    data_type: str
+    timestamp_us: int
+    value: Any
+
+
+def samples_from_record(record: Dict[str, Any]) -> Iterator[LogSample]:
+    """
+    Normaliza um registro NDJSON em amostras. Aceita os três formatos do projeto:
+      - SubHandler: node_id, valor_atual, data_type, timestamp_servidor / timestamp_local_processamento;
+      - log de polling: timestamp_utc, node_id, value, display_name, data_type;
+      - snapshot largo da assinatura: timestamp_local + uma coluna por tag.
+    """
+    if "valor_atual" in record:
+        if record.get("timestamp_servidor"):
+            ts = _to_us(record["timestamp_servidor"], naive_utc=True)
+        else:
+            ts = _to_us(record["timestamp_local_processamento"])
+        node_id = record["node_id"]
+        yield LogSample(node_id, record.get("display_name") or _tag_name(node_id), record.get("data_type", ""), ts, record["valor_atual"])
+    elif "timestamp_utc" in record:
+        node_id = record["node_id"]
+        yield LogSample(node_id, record.get("display_name") or _tag_name(node_id), record.get("data_type", ""), _to_us(record["timestamp_utc"], naive_utc=True), record["value"])
+    elif "timestamp_local" in record:
+        ts = _to_us(record["timestamp_local"])
+        for name, value in record.items():
+            if name != "timestamp_local":
+                yield LogSample(name, name, _guess_data_type(value), ts, value)
+    else:
+        raise ValueError(f"Formato de registro desconhecido: {sorted(record)}")
+
+
+def _tag_name(node_id: str) -> str:
+    """ Nome curto da tag a partir de um NodeId string ("ns=2;s=Raiz.Pasta.Tag" -> "Tag"). """
+    return node_id.rsplit(";s=", 1)[-1].rsplit(".", 1)[-1]
+
+
+def _guess_data_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "Boolean"
+    if isinstance(value, int):
+        return "Int64"
+    if isinstance(value, float):
+        return "Double"
+    return "String"
+
+
+def _encode_series(tag_id: int, data_type: str, timestamps: List[int], values: List[Any]) -> bytes:
+    order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+    ts = np.array([timestamps[i] for i in order], dtype=np.int64)
+    ordered_values = [values[i] for i in order]
+
+    deltas = np.diff(ts)
+    if not len(deltas) or deltas.max() < 1 << 16:
+        delta_code = 1
+    elif deltas.max() < 1 << 32:
+        delta_code = 2
+    else:
+        delta_code = 3
+
+    value_code = DATA_TYPE_CODES.get(data_type, VALUE_JSON)
+    value_bytes = None
+    if value_code != VALUE_JSON:
+        # Valores fora do tipo declarado (None, string, float num inteiro, inteiro fora da faixa) vão como JSON
+        allowed = (bool, int) if value_code <= 2 else (bool, int, float)
+        if all(isinstance(v, allowed) for v in ordered_values):
+            try:
+                value_bytes = np.asarray(ordered_values, dtype=VALUE_DTYPES[value_code]).tobytes()
+            except (OverflowError, ValueError, TypeError):
+                pass
+        if value_bytes is None:
+            value_code = VALUE_JSON
+    if value_code == VALUE_JSON:
+        payload = json.dumps(ordered_values, default=str).encode("utf-8")
+        value_bytes = struct.pack("<I", len(payload)) + payload
+
+    header = SERIES_HEADER.pack(tag_id, len(ts), value_code, delta_code, int(ts[0]))
+    return header + deltas.astype(DELTA_DTYPES[delta_code]).tobytes() + value_bytes
+
+
+class ColumnarLogWriter(BufferedNdjsonWriter):
+    """
+    Variante colunar do BufferedNdjsonWriter, com a mesma interface de produtor
+    (write(registro), close()) e a mesma fila/thread de fundo: cada lote drenado
+    da fila vira um chunk com um array tipado de valores e um array de deltas
+    de timestamp por tag. Os nomes de tag só são gravados uma vez, na tabela.
+    """
+    accepts_lines = False  # Precisa dos registros como dict (samples_from_record)
+
+    def __init__(self, path: str, batch_size: int = 4096, flush_interval_s: float = 1.0, **kwargs):
+        self._tag_ids: Dict[str, int] = {}
+        self._pending_tags: List[list] = []
+        super().__init__(path, batch_size=batch_size, flush_interval_s=flush_interval_s, **kwargs)
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        if not is_new:
+            # Continua um arquivo existente: recupera a tabela de tags já gravada
+            reader = ColumnarLogReader(self.path)
+            self._tag_ids = {tag.node_id: tag.tag_id for tag in reader.tags}
+            reader.close()
+        else:
+            self._tag_ids = {}
+        self._file = open(self.path, "ab")
+        if is_new:
+            self._file.write(MAGIC)
+        # Após abrir/rotacionar um arquivo novo, todas as tags conhecidas precisam ser regravadas
+        self._pending_tags = []
+
+    def _tag_id(self, sample: LogSample) -> int:
+        tag_id = self._tag_ids.get(sample.node_id)
+        if tag_id is None:
+            tag_id = self._tag_ids[sample.node_id] = len(self._tag_ids)
+            self._pending_tags.append([tag_id, sample.node_id, sample.name, sample.data_type])
+        return tag_id
+
+    def encode_chunk(self, samples: Iterable[LogSample]) -> bytes:
+        """
+        Codifica amostras como bloco(s) binário(s): tags novas (se houver) + um
+        chunk. As tags novas continuam pendentes até o bloco ser gravado (ver
+        _write_batch): se a gravação falhar, elas vão no próximo bloco "T".
+        """
+        series: Dict[int, Tuple[str, List[int], List[Any]]] = {}
+        for sample in samples:
+            entry = series.get(self._tag_id(sample))
+            if entry is None:
+                entry = series[self._tag_ids[sample.node_id]] = (sample.data_type, [], [])
+            entry[1].append(sample.timestamp_us)
+            entry[2].append(sample.value)
+        if not series:
+            return b""
+
+        out = []
+        if self._pending_tags:
+            payload = json.dumps(self._pending_tags).encode("utf-8")
+            out.append(BLOCK_HEADER.pack(b"T", len(payload)) + payload)
+
+        t_min = min(min(entry[1]) for entry in series.values())
+        t_max = max(max(entry[1]) for entry in series.values())
+        body = [CHUNK_HEADER.pack(t_min, t_max, len(series))]
+        for tag_id, (data_type, timestamps, values) in series.items():
+            body.append(_encode_series(tag_id, data_type, timestamps, values))
+        payload = b"".join(body)
+        out.append(BLOCK_HEADER.pack(b"C", len(payload)) + payload)
+        return b"".join(out)
+
+    def _write_batch(self, batch):
+        try:
+            if self._file is None:
+                self._open()
+            samples = [sample for record in batch for sample in samples_from_record(record)]
+            self._file.write(self.encode_chunk(samples))
+            self._file.flush()
+            self._pending_tags = []
+
+            if self.fsync == "flush":
+                os.fsync(self._file.fileno())
+
+            self.written += len(batch)
+            self.batches += 1
+
+            if self.rotate_bytes and self._file.tell() >= self.rotate_bytes:
+                self._rotate()
+        except Exception as e:
+            self.errors += 1
+            print(f"🚨 ERRO ao escrever no arquivo de log colunar: {e}")
+
+
+class TagInfo(NamedTuple):
+    tag_id: int
+    node_id: str
+    name: str
+    data_type: str
+
+
+class ChunkInfo(NamedTuple):
+    offset: int      # Início do payload do chunk no arquivo
+    t_min: int
+    t_max: int
+    n_series: int
+
+
+class ColumnarLogReader(object):
+    """
+    Leitor do formato colunar. Ao abrir, percorre apenas os cabeçalhos dos
+    blocos (montando a tabela de tags e o índice de chunks por tempo); a
+    leitura de um intervalo decodifica só os chunks que o intersectam, sem
+    nenhum parse de JSON para os valores numéricos.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if bytes(self._mmap[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"{path} não é um log colunar (.ocol).")
+
+        self.tags: List[TagInfo] = []
+        self.chunks: List[ChunkInfo] = []
+        position = len(MAGIC)
+        while position + BLOCK_HEADER.size <= size:
+            kind, length = BLOCK_HEADER.unpack_from(self._mmap, position)
+            payload = position + BLOCK_HEADER.size
+            if payload + length > size:
+                break  # Bloco incompleto (escrita interrompida)
+            if kind == b"T":
+                self.tags.extend(TagInfo(*entry) for entry in json.loads(bytes(self._mmap[payload:payload + length])))
+            elif kind == b"C":
+                t_min, t_max, n_series = CHUNK_HEADER.unpack_from(self._mmap, payload)
+                self.chunks.append(ChunkInfo(payload, t_min, t_max, n_series))
+            position = payload + length
+
+        self._by_id = {}
+        self._by_key = {}
+        for tag in self.tags:
+            self._by_id[tag.tag_id] = tag
+            self._by_key[tag.node_id] = tag
+            self._by_key.setdefault(tag.name, tag)
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _decode_chunk(self, chunk: ChunkInfo, wanted: Optional[set]):
+        position = chunk.offset + CHUNK_HEADER.size
+        for _ in range(chunk.n_series):
+            tag_id, count, value_code, delta_code, first_ts = SERIES_HEADER.unpack_from(self._mmap, position)
+            position += SERIES_HEADER.size
+
+            delta_dtype = DELTA_DTYPES[delta_code]
+            deltas_at = position
+            position += (count - 1) * delta_dtype.itemsize
+            if value_code == VALUE_JSON:
+                (length,) = struct.unpack_from("<I", self._mmap, position)
+                values_at, position = position + 4, position + 4 + length
+            else:
+                values_at = position
+                position += count * VALUE_DTYPES[value_code].itemsize
+
+            if wanted is not None and tag_id not in wanted:
+                continue
+
+            ts = np.empty(count, dtype=np.int64)
+            ts[0] = first_ts
+            if count > 1:
+                np.cumsum(np.frombuffer(self._mmap, dtype=delta_dtype, count=count - 1, offset=deltas_at), out=ts[1:])
+                ts[1:] += first_ts
+            if value_code == VALUE_JSON:
+                values = np.array(json.loads(bytes(self._mmap[values_at:position])), dtype=object)
+            else:
+                values = np.frombuffer(self._mmap, dtype=VALUE_DTYPES[value_code], count=count, offset=values_at)
+                if value_code == 0:
+                    values = values.view(np.bool_)
+            yield tag_id, ts, values
+
+    def read_range(self, t0: Any = None, t1: Any = None, tags: Optional[Sequence[str]] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Carrega as amostras com t0 <= timestamp <= t1.
+
+        :param t0: Início (epoch em s, ISO 8601 ou datetime); None = desde o início.
+                   ISO e datetime sem fuso são UTC, como o timestamp_servidor
+                   das amostras (use "+00:00", "-03:00"... para outro fuso).
+        :param t1: Fim (idem); None = até o fim.
+        :param tags: NodeIds ou nomes das tags; None = todas.
+        :return: {node_id: (timestamps_us int64, valores)} ordenados por tempo.
+        """
+        t0_us = None if t0 is None else _to_us(t0, naive_utc=True)
+        t1_us = None if t1 is None else _to_us(t1, naive_utc=True)
+        wanted = None
+        if tags is not None:
+            wanted = {self._by_key[key].tag_id for key in tags if key in self._by_key}
+
+        parts: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        for chunk in self.chunks:
+            if (t0_us is not None and chunk.t_max < t0_us) or (t1_us is not None and chunk.t_min > t1_us):
+                continue
+            for tag_id, ts, values in self._decode_chunk(chunk, wanted):
+                mask = None
+                if t0_us is not None and ts[0] < t0_us:
+                    mask = ts >= t0_us
+                if t1_us is not None and ts[-1] > t1_us:
+                    mask = (ts <= t1_us) if mask is None else mask & (ts <= t1_us)
+                if mask is not None:
+                    ts, values = ts[mask], values[mask]
+                if len(ts):
+                    parts.setdefault(tag_id, []).append((ts, values))
+
+        result = {}
+        for tag_id, pieces in parts.items():
+            tag = self._by_id.get(tag_id)
+            if tag is None:
+                continue  # Série de uma tag sem bloco "T" (arquivo gravado por uma versão com perda de tabela)
+            if len(pieces) == 1:
+                ts, values = pieces[0]
+            else:
+                ts = np.concatenate([p[0] for p in pieces])
+                values = np.concatenate([p[1] for p in pieces])
+                order = np.argsort(ts, kind="stable")
+                ts, values = ts[order], values[order]
+            result[tag.node_id] = (ts, values)
+        return result
+
+
+def convert_ndjson(source: str, target: str, chunk_rows: int = 4096) -> int:
+    """ Converte um log NDJSON (qualquer um dos formatos do projeto) para o formato colunar. """
+    writer = ColumnarLogWriter(target, batch_size=chunk_rows, block=True)
+    count = 0
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                writer.write(json.loads(line))
+                count += 1
+    writer.close(timeout=None)
+    return count
+
+
+if __name__ == "__main__":
+    # Uso: python -m controller.ColumnarLog <entrada.ndjson> <saida.ocol>
+    if len(sys.argv) != 3:
+        print("Uso: python -m controller.ColumnarLog <entrada.ndjson> <saida.ocol>")
+        sys.exit(1)
+    rows = convert_ndjson(sys.argv[1], sys.argv[2])
+    print(f"✅ {rows} registros convertidos: {os.path.getsize(sys.argv[1])} -> {os.path.getsize(sys.argv[2])} bytes")
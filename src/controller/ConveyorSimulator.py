@@ -0,0 +1,369 @@
+import argparse
+import heapq
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+from controller.EmitterController import BoxCompetitor
+from controller.PLCEmulator import OUTPUT_FOLDERS, ScanEngine, process_image
+from controller.TagTable import load_tag_table
+
+# Simulador de eventos discretos da planta (o que hoje o Factory I/O faz):
+# peças saindo do Emitter 0, percorrendo a Belt_Conveyor_6m_0, passando pelos
+# sensores difusos e pelo pistão, e os pulsos A/B do encoder da esteira.
+#
+# O tempo avança de evento em evento (heap por instante simulado, em ms). As
+# posições das peças são marcos na distância percorrida pela esteira
+# (odômetro): com a esteira parada nada é agendado, e ao religar os marcos
+# voltam a ser convertidos em instantes.
+
+# --- Geometria e temporização da linha ---
+BELT_LENGTH_M = 6.0             # Belt_Conveyor_6m_0
+BELT_SPEED_M_S = 0.5            # Velocidade da esteira
+SENSOR_POS_M = 2.0              # Diffuse_Sensor_0 (presença) e Diffuse_Sensor_1 (altura)
+PUSHER_POS_M = 2.0              # Pusher_0 (início da zona do pistão; aqui coincide com a inspeção)
+PUSHER_TRAVEL_MS = 300          # Curso entre Pusher_0_Back_Limit e Pusher_0_Front_Limit
+EMIT_INTERVAL_MS = 3000         # Intervalo entre peças com Emitter_0_Emit ligado
+ENCODER_PULSES_PER_M = 10       # Pulsos por metro em cada canal (0 desliga o encoder)
+TALL_PART_HEIGHT_M = 0.25       # Altura mínima para o Diffuse_Sensor_1 (peça aprovada)
+
+# Comprimento e altura (m) de cada tipo de peça do BoxCompetitor
+PART_GEOMETRY: Dict[str, tuple] = {
+    "SMALL_BOX": (0.30, 0.20),
+    "MEDIUM_BOX": (0.40, 0.30),
+    "LARGE_BOX": (0.60, 0.40),
+    "PALLETIZING_BOX": (0.60, 0.30),
+    "BLUE_RAW_MATERIAL": (0.30, 0.15),
+    "GREEN_RAW_MATERIAL": (0.30, 0.15),
+    "METAL_RAW_MATERIAL": (0.30, 0.15),
+    "BLUE_PRODUCT_BASE": (0.30, 0.20),
+    "GREEN_PRODUCT_BASE": (0.30, 0.20),
+    "METAL_PRODUCT_BASE": (0.30, 0.20),
+    "BLUE_PRODUCT_LID": (0.30, 0.10),
+    "GREEN_PRODUCT_LID": (0.30, 0.10),
+    "METAL_PRODUCT_LID": (0.30, 0.10),
+    "STACKABLE_BOX": (0.40, 0.30),
+}
+
+ENCODER_TAGS = frozenset(("Belt_Conveyor_0_Encoder_Signal_A", "Belt_Conveyor_0_Encoder_Signal_B"))
+
+# Tipos de evento
+_EMIT, _MILESTONE, _PUSHER, _ENCODER, _INPUT = range(5)
+# Marcos de uma peça (em distância da esteira)
+_SENSOR_IN, _SENSOR_OUT, _PUSHER_IN, _PUSHER_OUT, _BELT_END = range(5)
+
+
+class Part(object):
+    __slots__ = ("number", "kind", "code", "length", "tall", "start", "removed")
+
+    def __init__(self, number: int, kind: str, code: int, length: float, tall: bool, start: float):
+        self.number = number
+        self.kind = kind
+        self.code = code
+        self.length = length
+        self.tall = tall
+        self.start = start      # Odômetro da esteira quando a peça entrou (frente em 0 m)
+        self.removed = False
+
+
+class SimulationStats(NamedTuple):
+    emitted: int
+    delivered: int          # Chegaram ao fim da esteira (Remover_1)
+    ejected: int            # Empurradas pelo pistão (rejeitadas)
+    events: int
+
+
+class ConveyorSimulator(object):
+    """
+    Planta da linha de triagem como simulação de eventos discretos.
+
+    Lê os comandos dos atuadores da imagem de processo 'io' (Belt_Conveyor_6m_0,
+    Emitter_0_Emit, Pusher_0) em apply_outputs() e escreve nela as transições de
+    sensores (Diffuse_Sensor_0/1, limites do pistão, encoder, Emitter_0_Part).
+    Cada transição também é entregue a on_change(nome, valor, t_ms).
+    """
+    def __init__(self, io: Optional[Dict[str, Any]] = None, competitor: Optional[BoxCompetitor] = None,
+                 seed: Optional[int] = None, emit_interval_ms: float = EMIT_INTERVAL_MS,
+                 encoder_pulses_per_m: int = ENCODER_PULSES_PER_M,
+                 on_change: Optional[Callable[[str, Any, float], None]] = None):
+        self.io = io if io is not None else process_image()
+        self.competitor = competitor or BoxCompetitor(seed)
+        self.emit_interval_ms = emit_interval_ms
+        self.encoder_pulses_per_m = encoder_pulses_per_m
+        self.on_change = on_change
+
+        self.now_ms = 0.0
+        self._events: List[tuple] = []          # (t_ms, seq, tipo, dado)
+        self._seq = 0
+        self._milestones: List[tuple] = []      # (distância, seq, marco, peça)
+
+        # Esteira: odômetro linear por trechos
+        self._belt_on = False
+        self._odometer = 0.0
+        self._odometer_ms = 0.0
+        self._belt_epoch = 0                    # Invalida eventos agendados com a esteira em outro estado
+        self._milestone_at: Optional[float] = None
+
+        self._emitting = False
+        self._emit_epoch = 0
+        self._pusher_cmd = False
+        self._pusher_epoch = 0
+        self._encoder_step = 0
+
+        self._sensor_parts: Set[Part] = set()
+        self._pusher_parts: Set[Part] = set()   # Peças na frente do pistão (PUSHER_POS_M)
+        self._parts = 0
+        self.part_counts: Dict[str, int] = {}
+        self.delivered = 0
+        self.ejected = 0
+        self.events = 0
+        self.changed: Set[str] = set()
+
+    # --- Agenda ---
+
+    def _schedule(self, t_ms: float, kind: int, data: Any = None):
+        self._seq += 1
+        heapq.heappush(self._events, (t_ms, self._seq, kind, data))
+
+    def schedule_input(self, name: str, value: Any, at_ms: float):
+        """ Agenda uma mudança de entrada externa (ex.: operador pressionando Start_Button_0). """
+        self._schedule(at_ms, _INPUT, (name, value))
+
+    def press(self, name: str, at_ms: float, duration_ms: float = 100):
+        """ Pulso em um botão: TRUE em at_ms, FALSE duration_ms depois. """
+        self.schedule_input(name, True, at_ms)
+        self.schedule_input(name, False, at_ms + duration_ms)
+
+    def next_event_ms(self) -> Optional[float]:
+        return self._events[0][0] if self._events else None
+
+    def _set(self, name: str, value: Any):
+        if self.io.get(name) != value:
+            self.io[name] = value
+            self.changed.add(name)
+            if self.on_change is not None:
+                self.on_change(name, value, self.now_ms)
+
+    # --- Esteira ---
+
+    def _odometer_now(self) -> float:
+        if not self._belt_on:
+            return self._odometer
+        return self._odometer + BELT_SPEED_M_S * (self.now_ms - self._odometer_ms) / 1000.0
+
+    def _distance_to_ms(self, distance: float) -> float:
+        return self._odometer_ms + (distance - self._odometer) * 1000.0 / BELT_SPEED_M_S
+
+    def _set_belt(self, on: bool):
+        if on == self._belt_on:
+            return
+        self._odometer = self._odometer_now()
+        self._odometer_ms = self.now_ms
+        self._belt_on = on
+        self._belt_epoch += 1
+        self._milestone_at = None
+        if on:
+            self._schedule_milestone()
+            if self.encoder_pulses_per_m:
+                self._schedule_encoder()
+
+    def _add_milestone(self, distance: float, milestone: int, part: Part):
+        self._seq += 1
+        heapq.heappush(self._milestones, (distance, self._seq, milestone, part))
+        self._schedule_milestone()
+
+    def _schedule_milestone(self):
+        """ Agenda (uma vez) o próximo marco de peça, se a esteira estiver andando. """
+        if not self._belt_on or not self._milestones:
+            return
+        t_ms = self._distance_to_ms(self._milestones[0][0])
+        if self._milestone_at is None or t_ms < self._milestone_at:
+            self._milestone_at = t_ms
+            self._schedule(t_ms, _MILESTONE, self._belt_epoch)
+
+    def _schedule_encoder(self):
+        interval_ms = 1000.0 / (4 * self.encoder_pulses_per_m * BELT_SPEED_M_S)
+        self._schedule(self.now_ms + interval_ms, _ENCODER, self._belt_epoch)
+
+    # --- Peças ---
+
+    def _emit(self):
+        self._parts += 1
+        kind, _, _, _ = self.competitor.run_competition()
+        self.part_counts[kind] = self.part_counts.get(kind, 0) + 1
+        length, height = PART_GEOMETRY[kind]
+        part = Part(self._parts, kind, self.competitor.PART_TYPES[kind], length, height >= TALL_PART_HEIGHT_M,
+                    self._odometer_now())
+        self._set("Emitter_0_Part", part.code)
+        self._add_milestone(part.start + SENSOR_POS_M, _SENSOR_IN, part)
+        self._add_milestone(part.start + PUSHER_POS_M, _PUSHER_IN, part)
+        self._add_milestone(part.start + BELT_LENGTH_M + part.length, _BELT_END, part)
+
+    def _milestone(self, milestone: int, part: Part):
+        if part.removed:
+            return
+        if milestone == _SENSOR_IN:
+            self._sensor_parts.add(part)
+            self._update_sensors()
+            self._add_milestone(part.start + SENSOR_POS_M + part.length, _SENSOR_OUT, part)
+        elif milestone == _SENSOR_OUT:
+            self._sensor_parts.discard(part)
+            self._update_sensors()
+        elif milestone == _PUSHER_IN:
+            self._pusher_parts.add(part)
+            self._add_milestone(part.start + PUSHER_POS_M + part.length, _PUSHER_OUT, part)
+        elif milestone == _PUSHER_OUT:
+            self._pusher_parts.discard(part)
+        else:
+            part.removed = True
+            self.delivered += 1
+
+    def _update_sensors(self):
+        self._set("Diffuse_Sensor_0", bool(self._sensor_parts))
+        self._set("Diffuse_Sensor_1", any(part.tall for part in self._sensor_parts))
+
+    # --- Laço de eventos ---
+
+    def apply_outputs(self):
+        """ Reage aos comandos atuais dos atuadores na imagem de processo. """
+        self._set_belt(bool(self.io["Belt_Conveyor_6m_0"]))
+
+        emitting = bool(self.io["Emitter_0_Emit"])
+        if emitting != self._emitting:
+            self._emitting = emitting
+            self._emit_epoch += 1
+            if emitting:
+                self._schedule(self.now_ms, _EMIT, self._emit_epoch)
+
+        pusher = bool(self.io["Pusher_0"])
+        if pusher != self._pusher_cmd:
+            self._pusher_cmd = pusher
+            self._pusher_epoch += 1
+            # Ao sair de um limite ele desliga na hora; o limite oposto só liga no fim do curso
+            self._set("Pusher_0_Back_Limit" if pusher else "Pusher_0_Front_Limit", False)
+            self._schedule(self.now_ms + PUSHER_TRAVEL_MS, _PUSHER, (self._pusher_epoch, pusher))
+
+    def _handle(self, kind: int, data: Any):
+        if kind == _MILESTONE:
+            if data != self._belt_epoch:
+                return
+            self._milestone_at = None
+            position = self._odometer_now() + 1e-9
+            while self._milestones and self._milestones[0][0] <= position:
+                _, _, milestone, part = heapq.heappop(self._milestones)
+                self._milestone(milestone, part)
+            self._schedule_milestone()
+        elif kind == _EMIT:
+            if data == self._emit_epoch and self._emitting:
+                self._emit()
+                self._schedule(self.now_ms + self.emit_interval_ms, _EMIT, data)
+        elif kind == _PUSHER:
+            epoch, extended = data
+            if epoch != self._pusher_epoch:
+                return
+            if extended:
+                self._set("Pusher_0_Front_Limit", True)
+                # Peças na frente do pistão são empurradas para fora da esteira
+                for part in self._pusher_parts:
+                    part.removed = True
+                    self.ejected += 1
+                self._sensor_parts -= self._pusher_parts
+                self._pusher_parts.clear()
+                self._update_sensors()
+            else:
+                self._set("Pusher_0_Back_Limit", True)
+        elif kind == _ENCODER:
+            if data != self._belt_epoch:
+                return
+            self._encoder_step = (self._encoder_step + 1) % 4
+            # Quadratura: A e B defasados de 90° (00 -> 10 -> 11 -> 01)
+            self._set("Belt_Conveyor_0_Encoder_Signal_A", self._encoder_step in (1, 2))
+            self._set("Belt_Conveyor_0_Encoder_Signal_B", self._encoder_step in (2, 3))
+            self._schedule_encoder()
+        elif kind == _INPUT:
+            self._set(*data)
+
+    def advance_to(self, t_ms: float) -> Set[str]:
+        """ Processa todos os eventos até t_ms. Retorna as tags que mudaram desde a última chamada. """
+        events = self._events
+        while events and events[0][0] <= t_ms:
+            self.now_ms, _, kind, data = heapq.heappop(events)
+            self.events += 1
+            self._handle(kind, data)
+        self.now_ms = max(self.now_ms, t_ms)
+        changed, self.changed = self.changed, set()
+        return changed
+
+    def stats(self) -> SimulationStats:
+        return SimulationStats(self._parts, self.delivered, self.ejected, self.events)
+
+
+def cosimulate(sim: ConveyorSimulator, engine: ScanEngine, duration_ms: int):
+    """
+    Executa a planta simulada junto com o PLC_PRG emulado, com avanço de tempo por eventos.
+
+    O CLP só é varrido (na grade de cycle_ms) quando uma entrada que ele lê muda,
+    quando um temporizador vence ou enquanto suas saídas/estado ainda estão
+    mudando; entre esses instantes a imagem de processo não mudaria.
+    """
+    table = load_tag_table()
+    outputs = [tag.name for tag in table.tags if tag.folder in OUTPUT_FOLDERS]
+    io, program, cycle = engine.io, engine.program, engine.cycle_ms
+
+    def snapshot():
+        return program.state(), tuple(io[name] for name in outputs)
+
+    end = engine.clock.now_ms + duration_ms
+    t = engine.clock.now_ms
+    settling = True
+    while t < end:
+        changed = sim.advance_to(t)
+        deadline = engine.next_deadline_ms()
+        if settling or (changed - ENCODER_TAGS) or (deadline is not None and t >= deadline):
+            engine.clock.now_ms = t
+            before = snapshot()
+            program(io)
+            engine.scans += 1
+            sim.apply_outputs()
+            settling = snapshot() != before
+
+        if settling:
+            t += cycle
+            continue
+        candidates = [d for d in (sim.next_event_ms(), engine.next_deadline_ms()) if d is not None]
+        if not candidates:
+            break
+        # Próxima varredura: primeiro instante da grade do CLP em ou após o próximo evento
+        t = max(t + cycle, -(-int(min(candidates)) // cycle) * cycle)
+    engine.clock.now_ms = end
+
+
+def run_headless(hours: float, seed: Optional[int] = None, encoder_pulses_per_m: int = ENCODER_PULSES_PER_M):
+    """ Turno simulado sem servidor: operador libera a emergência e dá Start em t = 0. """
+    engine = ScanEngine()
+    sim = ConveyorSimulator(engine.io, seed=seed, encoder_pulses_per_m=encoder_pulses_per_m)
+    sim.schedule_input("Emergency_Stop_0", True, 0)
+    sim.press("Start_Button_0", 10)
+    cosimulate(sim, engine, int(hours * 3_600_000))
+    return sim, engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulação por eventos discretos da linha de triagem + PLC_PRG emulado.")
+    parser.add_argument("--hours", type=float, default=24.0, help="Duração simulada (h).")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--encoder", type=int, default=ENCODER_PULSES_PER_M, help="Pulsos do encoder por metro (0 desliga).")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    sim, engine = run_headless(args.hours, args.seed, args.encoder)
+    elapsed = time.perf_counter() - started
+
+    stats = sim.stats()
+    io = engine.io
+    print(f"⏱️ {args.hours:g} h simuladas em {elapsed:.2f} s ({stats.events} eventos, {engine.scans} varreduras do CLP)")
+    print(f"Peças: {stats.emitted} emitidas | {stats.delivered} entregues | {stats.ejected} rejeitadas pelo pistão")
+    print(f"C_TOTAL: {io['C_TOTAL']} | C_APROVADAS: {io['C_APROVADAS']} | C_REJEITADAS: {io['C_REJEITADAS']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,45 @@
+from __future__ import annotations
+
+import copy
 import random
 import math
-from typing import Dict, Any, Tuple, Optional
+from array import array
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Any, Callable, Mapping, NamedTuple, Tuple, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _numpy():
+    """
+    Importa o NumPy sob demanda. Só o modo em lote precisa dele, então
+    importar este módulo (e usar run_competition) não paga esse custo.
+    """
+    import numpy
+    return numpy
+
+
+class CompetitionPlan(NamedTuple):
+    """
+    Plano imutável e pré-calculado da competição. É construído uma única vez
+    pelo BoxCompetitor e só é refeito quando DISTRIBUTION_PARAMS ou
+    DISTRIBUTION_GROUPS mudam.
+    """
+    params: Mapping[str, Dict[str, float]]             # Cópia dos parâmetros usados na construção
+    groups: Mapping[str, list[str]]                    # Cópia dos grupos usados na construção
+    part_names: Tuple[str, ...]                        # Ordem das peças (colunas)
+    generators: Tuple[Callable[[str], float], ...]     # Método gerador já vinculado, por peça
+    batch_groups: Tuple[Tuple[Callable, int, int], ...]  # (gerador em lote, coluna inicial, coluna final)
+    pmf_table: Tuple[float, ...]                       # PMF de Poisson para k em 0..5
+    part_distribution: Mapping[str, str]               # peça -> distribuição
+    part_index: Mapping[str, int]                      # peça -> coluna
+    part_masks: array                                  # coluna -> código (bitmask) de PART_TYPES (int32)
+
+    def matches(self, params: Dict[str, Dict[str, float]], groups: Dict[str, list[str]]) -> bool:
+        """ Indica se o plano ainda corresponde à configuração informada. """
+        return params == self.params and groups == self.groups
+
 
 class BoxCompetitor:
     """
@@ -50,32 +89,94 @@ class BoxCompetitor:
         "NORMAL": {"mu": 0.5, "sigma": 0.2},
     }
 
+    # Tamanho máximo de cada bloco do modo em lote (limita a memória em n muito grande)
+    BATCH_CHUNK_SIZE: int = 65536
+
+    def __init__(self, seed: Optional[int] = None):
+        """
+        :param seed: Semente opcional. Com ela, tanto run_competition() quanto
+                     run_competitions() produzem sequências reprodutíveis.
+        """
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._rng: Optional[np.random.Generator] = None
+        self._plan = self._build_plan()
+
+    @property
+    def rng(self) -> np.random.Generator:
+        """ Gerador NumPy do modo em lote, criado no primeiro uso a partir da semente. """
+        if self._rng is None:
+            self._rng = _numpy().random.default_rng(self.seed)
+        return self._rng
+
+    def _build_plan(self) -> CompetitionPlan:
+        """ Resolve os geradores, a tabela de PMF e os índices das peças. """
+        params = copy.deepcopy(self.DISTRIBUTION_PARAMS)
+        groups = copy.deepcopy(self.DISTRIBUTION_GROUPS)
+
+        generation_map: Dict[str, Callable[[str], float]] = {}
+        part_distribution: Dict[str, str] = {}
+        batch_groups = []
+        column = 0
+        for dist_type, parts in groups.items():
+            # dist_type.lower() agora será "exponential" (correto)
+            generator = getattr(self, f"_generate_{dist_type.lower()}")
+            for part in parts:
+                generation_map[part] = generator
+                part_distribution.setdefault(part, dist_type)
+            if parts:
+                batch_generator = getattr(self, f"_generate_{dist_type.lower()}_batch")
+                batch_groups.append((batch_generator, column, column + len(parts)))
+                column += len(parts)
+
+        part_names = tuple(generation_map)
+        lambd = params["POISSON"]["lambda"] if "POISSON" in params else 0.0
+        pmf_table = tuple((lambd**k * math.exp(-lambd)) / math.factorial(k) for k in range(6))
+
+        part_masks = array("i", [self.PART_TYPES[part] for part in part_names])
+
+        return CompetitionPlan(
+            params=MappingProxyType(params),
+            groups=MappingProxyType(groups),
+            part_names=part_names,
+            generators=tuple(generation_map.values()),
+            batch_groups=tuple(batch_groups),
+            pmf_table=pmf_table,
+            part_distribution=MappingProxyType(part_distribution),
+            part_index=MappingProxyType({part: i for i, part in enumerate(part_names)}),
+            part_masks=part_masks,
+        )
+
+    @property
+    def plan(self) -> CompetitionPlan:
+        """ Plano atual; é reconstruído se a configuração de distribuições mudou. """
+        plan = self._plan
+        if not plan.matches(self.DISTRIBUTION_PARAMS, self.DISTRIBUTION_GROUPS):
+            plan = self._plan = self._build_plan()
+        return plan
+
     def _generate_exponential(self, part_name: str) -> float:
         """ Gera um valor da distribuição exponencial e o escalona para [0, 1]. """
         # CORREÇÃO: Acessa o parâmetro usando a chave "EXPONENTIAL"
         lambd = self.DISTRIBUTION_PARAMS["EXPONENTIAL"]["lambda"]
         
-        value = random.expovariate(lambd)
+        value = self._random.expovariate(lambd)
         result = math.exp(-lambd * value) 
         return result
 
     def _generate_poisson(self, part_name: str) -> float:
         """ Gera um valor da distribuição de Poisson e o escalona para [0, 1]. """
-        lambd = self.DISTRIBUTION_PARAMS["POISSON"]["lambda"]
-        
-        k = random.randint(0, 5) 
-        
-        # Calculamos a PMF do número k gerado
-        pmf = (lambd**k * math.exp(-lambd)) / math.factorial(k)
+        k = self._random.randint(0, 5) 
         
-        return pmf
+        # A PMF do número k gerado vem da tabela pré-calculada do plano
+        return self._plan.pmf_table[k]
     
     def _generate_weibull(self, part_name: str) -> float:
         """ Gera um valor da distribuição de Weibull e o escalona para [0, 1]. """
         alpha = self.DISTRIBUTION_PARAMS["WEIBULL"]["alpha"]
         beta = self.DISTRIBUTION_PARAMS["WEIBULL"]["beta"]
         
-        value = random.weibullvariate(alpha=alpha, beta=beta)
+        value = self._random.weibullvariate(alpha=alpha, beta=beta)
         
         cdf = 1 - math.exp(-((value / beta)**alpha))
         return min(cdf, 1.0) 
@@ -85,7 +186,7 @@ class BoxCompetitor:
         mu = self.DISTRIBUTION_PARAMS["NORMAL"]["mu"]
         sigma = self.DISTRIBUTION_PARAMS["NORMAL"]["sigma"]
         
-        value = random.gauss(mu=mu, sigma=sigma)
+        value = self._random.gauss(mu=mu, sigma=sigma)
         
         return max(0.0, min(1.0, value)) 
 
@@ -96,66 +197,135 @@ class BoxCompetitor:
         
         :return: Uma tupla contendo (part_vencedora, valor_vencedor, distribuicao_vencedora, resultados_detalhados)
         """
-        results: Dict[str, float] = {}
-        
-        generation_map: Dict[str, callable] = {}
-        for dist_type, parts in self.DISTRIBUTION_GROUPS.items():
-            # dist_type.lower() agora será "exponential" (correto)
-            generator = getattr(self, f"_generate_{dist_type.lower()}") 
-            for part in parts:
-                generation_map[part] = generator
-        
+        plan = self.plan
+
         # 1. Gerar o número para cada PART_TYPE
-        for part_name, generator in generation_map.items():
-            generated_value = generator(part_name)
-            results[part_name] = generated_value
+        values = [generator(part_name) for part_name, generator in zip(plan.part_names, plan.generators)]
 
         # 2. Avaliar o maior número gerado (o vencedor)
-        if not results:
+        if not values:
             raise ValueError("Nenhuma peça configurada para competição.")
-            
-        winner_part = max(results, key=results.get)
-        winner_value = results[winner_part]
-        
+
+        winner_column = max(range(len(values)), key=values.__getitem__)
+        winner_part = plan.part_names[winner_column]
+        winner_value = values[winner_column]
+
         # 3. Determinar a distribuição do vencedor
-        winner_distribution = ""
-        for dist_type, parts in self.DISTRIBUTION_GROUPS.items():
-            if winner_part in parts:
-                winner_distribution = dist_type
-                break
+        winner_distribution = plan.part_distribution[winner_part]
+        results: Dict[str, float] = dict(zip(plan.part_names, values))
 
         return winner_part, winner_value, winner_distribution, results
 
+    # --- Modo em lote (NumPy) ---
+
+    def _generate_exponential_batch(self, rng: np.random.Generator, shape: Tuple[int, int]) -> np.ndarray:
+        """ Versão vetorizada de _generate_exponential. """
+        lambd = self.DISTRIBUTION_PARAMS["EXPONENTIAL"]["lambda"]
+
+        value = rng.exponential(1.0 / lambd, size=shape)
+        return _numpy().exp(-lambd * value)
+
+    def _generate_poisson_batch(self, rng: np.random.Generator, shape: Tuple[int, int]) -> np.ndarray:
+        """ Versão vetorizada de _generate_poisson (PMF de k sorteado em 0..5). """
+        pmf_table = _numpy().asarray(self._plan.pmf_table)
+        return pmf_table[rng.integers(0, 6, size=shape)]
+
+    def _generate_weibull_batch(self, rng: np.random.Generator, shape: Tuple[int, int]) -> np.ndarray:
+        """ Versão vetorizada de _generate_weibull (mesma parametrização de random.weibullvariate). """
+        alpha = self.DISTRIBUTION_PARAMS["WEIBULL"]["alpha"]
+        beta = self.DISTRIBUTION_PARAMS["WEIBULL"]["beta"]
+
+        # random.weibullvariate(alpha, beta): alpha é a escala e beta a forma
+        value = alpha * rng.weibull(beta, size=shape)
+        np = _numpy()
+        cdf = 1 - np.exp(-((value / beta) ** alpha))
+        return np.minimum(cdf, 1.0)
+
+    def _generate_normal_batch(self, rng: np.random.Generator, shape: Tuple[int, int]) -> np.ndarray:
+        """ Versão vetorizada de _generate_normal. """
+        mu = self.DISTRIBUTION_PARAMS["NORMAL"]["mu"]
+        sigma = self.DISTRIBUTION_PARAMS["NORMAL"]["sigma"]
+
+        value = rng.normal(mu, sigma, size=shape)
+        return _numpy().clip(value, 0.0, 1.0)
+
+    def run_competitions(self, n: int, rng: Optional[np.random.Generator] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Executa n rodadas da competição de uma só vez, sorteando todas as
+        peças × n rodadas como arrays NumPy.
+
+        A ordem das colunas segue DISTRIBUTION_GROUPS (a mesma de run_competition),
+        então empates são resolvidos da mesma forma (vence a primeira peça).
+
+        :param n: Número de rodadas.
+        :param rng: Gerador NumPy opcional; por padrão usa self.rng (semeado no construtor).
+        :return: Uma tupla de arrays de tamanho n: (codigo_PART_TYPES_vencedor, valor_vencedor, indice_da_peca_vencedora).
+                 O índice refere-se a part_order().
+        """
+        if n < 0:
+            raise ValueError("O número de rodadas deve ser não negativo.")
+        np = _numpy()
+        rng = self.rng if rng is None else rng
+
+        plan = self.plan
+        if not plan.part_names:
+            raise ValueError("Nenhuma peça configurada para competição.")
+
+        winner_index = np.empty(n, dtype=np.intp)
+        winner_value = np.empty(n, dtype=np.float64)
+
+        for start in range(0, n, self.BATCH_CHUNK_SIZE):
+            rounds = min(self.BATCH_CHUNK_SIZE, n - start)
+            results = np.empty((rounds, len(plan.part_names)), dtype=np.float64)
+
+            # 1. Gerar todas as colunas de cada grupo de distribuição de uma vez
+            for generator, first, last in plan.batch_groups:
+                results[:, first:last] = generator(rng, (rounds, last - first))
+
+            # 2. Avaliar o vencedor de cada rodada
+            idx = results.argmax(axis=1)
+            winner_index[start:start + rounds] = idx
+            winner_value[start:start + rounds] = results[np.arange(rounds), idx]
+
+        part_masks = np.frombuffer(plan.part_masks, dtype=np.intc)
+        return part_masks[winner_index], winner_value, winner_index
+
+    def part_order(self) -> list[str]:
+        """ Ordem das peças (colunas) usada pelo modo em lote. """
+        return list(self.plan.part_names)
+
 
 # --- Exemplo de Uso ---
-print("## 🚀 Início da Competição de Peças\n")
-
-# Instancia a classe
-competitor = BoxCompetitor()
-
-# Executa o processo de competição
-vencedor, valor, distribuicao, todos_resultados = competitor.run_competition()
-
-# --- Apresentação dos Resultados ---
-print("### 🥇 Resultado da Rodada")
-print(f"**Caixa Vencedora:** {vencedor}")
-print(f"**Valor Vencedor:** {valor:.6f}")
-print(f"**Distribuição Vencedora:** {distribuicao}\n")
-
-print("---")
-
-print("### 📈 Detalhes dos Resultados Gerados (TOP 5)")
-# Ordenar os resultados do maior para o menor
-sorted_results = sorted(todos_resultados.items(), key=lambda item: item[1], reverse=True)
-
-# Imprimir os 5 primeiros
-for i, (part, value) in enumerate(sorted_results[:5]):
-    dist = ""
-    for d, parts in competitor.DISTRIBUTION_GROUPS.items():
-        if part in parts:
-            dist = d
-            break
-    print(f"* **{i+1}. {part}** ({dist}): {value:.6f}")
-    
-if len(sorted_results) > 5:
-    print("\n* ... (Demais resultados omitidos) ...")
\ No newline at end of file
+def main():
+    """ Executa uma rodada de demonstração e imprime o resultado em markdown. """
+    print("## 🚀 Início da Competição de Peças\n")
+
+    # Instancia a classe
+    competitor = BoxCompetitor()
+
+    # Executa o processo de competição
+    vencedor, valor, distribuicao, todos_resultados = competitor.run_competition()
+
+    # --- Apresentação dos Resultados ---
+    print("### 🥇 Resultado da Rodada")
+    print(f"**Caixa Vencedora:** {vencedor}")
+    print(f"**Valor Vencedor:** {valor:.6f}")
+    print(f"**Distribuição Vencedora:** {distribuicao}\n")
+
+    print("---")
+
+    print("### 📈 Detalhes dos Resultados Gerados (TOP 5)")
+    # Ordenar os resultados do maior para o menor
+    sorted_results = sorted(todos_resultados.items(), key=lambda item: item[1], reverse=True)
+
+    # Imprimir os 5 primeiros
+    for i, (part, value) in enumerate(sorted_results[:5]):
+        dist = competitor.plan.part_distribution[part]
+        print(f"* **{i+1}. {part}** ({dist}): {value:.6f}")
+
+    if len(sorted_results) > 5:
+        print("\n* ... (Demais resultados omitidos) ...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+import argparse
+import collections
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# --- Encaminhamento dos registros do logger para a ingestão (substituto local do IoT Hub) ---
+#
+# Forwarder.write() só enfileira o registro (não bloqueia a thread de
+# notificações). Uma thread de fundo agrupa os registros em micro-lotes,
+# comprime cada lote (NDJSON + zlib) e o entrega por um Transport plugável.
+# Se a entrega falha, o lote vai para uma fila de reenvio em disco
+# (RetryQueue) e é reenviado em ordem, com backoff exponencial, assim que o
+# link volta — inclusive depois de reiniciar o processo. A memória fica
+# limitada à fila de registros (max_queue), ao lote em montagem e aos lotes
+# que nem o link nem o disco aceitaram (também até max_queue registros).
+#
+# Frame (lote): <II> (tamanho do cabeçalho, tamanho do payload) + cabeçalho
+# JSON + payload. O mesmo formato é usado no TCP e nos arquivos da fila.
+
+FRAME_HEADER = struct.Struct("<II")
+ACK = b"\x06"
+COMPRESSIONS = ("zlib", "none")
+DEFAULT_BROKER_PORT = 5700
+
+
+def encode_frame(header: Dict[str, Any], payload: bytes) -> bytes:
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(len(header_bytes), len(payload)) + header_bytes + payload
+
+
+def decode_frame(frame: bytes) -> Tuple[Dict[str, Any], bytes]:
+    header_len, payload_len = FRAME_HEADER.unpack_from(frame)
+    start = FRAME_HEADER.size
+    header = json.loads(frame[start:start + header_len])
+    return header, frame[start + header_len:start + header_len + payload_len]
+
+
+def decode_records(frame: bytes) -> list:
+    """ Registros de um frame (descomprimindo, se for o caso). """
+    header, payload = decode_frame(frame)
+    if header.get("encoding") == "zlib":
+        payload = zlib.decompress(payload)
+    return [json.loads(line) for line in payload.splitlines() if line]
+
+
+# --- Transportes ---
+
+class SpoolTransport(object):
+    """
+    Entrega cada lote como um arquivo <batch_id>.frame num diretório (escrita
+    atômica). É o destino mais simples para outro processo consumir e faz a
+    entrega idempotente: reenviar o mesmo lote só sobrescreve o arquivo.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, batch_id: str, frame: bytes):
+        path = os.path.join(self.directory, f"{batch_id}.frame")
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(frame)
+        os.replace(temp_path, path)
+
+    def close(self):
+        pass
+
+
+class TcpTransport(object):
+    """
+    Envia os frames por uma conexão TCP persistente a um broker (ver
+    run_broker) e espera o ACK de cada um. Qualquer falha fecha a conexão e
+    gera exceção; a próxima tentativa reconecta.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_BROKER_PORT, timeout_s: float = 5.0):
+        self.host = host
+        self.port = port
+        self.timeout_s = timeout_s
+        self._socket: Optional[socket.socket] = None
+
+    def send(self, batch_id: str, frame: bytes):
+        try:
+            if self._socket is None:
+                self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout_s)
+            self._socket.sendall(frame)
+            if self._socket.recv(1) != ACK:
+                raise ConnectionError(f"Broker não confirmou o lote {batch_id}.")
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+
+
+def make_transport(kind: str, target: str):
+    """ "spool" + diretório ou "tcp" + host:porta. """
+    if kind == "spool":
+        return SpoolTransport(target)
+    if kind == "tcp":
+        host, _, port = target.rpartition(":")
+        return TcpTransport(host or "127.0.0.1", int(port or DEFAULT_BROKER_PORT))
+    raise ValueError(f"Transporte inválido '{kind}'. Use 'spool' ou 'tcp'.")
+
+
+# --- Fila de reenvio em disco ---
+
+class RetryQueue(object):
+    """
+    Lotes ainda não entregues, um arquivo por lote (<seq>-<registros>.frame),
+    em ordem de chegada. Sobrevive a reinícios: ao abrir, retoma os arquivos
+    existentes. Acima de max_bytes os lotes mais antigos são descartados.
+    """
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dropped_records = 0
+        os.makedirs(directory, exist_ok=True)
+        # (seq, registros, bytes), do mais antigo para o mais novo
+        self._items = collections.deque()
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".frame"):
+                seq, _, count = name[:-len(".frame")].partition("-")
+                self._items.append((int(seq), int(count), os.path.getsize(os.path.join(directory, name))))
+        self.bytes = sum(size for _, _, size in self._items)
+        self._next_seq = self._items[-1][0] + 1 if self._items else 0
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def records(self) -> int:
+        return sum(count for _, count, _ in self._items)
+
+    def _path(self, seq: int, count: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}-{count}.frame")
+
+    def push(self, frame: bytes, count: int):
+        seq = self._next_seq
+        self._next_seq += 1
+        path = self._path(seq, count)
+        with open(path + ".tmp", "wb") as f:
+            f.write(frame)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self._items.append((seq, count, len(frame)))
+        self.bytes += len(frame)
+        while self.bytes > self.max_bytes and len(self._items) > 1:
+            old_seq, old_count, old_size = self._items.popleft()
+            os.remove(self._path(old_seq, old_count))
+            self.bytes -= old_size
+            self.dropped_records += old_count
+
+    def peek(self) -> Tuple[bytes, int]:
+        seq, count, _ = self._items[0]
+        with open(self._path(seq, count), "rb") as f:
+            return f.read(), count
+
+    def pop(self):
+        seq, count, size = self._items.popleft()
+        os.remove(self._path(seq, count))
+        self.bytes -= size
+
+
+# --- Forwarder ---
+
+class Forwarder(object):
+    """
+    Estágio de encaminhamento com a mesma interface de escrita do
+    BufferedNdjsonWriter (write/close, written/dropped).
+
+    - Micro-lotes de até batch_size registros ou linger_s segundos.
+    - Compressão "zlib" (padrão) ou "none".
+    - Entrega por 'transport' (SpoolTransport, TcpTransport ou qualquer objeto
+      com send(batch_id, frame) e close()); falhas vão para a RetryQueue em
+      retry_dir e são reenviadas em ordem, com backoff de backoff_s até
+      max_backoff_s. Enquanto houver lotes pendentes, os novos entram no fim
+      da fila, preservando a ordem.
+    - write() nunca bloqueia: com a fila de registros cheia o registro é
+      descartado e contado em 'dropped'. Com o link fora, a thread continua
+      drenando a fila para o disco, então isso só acontece se o disco não
+      acompanhar.
+    - Se o disco também falhar, os lotes ficam em memória (até max_queue
+      registros; acima disso os mais antigos são descartados em 'dropped') e
+      a gravação é tentada de novo com o mesmo backoff. Nenhuma falha de um
+      lote derruba a thread; se ela morrer mesmo assim, write() passa a
+      descartar os registros.
+    - 'formatter' (opcional) converte cada registro na thread do forwarder,
+      antes da serialização, em dict ou na linha JSON pronta (ver SubHandler.to_line).
+      Um registro que o formatter (ou o json.dumps) não converte é descartado
+      e contado em 'errors'; os demais registros do lote seguem.
+    """
+    _STOP = object()
+    accepts_lines = True
+
+    def __init__(self, transport, retry_dir: str, max_queue: int = 10000, batch_size: int = 500,
+                 linger_s: float = 1.0, compression: str = "zlib", compression_level: int = 6,
+                 backoff_s: float = 0.5, max_backoff_s: float = 30.0, max_retry_bytes: int = 512 * 1024 * 1024,
+                 source: Optional[str] = None, formatter: Optional[Callable[[Any], Dict[str, Any]]] = None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Compressão inválida '{compression}'. Use uma de: {', '.join(COMPRESSIONS)}.")
+        self.transport = transport
+        self.path = retry_dir
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.linger_s = linger_s
+        self.compression = compression
+        self.compression_level = compression_level
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.source = source or socket.gethostname()
+        self.formatter = formatter
+        self.retry = RetryQueue(retry_dir, max_retry_bytes)
+
+        # Contadores
+        self.written = 0            # Registros entregues
+        self.dropped = 0            # Registros descartados (fila cheia ou forwarder fechado)
+        self.batches = 0            # Lotes entregues
+        self.spooled = 0            # Lotes que passaram pela fila em disco
+        self.errors = 0             # Falhas de entrega, de gravação em disco e registros que não serializam
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+        self._seq = 0
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+        self._held = collections.deque()    # (batch_id, frame, registros) que o disco não aceitou
+        self._held_records = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="forwarder", daemon=True)
+        self._thread.start()
+
+    # --- Lado do produtor ---
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """ Enfileira um registro. Retorna False se ele foi descartado (fila cheia, forwarder fechado ou parado). """
+        if self._closed or not self._thread.is_alive():
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """ Envia (ou guarda em disco) o que estiver na fila e encerra a thread de fundo. """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def pending(self) -> int:
+        """ Registros aguardando reenvio (em disco ou, se o disco falhou, em memória). """
+        return self.retry.records + self._held_records
+
+    # --- Thread de fundo ---
+
+    def _lines(self, batch) -> list:
+        """ Linhas JSON do lote; registros que não convertem são descartados (contados em 'errors'). """
+        formatter, lines, failed = self.formatter, [], None
+        for record in batch:
+            try:
+                if formatter is not None:
+                    record = formatter(record)
+                lines.append(record if type(record) is str else json.dumps(record, default=str))
+            except Exception as e:
+                self.errors += 1
+                failed = e
+        if failed is not None:
+            print(f"🚨 ERRO ao formatar {len(batch) - len(lines)} registro(s) para encaminhamento: {failed!r}")
+        return lines
+
+    def _encode(self, lines) -> Tuple[str, bytes]:
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+        self.raw_bytes += len(payload)
+        if self.compression == "zlib":
+            payload = zlib.compress(payload, self.compression_level)
+        self.compressed_bytes += len(payload)
+        batch_id = f"{int(time.time() * 1000):013d}-{self._seq:06d}"
+        self._seq += 1
+        header = {"batch_id": batch_id, "source": self.source, "records": len(lines), "encoding": self.compression}
+        return batch_id, encode_frame(header, payload)
+
+    def _failed(self, action: str, error: Exception):
+        """ Conta a falha e adia a próxima tentativa (backoff exponencial). """
+        self.errors += 1
+        self._backoff = min(self.max_backoff_s, self._backoff * 2 if self._backoff else self.backoff_s)
+        self._next_attempt = time.monotonic() + self._backoff
+        if self.errors == 1 or self._backoff == self.max_backoff_s:
+            print(f"⚠️ Falha ao {action} ({error}); nova tentativa em {self._backoff:g} s.")
+
+    def _send(self, batch_id: str, frame: bytes, count: int) -> bool:
+        try:
+            self.transport.send(batch_id, frame)
+        except Exception as e:
+            self._failed(f"encaminhar o lote {batch_id}", e)
+            return False
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+        self.written += count
+        self.batches += 1
+        return True
+
+    def _dispatch(self, batch):
+        lines = self._lines(batch)
+        if not lines:
+            return
+        batch_id, frame = self._encode(lines)
+        # Com lotes pendentes (ou em backoff) o novo lote vai para o fim da fila
+        if (len(self.retry) or self._held or time.monotonic() < self._next_attempt
+                or not self._send(batch_id, frame, len(lines))):
+            self._held.append((batch_id, frame, len(lines)))
+            self._held_records += len(lines)
+            self._spool_held()
+
+    def _spool_held(self):
+        """
+        Grava na fila em disco os lotes guardados em memória, em ordem. Se o
+        disco falhar eles continuam em memória (até max_queue registros; acima
+        disso os mais antigos são descartados) para a próxima tentativa.
+        """
+        while self._held:
+            _, frame, count = self._held[0]
+            try:
+                self.retry.push(frame, count)
+            except Exception as e:
+                self._failed("gravar o lote na fila em disco", e)
+                break
+            self._held.popleft()
+            self._held_records -= count
+            self.spooled += 1
+        while self._held_records > self.max_queue and len(self._held) > 1:
+            _, _, count = self._held.popleft()
+            self._held_records -= count
+            self.dropped += count
+
+    def _drain_retry(self, max_batches: int = 50):
+        """
+        Reenvia os lotes pendentes, do mais antigo, até falhar ou enviar
+        max_batches: primeiro os da fila em disco, depois os que ficaram em
+        memória porque o disco falhou.
+        """
+        for _ in range(max_batches):
+            if not (len(self.retry) or self._held) or time.monotonic() < self._next_attempt:
+                return
+            if self._held:
+                self._spool_held()
+            if len(self.retry):
+                try:
+                    frame, count = self.retry.peek()
+                    batch_id = decode_frame(frame)[0]["batch_id"]
+                except Exception as e:
+                    self._failed("ler a fila em disco", e)
+                    return
+                if not self._send(batch_id, frame, count):
+                    return
+                self.retry.pop()
+            elif self._held:
+                batch_id, frame, count = self._held[0]
+                if not self._send(batch_id, frame, count):
+                    return
+                self._held.popleft()
+                self._held_records -= count
+
+    def _step(self, action, *args):
+        """ Executa uma etapa da thread; uma exceção inesperada é contada e não encerra a thread. """
+        try:
+            action(*args)
+        except Exception as e:
+            self._failed("encaminhar os registros", e)
+
+    def _run(self):
+        batch = []
+        deadline = None  # Prazo do lote atual (conta a partir do primeiro registro)
+        stopping = False
+        while not stopping:
+            retrying = len(self.retry) or self._held
+            wakeups = [t for t in (deadline, self._next_attempt if retrying else None) if t is not None]
+            timeout = max(0.0, min(wakeups) - time.monotonic()) if wakeups else None
+            try:
+                item = self._queue.get(timeout=timeout)
+                while True:
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    if not batch:
+                        deadline = time.monotonic() + self.linger_s
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._step(self._dispatch, batch)
+                batch = []
+                deadline = None
+            self._step(self._drain_retry)
+
+        # Encerramento: o resto da fila vira um último lote; o que não for entregue fica em disco
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                batch.append(item)
+        if batch:
+            self._step(self._dispatch, batch)
+        self._next_attempt = 0.0
+        self._step(self._drain_retry, len(self.retry) + len(self._held))
+        if self._held:
+            print(f"🚨 {self._held_records} registro(s) não entregues nem gravados em disco foram perdidos.")
+        self._step(self.transport.close)
+
+
+# --- Broker local (substituto do IoT Hub para testes e bancada) ---
+
+def _read_exact(stream, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
+
+
+def run_broker(host: str = "127.0.0.1", port: int = DEFAULT_BROKER_PORT, spool_dir: str = "broker_spool"):
+    """
+    Recebe frames do TcpTransport, grava cada lote em spool_dir (SpoolTransport,
+    idempotente por batch_id) e confirma com ACK. Bloqueia até Ctrl+C.
+    """
+    spool = SpoolTransport(spool_dir)
+    stats = {"batches": 0, "records": 0}
+    lock = threading.Lock()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                try:
+                    sizes = _read_exact(self.rfile, FRAME_HEADER.size)
+                    header_len, payload_len = FRAME_HEADER.unpack(sizes)
+                    frame = sizes + _read_exact(self.rfile, header_len + payload_len)
+                except EOFError:
+                    return
+                header, _ = decode_frame(frame)
+                spool.send(header["batch_id"], frame)
+                self.wfile.write(ACK)
+                with lock:
+                    stats["batches"] += 1
+                    stats["records"] += header["records"]
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+        server.daemon_threads = True
+        print(f"📥 Broker em {host}:{port}, gravando os lotes em {spool_dir} (Ctrl+C para sair)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    print(f"🛑 Broker encerrado: {stats['batches']} lotes, {stats['records']} registros.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broker local que recebe os lotes do Forwarder (substituto do IoT Hub).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_BROKER_PORT)
+    parser.add_argument("--spool", default="broker_spool", help="Diretório onde os lotes recebidos são gravados.")
+    args = parser.parse_args()
+    run_broker(args.host, args.port, args.spool)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import datetime
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Cálculo incremental de KPIs / OEE a partir das notificações de tags, sem
+# esperar o processamento em nuvem. Cada atualização custa O(1) amortizado:
+#
+# - janela deslizante: anel de baldes (resolution_s) com somas correntes; os
+#   baldes que saem da janela são subtraídos ao avançar o tempo;
+# - janela fixa (tumbling): acumuladores zerados a cada window_s; cada janela
+#   fechada é entregue a on_window_closed.
+#
+# Entradas (nome curto da tag): deltas dos contadores C_TOTAL / C_APROVADAS /
+# C_REJEITADAS, tempo ligado de Belt_Conveyor_6m_0 (disponibilidade) e bordas
+# de subida de Stack_Light_0_Yellow (timeouts de ciclo).
+
+KPI_FOLDER = "KPIs_Linha"
+SLIDING_WINDOW_S = 15 * 60.0
+SLIDING_RESOLUTION_S = 1.0
+TUMBLING_WINDOW_S = 60 * 60.0
+# Cadência ideal da linha: uma peça a cada 3 s (mesmo intervalo do emissor simulado)
+IDEAL_RATE_PER_H = 1200.0
+
+# Campos acumulados em cada janela
+TOTAL, APPROVED, REJECTED, RUN_S, TIMEOUTS = range(5)
+_FIELDS = 5
+_COUNTER_FIELDS = {"C_TOTAL": TOTAL, "C_APROVADAS": APPROVED, "C_REJEITADAS": REJECTED}
+
+# KPI -> tag publicada na pasta KPIs_Linha
+KPI_TAGS = {
+    "oee": "KPI_OEE",
+    "availability": "KPI_Disponibilidade",
+    "performance": "KPI_Desempenho",
+    "quality": "KPI_Qualidade",
+    "rejection_rate": "KPI_Taxa_Rejeicao",
+    "parts_per_h": "KPI_Pecas_Hora",
+    "timeouts": "KPI_Timeouts",
+}
+
+
+def compute_kpis(sums: List[float], elapsed_s: float, ideal_rate_per_h: float = IDEAL_RATE_PER_H) -> Dict[str, float]:
+    """ OEE = disponibilidade × desempenho × qualidade, a partir das somas de uma janela. """
+    run_s = sums[RUN_S]
+    inspected = sums[APPROVED] + sums[REJECTED]
+    availability = run_s / elapsed_s if elapsed_s > 0 else 0.0
+    performance = sums[TOTAL] / (ideal_rate_per_h * run_s / 3600.0) if run_s > 0 else 0.0
+    quality = sums[APPROVED] / inspected if inspected else 0.0
+    return {
+        "oee": availability * performance * quality,
+        "availability": availability,
+        "performance": performance,
+        "quality": quality,
+        "rejection_rate": sums[REJECTED] / inspected if inspected else 0.0,
+        "parts_per_h": sums[TOTAL] * 3600.0 / elapsed_s if elapsed_s > 0 else 0.0,
+        "timeouts": int(sums[TIMEOUTS]),
+        "total": int(sums[TOTAL]),
+        "approved": int(sums[APPROVED]),
+        "rejected": int(sums[REJECTED]),
+        "run_s": run_s,
+        "elapsed_s": elapsed_s,
+    }
+
+
+class SlidingWindow(object):
+    """ Somas dos últimos length_s segundos, em um anel de baldes de resolution_s. """
+    def __init__(self, length_s: float, resolution_s: float = SLIDING_RESOLUTION_S):
+        self.resolution_s = resolution_s
+        self.size = max(1, math.ceil(length_s / resolution_s))
+        self.length_s = self.size * resolution_s
+        self.buckets = [[0.0] * _FIELDS for _ in range(self.size)]
+        self.sums = [0.0] * _FIELDS
+        self.head: Optional[int] = None       # Número absoluto do balde atual
+
+    def advance(self, t: float):
+        """ Move o balde atual até o instante t, descontando os baldes que saem da janela. """
+        bucket = int(t // self.resolution_s)
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        for b in range(self.head + 1, min(bucket, self.head + self.size) + 1):
+            expired = self.buckets[b % self.size]
+            for field in range(_FIELDS):
+                self.sums[field] -= expired[field]
+                expired[field] = 0.0
+        self.head = bucket
+
+    def add(self, t: float, field: int, amount: float):
+        self.advance(t)
+        self.buckets[self.head % self.size][field] += amount
+        self.sums[field] += amount
+
+    def add_interval(self, t0: float, t1: float, field: int):
+        """ Distribui a duração [t0, t1) pelos baldes (ex.: tempo de esteira ligada). """
+        t0 = max(t0, t1 - self.length_s)
+        while t0 < t1:
+            end = min(t1, (int(t0 // self.resolution_s) + 1) * self.resolution_s)
+            self.add(t0, field, end - t0)
+            t0 = end
+
+
+class TumblingWindow(object):
+    """ Janelas fixas e consecutivas de length_s segundos. """
+    def __init__(self, length_s: float, on_closed: Optional[Callable[[float, float, List[float]], None]] = None):
+        self.length_s = length_s
+        self.on_closed = on_closed
+        self.start: Optional[float] = None
+        self.sums = [0.0] * _FIELDS
+
+    def advance(self, t: float):
+        if self.start is None:
+            self.start = (t // self.length_s) * self.length_s
+            return
+        if t >= self.start + self.length_s:
+            if self.on_closed is not None:
+                self.on_closed(self.start, self.start + self.length_s, self.sums)
+            # Janelas vazias intermediárias (ex.: logger parado por horas) não são reportadas
+            self.start = (t // self.length_s) * self.length_s
+            self.sums = [0.0] * _FIELDS
+
+    def add(self, t: float, field: int, amount: float):
+        self.advance(t)
+        self.sums[field] += amount
+
+    def add_interval(self, t0: float, t1: float, field: int):
+        while t0 < t1:
+            self.advance(t0)
+            end = min(t1, self.start + self.length_s)
+            self.sums[field] += end - t0
+            t0 = end
+
+
+class KpiEngine(object):
+    """
+    Motor de KPIs alimentado pelas notificações do SubHandler (ver update()).
+
+    kpis() devolve os indicadores da janela deslizante; current_window() os da
+    janela fixa em andamento. on_window_closed(início, fim, kpis) é chamado a
+    cada janela fixa encerrada.
+    """
+    def __init__(self, sliding_s: float = SLIDING_WINDOW_S, tumbling_s: float = TUMBLING_WINDOW_S,
+                 resolution_s: float = SLIDING_RESOLUTION_S, ideal_rate_per_h: float = IDEAL_RATE_PER_H,
+                 on_window_closed: Optional[Callable[[float, float, Dict[str, float]], None]] = None):
+        self.ideal_rate_per_h = ideal_rate_per_h
+        self.on_window_closed = on_window_closed
+        self.sliding = SlidingWindow(sliding_s, resolution_s)
+        self.tumbling = TumblingWindow(tumbling_s, self._closed)
+        self.updates = 0
+
+        self._counters: Dict[str, int] = {}
+        self._belt_on = False
+        self._belt_since: Optional[float] = None
+        self._yellow = False
+        self._first_t: Optional[float] = None
+        self._last_t: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _closed(self, start: float, end: float, sums: List[float]):
+        if self.on_window_closed is not None:
+            self.on_window_closed(start, end, compute_kpis(sums, end - start, self.ideal_rate_per_h))
+
+    def _add(self, t: float, field: int, amount: float):
+        self.sliding.add(t, field, amount)
+        self.tumbling.add(t, field, amount)
+
+    def _accumulate_run_time(self, t: float):
+        """ Lança o tempo de esteira ligada desde a última atualização até t. """
+        if self._belt_on and self._belt_since is not None and t > self._belt_since:
+            self.sliding.add_interval(self._belt_since, t, RUN_S)
+            self.tumbling.add_interval(self._belt_since, t, RUN_S)
+            self._belt_since = t
+
+    def advance(self, t: float):
+        """ Avança o tempo sem uma nova amostra (ex.: antes de publicar). """
+        with self._lock:
+            self._advance(t)
+
+    def _advance(self, t: float):
+        if self._first_t is None:
+            self._first_t = t
+        if self._last_t is not None and t < self._last_t:
+            t = self._last_t      # Amostras fora de ordem entram no balde atual
+        self._accumulate_run_time(t)
+        self.sliding.advance(t)
+        self.tumbling.advance(t)
+        self._last_t = t
+        return t
+
+    def update(self, name: str, value: Any, t: Optional[float] = None):
+        """ Processa uma nova amostra da tag 'name' (nome curto) no instante t (epoch em s). """
+        t = time.time() if t is None else t
+        with self._lock:
+            t = self._advance(t)
+            self.updates += 1
+
+            field = _COUNTER_FIELDS.get(name)
+            if field is not None:
+                last = self._counters.get(name)
+                self._counters[name] = value
+                if last is not None:
+                    # Contador zerado (Reset_Button_0): o novo valor inteiro é o incremento
+                    delta = value - last if value >= last else value
+                    if delta:
+                        self._add(t, field, delta)
+            elif name == "Belt_Conveyor_6m_0":
+                value = bool(value)
+                if value and not self._belt_on:
+                    self._belt_since = t
+                self._belt_on = value
+            elif name == "Stack_Light_0_Yellow":
+                value = bool(value)
+                if value and not self._yellow:
+                    self._add(t, TIMEOUTS, 1)
+                self._yellow = value
+
+    def datachange(self, node_id_str: str, value: Any, source_timestamp: Optional[datetime.datetime] = None):
+        """ Adaptador para o SubHandler: NodeId string + SourceTimestamp (UTC sem tzinfo). """
+        if source_timestamp is not None:
+            t = source_timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()
+        else:
+            t = None
+        self.update(node_id_str.rsplit(".", 1)[-1], value, t)
+
+    def kpis(self, t: Optional[float] = None) -> Dict[str, float]:
+        """ KPIs da janela deslizante até o instante t (padrão: agora). """
+        t = time.time() if t is None else t
+        with self._lock:
+            t = self._advance(t)
+            # A janela cobre os baldes completos anteriores mais a fração já decorrida do balde atual
+            sliding = self.sliding
+            covered = (sliding.size - 1) * sliding.resolution_s + (t - sliding.head * sliding.resolution_s)
+            elapsed = min(covered, t - self._first_t)
+            return compute_kpis(self.sliding.sums, elapsed, self.ideal_rate_per_h)
+
+    def current_window(self) -> Dict[str, float]:
+        """ KPIs parciais da janela fixa em andamento. """
+        with self._lock:
+            start = self.tumbling.start if self.tumbling.start is not None else 0.0
+            elapsed = (self._last_t or start) - max(start, self._first_t or start)
+            return compute_kpis(self.tumbling.sums, elapsed, self.ideal_rate_per_h)
+
+
+class KpiPublisher(object):
+    """
+    Publica os KPIs como variáveis do servidor (pasta KPIs_Linha da tabela de
+    tags) com uma única escrita em lote por ciclo. 'client' é um opcua.Client
+    conectado; para asyncua use publish_async(). Se o servidor não tiver as
+    variáveis (CODESYS, servidor sem a pasta KPIs_Linha), avisa uma vez e desiste.
+    """
+    def __init__(self, client, table, ns_index: int, root: Optional[str] = None, period_s: float = 0.5):
+        tags = {tag.name: tag for tag in table.tags if tag.folder == KPI_FOLDER}
+        self.client = client
+        self.period_s = period_s
+        self.keys = [key for key, name in KPI_TAGS.items() if name in tags]
+        self.node_ids = [table.node_id(tags[KPI_TAGS[key]], ns_index, root) for key in self.keys]
+        self.datatypes = [tags[KPI_TAGS[key]].datatype for key in self.keys]
+        self.nodes = [client.get_node(node_id) for node_id in self.node_ids]
+        self.enabled = True
+        self.published = 0
+        self._next = 0.0
+
+    def _variants(self, kpis: Dict[str, float], ua) -> list:
+        values = []
+        for key, datatype in zip(self.keys, self.datatypes):
+            value = int(kpis[key]) if datatype.startswith("Int") else float(kpis[key])
+            values.append(ua.Variant(value, getattr(ua.VariantType, datatype)))
+        return values
+
+    def due(self) -> bool:
+        now = time.monotonic()
+        if not self.enabled or now < self._next:
+            return False
+        self._next = now + self.period_s
+        return True
+
+    def _failed(self, error: Exception):
+        self.enabled = False
+        print(f"⚠️ Variáveis de KPI indisponíveis no servidor ({error}); publicação desativada.")
+
+    def publish(self, kpis: Dict[str, float]):
+        from opcua import ua
+
+        try:
+            self.client.set_values(self.nodes, self._variants(kpis, ua))
+            self.published += 1
+        except Exception as e:
+            self._failed(e)
+
+    async def publish_async(self, kpis: Dict[str, float]):
+        from asyncua import ua
+
+        try:
+            await self.client.write_values(self.nodes, self._variants(kpis, ua))
+            self.published += 1
+        except Exception as e:
+            self._failed(e)
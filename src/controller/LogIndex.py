@@ -0,0 +1,353 @@
+import argparse
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from controller.ColumnarLog import LogSample, _to_us, samples_from_record
+from controller.TagTable import TagTable, load_tag_table
+
+# --- Índice lateral (sidecar) dos logs NDJSON ---
+#
+# <log>.idx.json guarda, para cada tag e cada balde de tempo (bucket_s), o
+# intervalo de bytes [início, fim) do log que contém as linhas daquela tag
+# naquele balde. Uma consulta só lê (via mmap) os intervalos dos baldes que
+# intersectam [t0, t1], e só faz o parse JSON das linhas que citam as tags
+# pedidas. O índice guarda o tamanho já indexado do log: se o log cresceu,
+# apenas o trecho novo é indexado. Guarda também o mtime do log e um hash do
+# início e do fim do trecho indexado: um log reescrito (rotação, outro arquivo
+# com o mesmo nome) é reindexado do zero em vez de consultado com offsets
+# errados.
+
+INDEX_SUFFIX = ".idx.json"
+INDEX_VERSION = 2
+DEFAULT_BUCKET_S = 60.0
+FINGERPRINT_BYTES = 4096    # Bytes do início e do fim do trecho indexado que entram no hash
+
+
+def log_fingerprint(log_path: str, indexed_bytes: int) -> str:
+    """ sha1 dos primeiros e dos últimos FINGERPRINT_BYTES do trecho [0, indexed_bytes) do log. """
+    digest = hashlib.sha1()
+    with open(log_path, "rb") as f:
+        digest.update(f.read(min(FINGERPRINT_BYTES, indexed_bytes)))
+        if indexed_bytes > FINGERPRINT_BYTES:
+            f.seek(max(FINGERPRINT_BYTES, indexed_bytes - FINGERPRINT_BYTES))
+            digest.update(f.read(indexed_bytes - f.tell()))
+    return digest.hexdigest()
+
+
+class LogIndex(object):
+    """ Índice por (tag, balde de tempo) -> intervalo de bytes de um log NDJSON. """
+    def __init__(self, log_path: str, bucket_s: float = DEFAULT_BUCKET_S):
+        self.log_path = log_path
+        self.index_path = log_path + INDEX_SUFFIX
+        self.bucket_us = int(bucket_s * 1_000_000)
+        self.indexed_bytes = 0
+        # {node_id: {bucket: [inicio, fim]}}
+        self.buckets: Dict[str, Dict[int, List[int]]] = {}
+        # {node_id: nome curto}
+        self.names: Dict[str, str] = {}
+        self.t_min: Optional[int] = None
+        self.t_max: Optional[int] = None
+
+    # --- Construção ---
+
+    @classmethod
+    def open(cls, log_path: str, bucket_s: float = DEFAULT_BUCKET_S) -> "LogIndex":
+        """ Carrega o índice lateral (se existir e for compatível) e indexa o que faltar do log. """
+        index = cls(log_path, bucket_s)
+        if os.path.exists(index.index_path):
+            with open(index.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if index._matches(data):
+                index.bucket_us = data["bucket_us"]
+                index.indexed_bytes = data["indexed_bytes"]
+                index.names = data["names"]
+                index.t_min, index.t_max = data["t_min"], data["t_max"]
+                index.buckets = {node_id: {int(b): r for b, r in buckets.items()} for node_id, buckets in data["buckets"].items()}
+        if index.update():
+            index.save()
+        return index
+
+    def _matches(self, data: Dict[str, Any]) -> bool:
+        """
+        O índice salvo ainda descreve o log: mesma versão, trecho indexado
+        dentro do arquivo e log intocado desde então (mesmo mtime) ou só
+        acrescido (mesmo hash do início e do fim do trecho indexado).
+        """
+        if data.get("version") != INDEX_VERSION:
+            return False
+        stat = os.stat(self.log_path)
+        indexed_bytes = data["indexed_bytes"]
+        if indexed_bytes > stat.st_size:
+            return False
+        if data["log_mtime_ns"] == stat.st_mtime_ns:
+            return True
+        return data["log_hash"] == log_fingerprint(self.log_path, indexed_bytes)
+
+    def update(self) -> int:
+        """ Indexa as linhas completas acrescentadas ao log desde a última vez. Retorna quantas. """
+        size = os.path.getsize(self.log_path)
+        if size <= self.indexed_bytes:
+            return 0
+        lines = 0
+        offset = self.indexed_bytes
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Linha ainda sendo escrita: fica para a próxima atualização
+                end = offset + len(line)
+                if line.strip():
+                    for sample in samples_from_record(json.loads(line)):
+                        self._add(sample, offset, end)
+                    lines += 1
+                offset = end
+        self.indexed_bytes = offset
+        return lines
+
+    def _add(self, sample: LogSample, start: int, end: int):
+        bucket = sample.timestamp_us // self.bucket_us
+        tag_buckets = self.buckets.get(sample.node_id)
+        if tag_buckets is None:
+            tag_buckets = self.buckets[sample.node_id] = {}
+            self.names[sample.node_id] = sample.name
+        byte_range = tag_buckets.get(bucket)
+        if byte_range is None:
+            tag_buckets[bucket] = [start, end]
+        else:
+            byte_range[0] = min(byte_range[0], start)
+            byte_range[1] = max(byte_range[1], end)
+        if self.t_min is None or sample.timestamp_us < self.t_min:
+            self.t_min = sample.timestamp_us
+        if self.t_max is None or sample.timestamp_us > self.t_max:
+            self.t_max = sample.timestamp_us
+
+    def save(self):
+        data = {
+            "version": INDEX_VERSION,
+            "log_path": os.path.basename(self.log_path),
+            "bucket_us": self.bucket_us,
+            "indexed_bytes": self.indexed_bytes,
+            "log_mtime_ns": os.stat(self.log_path).st_mtime_ns,
+            "log_hash": log_fingerprint(self.log_path, self.indexed_bytes),
+            "t_min": self.t_min,
+            "t_max": self.t_max,
+            "names": self.names,
+            "buckets": self.buckets,
+        }
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, self.index_path)
+
+    # --- Consulta ---
+
+    def resolve(self, tags: Optional[Sequence[str]]) -> List[str]:
+        """ Converte nomes curtos ou NodeIds para os NodeIds presentes no log. """
+        if tags is None:
+            return list(self.buckets)
+        by_name = {}
+        for node_id, name in self.names.items():
+            by_name.setdefault(name, []).append(node_id)
+        resolved = []
+        for tag in tags:
+            resolved.extend([tag] if tag in self.buckets else by_name.get(tag, []))
+        return resolved
+
+    def byte_ranges(self, node_ids: Iterable[str], t0_us: Optional[int], t1_us: Optional[int]) -> List[Tuple[int, int]]:
+        """ Intervalos de bytes (ordenados e mesclados) que podem conter as amostras pedidas. """
+        first = None if t0_us is None else t0_us // self.bucket_us
+        last = None if t1_us is None else t1_us // self.bucket_us
+        ranges = []
+        for node_id in node_ids:
+            for bucket, byte_range in self.buckets.get(node_id, {}).items():
+                if (first is None or bucket >= first) and (last is None or bucket <= last):
+                    ranges.append(byte_range)
+        ranges.sort()
+        merged: List[List[int]] = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return [(start, end) for start, end in merged]
+
+    def query(self, tags: Optional[Sequence[str]] = None, t0: Any = None, t1: Any = None) -> List[LogSample]:
+        """
+        Amostras das tags pedidas com t0 <= timestamp <= t1, em ordem de tempo.
+
+        :param tags: NodeIds ou nomes curtos; None = todas.
+        :param t0: Início (epoch em s, ISO 8601 ou datetime); None = desde o início.
+                   ISO e datetime sem fuso são UTC, como os timestamps do log
+                   (use "+00:00", "-03:00"... para outro fuso).
+        :param t1: Fim (idem); None = até o fim.
+        """
+        t0_us = None if t0 is None else _to_us(t0, naive_utc=True)
+        t1_us = None if t1 is None else _to_us(t1, naive_utc=True)
+        node_ids = self.resolve(tags)
+        wanted = set(node_ids)
+        # Pré-filtro barato por bytes antes do parse JSON (NodeId ou nome, no formato largo)
+        needles = [json.dumps(node_id).encode("utf-8") for node_id in node_ids]
+
+        samples = []
+        ranges = self.byte_ranges(node_ids, t0_us, t1_us)
+        if not ranges:
+            return samples
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end in ranges:
+                for line in data[start:end].splitlines():
+                    if not any(needle in line for needle in needles):
+                        continue
+                    for sample in samples_from_record(json.loads(line)):
+                        if sample.node_id not in wanted:
+                            continue
+                        if (t0_us is None or sample.timestamp_us >= t0_us) and (t1_us is None or sample.timestamp_us <= t1_us):
+                            samples.append(sample)
+        samples.sort(key=lambda sample: sample.timestamp_us)
+        return samples
+
+
+def query(log_path: str, tags: Optional[Sequence[str]] = None, t0: Any = None, t1: Any = None) -> List[LogSample]:
+    """ Atalho: abre (ou atualiza) o índice lateral do log e executa a consulta. """
+    return LogIndex.open(log_path).query(tags, t0, t1)
+
+
+class ReplayTargets(object):
+    """
+    NodeId atual e tipo de dado (da tabela de tags) de cada amostra a reenviar.
+
+    - NodeIds string ("ns=X;s=<raiz>.<pasta>.<tag>") mantêm a raiz (linha) e
+      recebem o índice de namespace do servidor de destino;
+    - NodeIds numéricos antigos ("ns=2;i=7", log de polling) e colunas dos
+      snapshots largos (só o nome) são resolvidos pelo nome curto da tag.
+
+    O tipo vem sempre da tabela (o log de polling grava inteiros como Int64).
+    resolve() devolve None para tags que não existem na tabela.
+    """
+    def __init__(self, table: TagTable, ns_index: int = 2, root: Optional[str] = None):
+        self.table = table
+        self.ns_index = ns_index
+        self.root = root
+        self.by_name = {tag.name: tag for tag in table.tags}
+
+    def resolve(self, sample: LogSample) -> Optional[Tuple[str, str]]:
+        node_id = sample.node_id
+        if ";s=" in node_id:
+            path = node_id.split(";s=", 1)[1]
+            parts = path.rsplit(".", 2)
+            if len(parts) == 3:
+                tag = self.by_name.get(parts[2])
+                if tag is not None and tag.folder == parts[1]:
+                    return f"ns={self.ns_index};s={path}", tag.datatype
+        tag = self.by_name.get(sample.name) or self.by_name.get(node_id)
+        if tag is None:
+            return None
+        return self.table.node_id(tag, self.ns_index, self.root), tag.datatype
+
+
+def replay(samples: Sequence[LogSample], server_url: str, speed: float = 1.0, value_types: Optional[Dict[str, str]] = None,
+           table: Optional[TagTable] = None, root: Optional[str] = None):
+    """
+    Reenvia amostras para o servidor OPC UA, respeitando o intervalo original
+    entre elas dividido por 'speed' (speed <= 0: o mais rápido possível).
+    Amostras com o mesmo timestamp são escritas em uma única chamada. Os
+    NodeIds e tipos vêm da tabela de tags (ver ReplayTargets); tags
+    desconhecidas são ignoradas com um aviso.
+
+    :param value_types: VariantType por NodeId de destino, sobrepondo o da tabela.
+    :param root: Linha de destino das amostras sem raiz (nome curto ou NodeId numérico).
+    """
+    from opcua import Client, ua
+
+    value_types = value_types or {}
+    table = table or load_tag_table()
+    client = Client(server_url)
+    client.connect()
+    try:
+        targets = ReplayTargets(table, client.get_namespace_index(table.namespace_uri), root)
+        unknown = set()
+        nodes = {}
+        written = 0
+        start_wall = time.monotonic()
+        first_us = samples[0].timestamp_us if samples else 0
+        i = 0
+        while i < len(samples):
+            # Agrupa as amostras do mesmo instante
+            j = i
+            while j < len(samples) and samples[j].timestamp_us == samples[i].timestamp_us:
+                j += 1
+            if speed > 0:
+                delay = start_wall + (samples[i].timestamp_us - first_us) / 1_000_000 / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            batch_nodes, batch_values = [], []
+            for sample in samples[i:j]:
+                target = targets.resolve(sample)
+                if target is None:
+                    if sample.node_id not in unknown:
+                        unknown.add(sample.node_id)
+                        print(f"⚠️ Tag desconhecida na tabela de tags, ignorada no replay: {sample.node_id}")
+                    continue
+                node_id, datatype = target
+                node = nodes.get(node_id)
+                if node is None:
+                    node = nodes[node_id] = client.get_node(node_id)
+                variant_type = getattr(ua.VariantType, value_types.get(node_id) or datatype)
+                value = float(sample.value) if datatype in ("Float", "Double") else sample.value
+                batch_nodes.append(node)
+                batch_values.append(ua.Variant(value, variant_type))
+            if batch_nodes:
+                client.set_values(batch_nodes, batch_values)
+                written += len(batch_nodes)
+            i = j
+        return written
+    finally:
+        client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice, consulta por intervalo de tempo e replay dos logs NDJSON.")
+    parser.add_argument("log", help="Arquivo de log NDJSON.")
+    parser.add_argument("--tags", nargs="*", default=None, help="NodeIds ou nomes curtos (padrão: todas).")
+    parser.add_argument("--t0", default=None, help="Início (ISO 8601, UTC se sem fuso, ou epoch em s).")
+    parser.add_argument("--t1", default=None, help="Fim (ISO 8601, UTC se sem fuso, ou epoch em s).")
+    parser.add_argument("--bucket", type=float, default=DEFAULT_BUCKET_S, help="Largura do balde do índice (s).")
+    parser.add_argument("--replay", default=None, metavar="URL", help="Reenvia o resultado para este servidor OPC UA.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Velocidade do replay (1 = tempo real, 0 = sem espera).")
+    parser.add_argument("--root", default=None, help="Linha de destino das tags sem raiz no log (padrão: a da tabela de tags).")
+    args = parser.parse_args()
+
+    def parse_time(value):
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+    started = time.perf_counter()
+    index = LogIndex.open(args.log, args.bucket)
+    opened = time.perf_counter()
+    samples = index.query(args.tags, parse_time(args.t0), parse_time(args.t1))
+    queried = time.perf_counter()
+    print(f"🔎 {len(samples)} amostras (índice: {(opened - started) * 1000:.1f} ms, consulta: {(queried - opened) * 1000:.1f} ms)")
+
+    if args.replay:
+        print(f"▶️ Replay em {args.replay} (velocidade {args.speed:g}x)...")
+        written = replay(samples, args.replay, args.speed, root=args.root)
+        print(f"✅ {written} valores escritos.")
+    else:
+        for sample in samples[:20]:
+            ts = datetime.datetime.fromtimestamp(sample.timestamp_us / 1_000_000, datetime.timezone.utc)
+            print(f"   {ts.isoformat()}  {sample.name:<35} {sample.value}")
+        if len(samples) > 20:
+            print(f"   ... (+{len(samples) - 20})")
+
+
+if __name__ == "__main__":
+    main()
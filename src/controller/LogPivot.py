@@ -0,0 +1,241 @@
+import argparse
+import datetime
+import heapq
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from controller.ColumnarLog import LogSample, _to_us, samples_from_record
+from controller.TagTable import TagTable, load_tag_table
+
+# --- Conversão longo <-> largo dos logs NDJSON, em fluxo ---
+#
+# Formato longo (log de polling, SubHandler): uma linha por tag e instante.
+# Formato largo (snapshots da assinatura): uma linha por instante com
+# "timestamp_local" e uma coluna por tag.
+#
+# Tudo é feito em uma única passada e memória constante: os logs são lidos
+# linha a linha, vários logs são intercalados por timestamp (heapq.merge) e a
+# junção as-of guarda só o último valor de cada tag. Os logs já são gravados
+# em ordem de tempo; uma janela de reordenação opcional corrige atrasos
+# pequenos (ex.: timestamps de servidor de tags diferentes).
+
+WIDE_TIMESTAMP = "timestamp_local"
+
+
+def read_samples(path: str) -> Iterator[LogSample]:
+    """ Amostras de um log NDJSON (qualquer formato do projeto), na ordem do arquivo. """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield from samples_from_record(json.loads(line))
+
+
+def reorder(samples: Iterable[LogSample], window_s: float) -> Iterator[LogSample]:
+    """
+    Reordena por timestamp as amostras que chegam até 'window_s' atrasadas.
+    Só as amostras da janela ficam em memória.
+    """
+    window_us = int(window_s * 1_000_000)
+    heap: List[Tuple[int, int, LogSample]] = []
+    for order, sample in enumerate(samples):
+        heapq.heappush(heap, (sample.timestamp_us, order, sample))
+        limit = sample.timestamp_us - window_us
+        while heap[0][0] <= limit:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+def merge_samples(paths: Sequence[str], reorder_s: float = 0.0) -> Iterator[LogSample]:
+    """ Amostras de um ou mais logs intercaladas por timestamp (cada log já em ordem de tempo). """
+    streams = [read_samples(path) for path in paths]
+    if reorder_s > 0:
+        streams = [reorder(stream, reorder_s) for stream in streams]
+    if len(streams) == 1:
+        return streams[0]
+    return heapq.merge(*streams, key=lambda sample: sample.timestamp_us)
+
+
+class AsOfJoin(object):
+    """
+    Junção as-of em fluxo: reconstrói snapshots largos numa grade regular de
+    tempo (múltiplos de period_s) a partir de amostras longas / só-mudanças.
+
+    O snapshot do instante t tem, para cada tag, o último valor com timestamp
+    <= t. Com max_age_s, valores mais velhos que isso viram None. As colunas
+    são 'columns' (fixas, None até a tag aparecer) ou, sem elas, as tags na
+    ordem em que aparecem. key="node_id" usa o NodeId como coluna (necessário
+    com várias linhas, em que os nomes curtos se repetem). t0/t1 (epoch em s,
+    ISO 8601 ou datetime) sem fuso são UTC.
+    """
+    def __init__(self, period_s: float, columns: Optional[Sequence[str]] = None, key: str = "name",
+                 max_age_s: Optional[float] = None, t0: Any = None, t1: Any = None):
+        if period_s <= 0:
+            raise ValueError("period_s deve ser positivo.")
+        if key not in ("name", "node_id"):
+            raise ValueError("key deve ser 'name' ou 'node_id'.")
+        self.period_us = int(period_s * 1_000_000)
+        self.columns = list(columns) if columns else None
+        self.key = key
+        self.max_age_us = None if max_age_s is None else int(max_age_s * 1_000_000)
+        # t0/t1 sem fuso são UTC, como timestamp_servidor / timestamp_utc dos logs
+        self.t0_us = None if t0 is None else _to_us(t0, naive_utc=True)
+        self.t1_us = None if t1 is None else _to_us(t1, naive_utc=True)
+        # {coluna: [valor, timestamp_us]}
+        self.state: Dict[str, List[Any]] = {}
+        if self.columns:
+            for column in self.columns:
+                self.state[column] = [None, None]
+
+        # Contadores
+        self.samples = 0            # Amostras aplicadas
+        self.late = 0               # Amostras mais antigas que um snapshot já emitido
+        self.snapshots = 0          # Snapshots emitidos
+
+    def snapshot(self, t_us: int) -> Dict[str, Any]:
+        """ Valores as-of 't_us' do estado atual. """
+        max_age_us = self.max_age_us
+        if max_age_us is None:
+            return {column: entry[0] for column, entry in self.state.items()}
+        return {column: value if ts is not None and t_us - ts <= max_age_us else None
+                for column, (value, ts) in self.state.items()}
+
+    def run(self, samples: Iterable[LogSample]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """ (t_us, {coluna: valor}) para cada ponto da grade, em ordem de tempo. """
+        period_us, t1_us, state = self.period_us, self.t1_us, self.state
+        fixed = self.columns is not None
+        use_node_id = self.key == "node_id"
+        next_us = self.t0_us
+        if next_us is not None:
+            next_us = -(-next_us // period_us) * period_us
+        last_us = None              # Último snapshot emitido
+        newest_us = None            # Amostra mais recente
+        for sample in samples:
+            ts = sample.timestamp_us
+            if next_us is None:
+                next_us = -(-ts // period_us) * period_us
+            while next_us < ts and (t1_us is None or next_us <= t1_us):
+                yield next_us, self.snapshot(next_us)
+                self.snapshots += 1
+                last_us = next_us
+                next_us += period_us
+            if t1_us is not None and ts > t1_us:
+                break
+            column = sample.node_id if use_node_id else sample.name
+            entry = state.get(column)
+            if entry is None:
+                if fixed:
+                    continue
+                entry = state[column] = [None, None]
+            if last_us is not None and ts <= last_us:
+                self.late += 1
+            if entry[1] is None or ts >= entry[1]:
+                entry[0], entry[1] = sample.value, ts
+            if newest_us is None or ts > newest_us:
+                newest_us = ts
+            self.samples += 1
+
+        # Fim do log: completa a grade até t1 ou até a amostra mais recente
+        end_us = t1_us if t1_us is not None else newest_us
+        while next_us is not None and end_us is not None and next_us <= end_us:
+            yield next_us, self.snapshot(next_us)
+            self.snapshots += 1
+            next_us += period_us
+
+
+def wide_record(t_us: int, values: Dict[str, Any]) -> Dict[str, Any]:
+    """ Registro no formato dos snapshots da assinatura (timestamp_local + uma coluna por tag). """
+    local = datetime.datetime.fromtimestamp(t_us // 1_000_000).replace(microsecond=t_us % 1_000_000)
+    record = {WIDE_TIMESTAMP: local.isoformat(timespec="microseconds")}
+    record.update(values)
+    return record
+
+
+def long_records(samples: Iterable[LogSample], changes_only: bool = False,
+                 table: Optional[TagTable] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Registros no formato do log de polling (timestamp_utc, node_id, value,
+    display_name, data_type). Colunas de snapshots largos (só o nome curto)
+    recebem NodeId e tipo da tabela de tags, quando a tag existe nela. Com
+    changes_only, só as mudanças de valor de cada tag.
+    """
+    known = {}
+    if table is not None:
+        known = {tag.name: (table.node_id(tag), tag.datatype) for tag in table.tags}
+    missing = object()
+    last: Dict[str, Any] = {}
+    for sample in samples:
+        node_id, data_type = sample.node_id, sample.data_type
+        if node_id == sample.name and node_id in known:
+            node_id, data_type = known[node_id]
+        if changes_only:
+            previous = last.get(node_id, missing)
+            if previous is not missing and previous == sample.value and type(previous) is type(sample.value):
+                continue
+            last[node_id] = sample.value
+        yield {"timestamp_utc": sample.timestamp_us / 1_000_000, "node_id": node_id, "value": sample.value,
+               "display_name": sample.name, "data_type": data_type}
+
+
+def write_ndjson(records: Iterable[Dict[str, Any]], target: str) -> int:
+    """ Grava os registros em NDJSON ("-" = saída padrão). Retorna quantos. """
+    f = sys.stdout if target == "-" else open(target, "w", encoding="utf-8")
+    count = 0
+    try:
+        encode = json.JSONEncoder(default=str).encode
+        for record in records:
+            f.write(encode(record))
+            f.write("\n")
+            count += 1
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversão em fluxo entre logs longos (por tag) e largos (snapshots).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    wide = sub.add_parser("wide", help="Snapshots largos numa grade regular (junção as-of dos logs).")
+    wide.add_argument("logs", nargs="+", help="Logs NDJSON (intercalados por timestamp).")
+    wide.add_argument("-o", "--output", default="-", help="Arquivo NDJSON de saída (padrão: saída padrão).")
+    wide.add_argument("--period", type=float, default=1.0, help="Intervalo entre snapshots (s).")
+    wide.add_argument("--t0", default=None, help="Início (epoch em s ou ISO 8601; sem fuso = UTC, ex.: 2025-11-19T21:00:00-03:00 para hora local; padrão: primeira amostra).")
+    wide.add_argument("--t1", default=None, help="Fim (epoch em s ou ISO 8601; sem fuso = UTC; padrão: última amostra).")
+    wide.add_argument("--columns", nargs="*", default=None, help="Colunas fixas (padrão: as tags, na ordem em que aparecem).")
+    wide.add_argument("--key", choices=("name", "node_id"), default="name", help="Coluna por nome curto ou por NodeId.")
+    wide.add_argument("--max-age", type=float, default=None, help="Valores mais velhos que isso (s) viram null.")
+    wide.add_argument("--reorder", type=float, default=0.0, help="Janela de reordenação de amostras atrasadas (s).")
+
+    long = sub.add_parser("long", help="Registros longos (formato do log de polling).")
+    long.add_argument("logs", nargs="+", help="Logs NDJSON (intercalados por timestamp).")
+    long.add_argument("-o", "--output", default="-", help="Arquivo NDJSON de saída (padrão: saída padrão).")
+    long.add_argument("--changes", action="store_true", help="Só as mudanças de valor de cada tag.")
+    long.add_argument("--reorder", type=float, default=0.0, help="Janela de reordenação de amostras atrasadas (s).")
+    args = parser.parse_args()
+
+    def parse_time(value):
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+    started = time.perf_counter()
+    samples = merge_samples(args.logs, args.reorder)
+    if args.command == "wide":
+        join = AsOfJoin(args.period, args.columns, args.key, args.max_age, parse_time(args.t0), parse_time(args.t1))
+        count = write_ndjson((wide_record(t_us, values) for t_us, values in join.run(samples)), args.output)
+        summary = f"{join.samples} amostras -> {count} snapshots ({join.late} atrasadas)"
+    else:
+        count = write_ndjson(long_records(samples, args.changes, load_tag_table()), args.output)
+        summary = f"{count} registros longos"
+    print(f"✅ {summary} em {time.perf_counter() - started:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# --- Métricas internas (servidor e logger) ---
+#
+# Histogramas de latência com custo O(1) por amostra, contadores e gauges,
+# reunidos em um MetricsRegistry que pode ser exportado em texto/JSON por HTTP
+# (serve_http) e publicado como variáveis OPC UA de diagnóstico
+# (pasta Diagnostico/<componente>, ver DIAGNOSTIC_METRICS).
+
+DIAGNOSTIC_FOLDER = "Diagnostico"
+# Estatísticas publicadas como variáveis para cada histograma
+HISTOGRAM_STATS = ("p50_us", "p99_us", "max_us", "count")
+# Métricas publicadas como variáveis de diagnóstico: {componente: {métrica: "histogram" | "counter"}}.
+# O servidor cria as variáveis de todos os componentes; cada processo escreve as suas.
+DIAGNOSTIC_METRICS = {
+    "Servidor": {
+        "competicao": "histogram",              # BoxCompetitor.run_competition
+        "ciclo_duracao": "histogram",           # Tarefas de um ciclo do TickScheduler
+        "ciclo_despertar": "histogram",         # Atraso entre o deadline e o início do ciclo
+        "flush_tags": "histogram",              # Escrita em lote do TagCache
+        "ciclo_overruns": "counter",
+    },
+    "Logger": {
+        "notificacao_latencia": "histogram",    # SourceTimestamp do servidor -> processamento no logger
+        "notificacao_processamento": "histogram",
+        "log_lote": "histogram",                # Gravação de um lote pelo writer
+        "notificacoes": "counter",
+        "log_descartados": "counter",
+    },
+}
+DIAGNOSTIC_PERIOD_S = 1.0
+
+
+class LatencyHistogram(object):
+    """
+    Histograma de latências log-linear (estilo HDR) em microssegundos: valores
+    abaixo de 2^(SUB_BITS+1) µs são exatos e, acima disso, cada potência de 2 é
+    dividida em 2^SUB_BITS buckets (erro relativo <= 1/2^SUB_BITS, ~3%).
+    Registrar um valor é O(1) e não aloca memória. Pensado para um único
+    produtor por histograma; leituras concorrentes (HTTP) veem um retrato
+    aproximado.
+    """
+    SUB_BITS = 5
+    MAX_US = 1 << 40  # ~12 dias; valores maiores caem no último bucket
+
+    def __init__(self):
+        self._sub = 1 << self.SUB_BITS
+        self.counts = [0] * (self._index(self.MAX_US) + 1)
+        self.total = 0
+        self.max_ns = 0
+        self.sum_ns = 0
+
+    def _index(self, value_us: int) -> int:
+        shift = value_us.bit_length() - self.SUB_BITS - 1
+        if shift <= 0:
+            return value_us
+        return shift * self._sub + (value_us >> shift)
+
+    def _upper_us(self, index: int) -> int:
+        """ Limite superior (exclusivo) do bucket, em µs. """
+        if index < 2 * self._sub:
+            return index + 1
+        shift = index // self._sub - 1
+        return (index - shift * self._sub + 1) << shift
+
+    def record(self, value_ns: int):
+        if value_ns < 0:
+            value_ns = 0
+        value_us = min(value_ns // 1000, self.MAX_US)
+        self.counts[self._index(value_us)] += 1
+        self.total += 1
+        self.sum_ns += value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def percentile(self, p: float) -> float:
+        """ Limite superior (µs) do bucket que contém o percentil p (0-100). """
+        if not self.total:
+            return 0.0
+        target = self.total * p / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return float(self._upper_us(index))
+        return float(self.MAX_US)
+
+    def mean_us(self) -> float:
+        return self.sum_ns / self.total / 1000.0 if self.total else 0.0
+
+    def summary(self) -> str:
+        return (f"média {self.mean_us():.1f}µs | p50 <{self.percentile(50):.0f}µs | "
+                f"p99 <{self.percentile(99):.0f}µs | máx {self.max_ns / 1000.0:.1f}µs")
+
+    def buckets(self) -> List[tuple]:
+        """ Buckets não vazios como (limite_inferior_us, limite_superior_us, contagem). """
+        return [(self._upper_us(index - 1) if index else 0, self._upper_us(index), count)
+                for index, count in enumerate(self.counts) if count]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.total,
+            "mean_us": self.mean_us(),
+            "p50_us": self.percentile(50),
+            "p90_us": self.percentile(90),
+            "p99_us": self.percentile(99),
+            "p999_us": self.percentile(99.9),
+            "max_us": self.max_ns / 1000.0,
+        }
+
+
+class Timer(object):
+    """ Context manager que registra a duração do bloco em um LatencyHistogram. """
+    __slots__ = ("histogram", "_start")
+
+    def __init__(self, histogram: LatencyHistogram):
+        self.histogram = histogram
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.record(time.perf_counter_ns() - self._start)
+
+
+def timed(func: Callable, histogram: LatencyHistogram) -> Callable:
+    """ Envolve func para registrar a duração de cada chamada em histogram. """
+    perf_counter_ns = time.perf_counter_ns
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.record(perf_counter_ns() - start)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+class MetricsRegistry(object):
+    """
+    Conjunto nomeado de histogramas, contadores e gauges de um processo.
+
+    - histogram(nome) / timer(nome): cria (ou devolve) o histograma;
+    - add_histogram(nome, hist): registra um histograma já existente (ex.: os do TickScheduler);
+    - counter(nome, n): soma n ao contador;
+    - gauge(nome, fn): valor lido de fn() a cada exportação (ex.: lambda: writer.dropped).
+    """
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.started = time.time()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+
+    def add_histogram(self, name: str, histogram: LatencyHistogram) -> LatencyHistogram:
+        self.histograms[name] = histogram
+        return histogram
+
+    def timer(self, name: str) -> Timer:
+        return Timer(self.histogram(name))
+
+    def counter(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name: str, fn: Callable[[], float]):
+        self.gauges[name] = fn
+
+    def value(self, name: str) -> float:
+        """ Valor atual de um contador ou gauge. """
+        if name in self.gauges:
+            return float(self.gauges[name]())
+        return float(self.counters.get(name, 0))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uptime_s": time.time() - self.started,
+            "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            "counters": {name: self.value(name) for name in list(self.counters) + list(self.gauges)},
+        }
+
+    def render_text(self, prefix: str = "") -> str:
+        """ Formato texto simples (compatível com o de exposição do Prometheus). """
+        lines = []
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{prefix}{name}_us"
+            snapshot = histogram.snapshot()
+            lines.append(f"# TYPE {metric} summary")
+            for quantile, key in (("0.5", "p50_us"), ("0.9", "p90_us"), ("0.99", "p99_us"), ("0.999", "p999_us")):
+                lines.append(f'{metric}{{quantile="{quantile}"}} {snapshot[key]:g}')
+            lines.append(f"{metric}_sum {histogram.sum_ns / 1000.0:g}")
+            lines.append(f"{metric}_count {histogram.total}")
+            lines.append(f"{metric}_max {snapshot['max_us']:g}")
+        for name in sorted(list(self.counters) + list(self.gauges)):
+            lines.append(f"{prefix}{name} {self.value(name):g}")
+        return "\n".join(lines) + "\n"
+
+    def diagnostic_values(self, component: str) -> Dict[str, float]:
+        """ Valores das variáveis de diagnóstico do componente (ver DIAGNOSTIC_METRICS). """
+        values = {}
+        for metric, kind in DIAGNOSTIC_METRICS[component].items():
+            if kind == "histogram":
+                snapshot = self.histogram(metric).snapshot()
+                for stat in HISTOGRAM_STATS:
+                    values[f"{metric}_{stat}"] = float(snapshot[stat])
+            else:
+                values[metric] = self.value(metric)
+        return values
+
+
+def diagnostic_variable_names(component: str) -> List[str]:
+    names = []
+    for metric, kind in DIAGNOSTIC_METRICS[component].items():
+        names.extend([f"{metric}_{stat}" for stat in HISTOGRAM_STATS] if kind == "histogram" else [metric])
+    return names
+
+
+def diagnostic_node_id(component: str, name: str, ns_index: int) -> str:
+    return f"ns={ns_index};s={DIAGNOSTIC_FOLDER}.{component}.{name}"
+
+
+# --- Exportação HTTP ---
+
+def serve_http(registry: MetricsRegistry, port: int, host: str = "127.0.0.1",
+               prefix: str = "") -> Optional[ThreadingHTTPServer]:
+    """
+    Exporta o registry em http://host:port/metrics (texto) e /metrics.json,
+    numa thread de fundo. Retorna o servidor (shutdown() para encerrar), ou
+    None se a porta não puder ser aberta: métricas são opcionais e não
+    derrubam quem as exporta.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body = json.dumps(registry.snapshot(), indent=2).encode("utf-8")
+                content_type = "application/json"
+            elif self.path.startswith("/metrics"):
+                body = registry.render_text(prefix).encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Sem log por requisição no console
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as exc:
+        print(f"⚠️ Métricas HTTP desativadas: porta {host}:{port} indisponível ({exc}).")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+# --- Variáveis OPC UA de diagnóstico ---
+
+def build_diagnostic_nodes(parent, ns_index: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Cria (no servidor python-opcua) a pasta Diagnostico com uma subpasta e as
+    variáveis Double de cada componente. Retorna {componente: {variável: Node}}.
+    """
+    from opcua import ua
+
+    root = parent.add_folder(ua.NodeId(DIAGNOSTIC_FOLDER, ns_index), DIAGNOSTIC_FOLDER)
+    nodes = {}
+    for component in DIAGNOSTIC_METRICS:
+        folder = root.add_folder(ua.NodeId(f"{DIAGNOSTIC_FOLDER}.{component}", ns_index), component)
+        nodes[component] = {}
+        for name in diagnostic_variable_names(component):
+            node = folder.add_variable(ua.NodeId(f"{DIAGNOSTIC_FOLDER}.{component}.{name}", ns_index), name,
+                                       ua.Variant(0.0, ua.VariantType.Double))
+            node.set_writable()
+            nodes[component][name] = node
+    return nodes
+
+
+class DiagnosticsPublisher(object):
+    """
+    Publica os valores de diagnóstico de um componente nas variáveis
+    Diagnostico.<componente>.* do servidor, com uma escrita em lote por ciclo.
+    'client' é um opcua.Client (publish) ou asyncua.Client (publish_async).
+    Se o servidor não tiver as variáveis, avisa uma vez e desiste.
+    """
+    def __init__(self, client, registry: MetricsRegistry, component: str, ns_index: int,
+                 period_s: float = DIAGNOSTIC_PERIOD_S):
+        self.client = client
+        self.registry = registry
+        self.component = component
+        self.period_s = period_s
+        self.names = diagnostic_variable_names(component)
+        self.nodes = [client.get_node(diagnostic_node_id(component, name, ns_index)) for name in self.names]
+        self.enabled = True
+        self.published = 0
+        self._next = 0.0
+
+    def due(self) -> bool:
+        now = time.monotonic()
+        if not self.enabled or now < self._next:
+            return False
+        self._next = now + self.period_s
+        return True
+
+    def _variants(self, ua) -> list:
+        values = self.registry.diagnostic_values(self.component)
+        return [ua.Variant(values[name], ua.VariantType.Double) for name in self.names]
+
+    def _failed(self, error: Exception):
+        self.enabled = False
+        print(f"⚠️ Variáveis de diagnóstico indisponíveis no servidor ({error}); publicação desativada.")
+
+    def publish(self):
+        from opcua import ua
+
+        try:
+            self.client.set_values(self.nodes, self._variants(ua))
+            self.published += 1
+        except Exception as e:
+            self._failed(e)
+
+    async def publish_async(self):
+        from asyncua import ua
+
+        try:
+            await self.client.write_values(self.nodes, self._variants(ua))
+            self.published += 1
+        except Exception as e:
+            self._failed(e)
@@ -0,0 +1,225 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from controller.Metrics import LatencyHistogram
+
+FSYNC_POLICIES = ("never", "flush", "interval")
+
+
+class BufferedNdjsonWriter(object):
+    """
+    Estágio de escrita NDJSON desacoplado de quem produz os registros.
+
+    write() apenas coloca o registro numa fila limitada (não faz I/O nem
+    serialização); uma thread de fundo drena a fila em lotes, serializa as
+    linhas e as grava no arquivo, que fica aberto.
+
+    - Flush por tamanho (batch_size linhas) ou por tempo (flush_interval_s).
+    - Política de fsync: "never" (só o flush do Python), "flush" (fsync a cada
+      lote gravado) ou "interval" (no máximo um fsync a cada fsync_interval_s).
+    - Rotação opcional por tamanho: <arquivo> -> <arquivo>.1 -> ... -> <arquivo>.<backup_count>.
+    - close() drena a fila e grava tudo o que estiver pendente.
+    - A duração de cada gravação de lote fica no histograma 'batch_time'.
+    - 'formatter' (opcional) converte cada registro na thread de escrita,
+      antes da serialização: o produtor pode enfileirar tuplas compactas em
+      vez de montar o dict (ver SubHandler.to_line). O resultado pode ser um
+      dict ou, se accepts_lines, a linha JSON já pronta (str). Um registro
+      que o formatter (ou o json.dumps) não consegue converter é descartado
+      e contado em 'errors'; os demais registros do lote são gravados.
+
+    Se a fila enche, o comportamento depende de 'block': False (padrão)
+    descarta o registro e incrementa 'dropped', para nunca travar a thread de
+    notificações; True espera por espaço.
+    """
+    _STOP = object()
+    accepts_lines = True
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 500, flush_interval_s: float = 0.5,
+                 fsync: str = "never", fsync_interval_s: float = 5.0, rotate_bytes: Optional[int] = None,
+                 backup_count: int = 5, block: bool = False,
+                 formatter: Optional[Callable[[Any], Dict[str, Any]]] = None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync inválida '{fsync}'. Use uma de: {', '.join(FSYNC_POLICIES)}.")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.fsync = fsync
+        self.fsync_interval_s = fsync_interval_s
+        self.rotate_bytes = rotate_bytes
+        self.backup_count = backup_count
+        self.block = block
+        self.formatter = formatter
+
+        # Contadores
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+        self.batch_time = LatencyHistogram()
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="ndjson-writer", daemon=True)
+        self._thread.start()
+
+    # --- Lado do produtor ---
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """ Enfileira um registro. Retorna False se ele foi descartado (fila cheia ou writer fechado). """
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            if self.block:
+                self._queue.put(record)
+            else:
+                self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """ Grava tudo o que estiver na fila, fecha o arquivo e encerra a thread de fundo. """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Thread de fundo ---
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+        self._open()
+
+    def _format(self, batch):
+        """ Aplica o formatter a cada registro; os que falham são descartados (contados em 'errors'). """
+        formatter, formatted, failed = self.formatter, [], None
+        for record in batch:
+            try:
+                formatted.append(formatter(record))
+            except Exception as e:
+                self.errors += 1
+                failed = e
+        if failed is not None:
+            print(f"🚨 ERRO ao formatar {len(batch) - len(formatted)} registro(s) de log: {failed!r}")
+        return formatted
+
+    def _lines(self, batch):
+        """ Linhas JSON do lote; registros que não serializam são descartados (contados em 'errors'). """
+        lines, failed = [], None
+        for record in batch:
+            if type(record) is str:
+                lines.append(record)
+                continue
+            try:
+                lines.append(json.dumps(record, default=str))
+            except Exception as e:
+                self.errors += 1
+                failed = e
+        if failed is not None:
+            print(f"🚨 ERRO ao serializar {len(batch) - len(lines)} registro(s) de log: {failed!r}")
+        return lines
+
+    def _write_batch(self, batch):
+        lines = self._lines(batch)
+        if not lines:
+            return
+        try:
+            if self._file is None:
+                self._open()
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+
+            now = time.monotonic()
+            if self.fsync == "flush" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval_s):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+
+            self.written += len(lines)
+            self.batches += 1
+
+            if self.rotate_bytes and self._file.tell() >= self.rotate_bytes:
+                self._rotate()
+        except Exception as e:
+            self.errors += 1
+            print(f"🚨 ERRO ao escrever no arquivo de log: {e}")
+
+    def _timed_write(self, batch):
+        start = time.perf_counter_ns()
+        if self.formatter is not None:
+            batch = self._format(batch)
+        if batch:
+            self._write_batch(batch)
+        self.batch_time.record(time.perf_counter_ns() - start)
+
+    def _run(self):
+        batch = []
+        deadline = None  # Prazo de flush do lote atual (conta a partir do primeiro registro)
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                # Drena o que já estiver na fila sem bloquear
+                while True:
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    if not batch:
+                        deadline = time.monotonic() + self.flush_interval_s
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._timed_write(batch)
+                batch = []
+                deadline = None
+
+        # Encerramento: drena qualquer resto e fecha o arquivo
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                batch.append(item)
+        if batch:
+            self._timed_write(batch)
+        if self._file is not None:
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
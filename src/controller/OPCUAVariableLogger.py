@@ -1,114 +1,493 @@
 from opcua import Client, ua
 import time
-import json
 import datetime
+import json
 import os
+import threading
+from typing import List, NamedTuple, Tuple
+
+from controller.KpiEngine import KPI_FOLDER, KpiEngine, KpiPublisher
+from controller.Metrics import DiagnosticsPublisher, MetricsRegistry, serve_http
+from controller.NdjsonWriter import BufferedNdjsonWriter
+from controller.TagRegistry import TagRegistry
+from controller.TagTable import load_tag_table
 
 # --- Configuração do Log ---
 LOG_FILE_PATH = "..\\..\\logs\\opcua_variable_log.ndjson"
+# "ndjson" (texto, uma linha por evento) ou "columnar" (binário .ocol, ver controller.ColumnarLog)
+LOG_FORMAT = "ndjson"
+LOG_FORMATS = ("ndjson", "columnar")
+
+
+class Deadband(NamedTuple):
+    """
+    Banda morta de uma tag numérica: a mudança só é registrada quando o valor se
+    afasta do último valor *registrado* mais que max(absolute, |ref| * percent / 100).
+    Com os dois em zero qualquer mudança é registrada.
+    """
+    absolute: float = 0.0
+    percent: float = 0.0
+
+
+# --- Modo "somente mudanças" (report-by-exception) ---
+# Booleanos e inteiros (contadores) são registrados a cada mudança; Float/Double
+# quando passam da banda morta. Inteiros só usam banda morta se tiverem uma em TAG_DEADBANDS.
+# Um keyframe com o valor de todas as tags é gravado a cada KEYFRAME_INTERVAL_S
+# (e no início) para que o estado possa ser reconstruído a partir do log.
+CHANGE_ONLY = False
+DEFAULT_DEADBAND = Deadband(absolute=0.0, percent=1.0)      # Só para Float/Double
+ANALOG_DATATYPES = ("Float", "Double")
+# Exceções por tag (nome curto ou NodeId), ex.: {"FACTORY_IO_CameraPosition": Deadband(absolute=0.5)}
+TAG_DEADBANDS = {}
+# Marca da banda morta padrão (SubHandler.deadband) no cache por índice do SubHandler
+_ANALOG_DEFAULT = object()
+KEYFRAME_INTERVAL_S = 60.0
+
+# Lista de NodeIds a serem monitorados, gerada a partir da tabela de tags do servidor
+# (NodeIds string estáveis, ex.: "ns=2;s=Linha_Triagem_IIoT.Contadores_PLC.C_TOTAL").
+# O índice do namespace é confirmado no servidor durante a conexão (ver __main__).
+# As variáveis de KPI (pasta KPIs_Linha) são escritas por este logger e não são monitoradas.
+TAG_TABLE = load_tag_table()
+NODES_TO_MONITOR = TAG_TABLE.node_ids(exclude_folders=(KPI_FOLDER,))
+
+
+class SubscriptionGroup(NamedTuple):
+    """
+    Uma assinatura com os itens monitorados das pastas 'folders' da tabela de tags.
+
+    sampling_interval_ms é a taxa com que o servidor amostra cada item e
+    queue_size quantas amostras ele guarda entre duas publicações: com fila > 1
+    as bordas rápidas (ex.: encoder) não se perdem mesmo com publicação mais lenta.
+    """
+    name: str
+    folders: Tuple[str, ...]
+    publishing_interval_ms: float
+    sampling_interval_ms: float
+    queue_size: int = 1
+
+
+# --- Topologia das assinaturas ---
+# Sensores e encoder rápidos; variáveis internas do Factory I/O (quase estáticas) lentas.
+SUBSCRIPTION_GROUPS = (
+    SubscriptionGroup("encoder", ("IOs_Encoder",), publishing_interval_ms=50, sampling_interval_ms=5, queue_size=100),
+    SubscriptionGroup("sensores", ("IOs_Sensores_Fisicos",), publishing_interval_ms=50, sampling_interval_ms=10, queue_size=10),
+    SubscriptionGroup("atuadores", ("IOs_Atuadores_Fisicos", "Contadores_PLC"), publishing_interval_ms=100,
+                      sampling_interval_ms=50, queue_size=5),
+    SubscriptionGroup("factory_io", ("IOs_Internos_FactoryIO",), publishing_interval_ms=1000, sampling_interval_ms=500),
+)
+# Pastas que não estão em nenhum grupo (mesmos 200 ms da assinatura única anterior)
+DEFAULT_SUBSCRIPTION_GROUP = SubscriptionGroup("padrao", (), publishing_interval_ms=200, sampling_interval_ms=200)
+
+# --- KPIs em tempo real (controller.KpiEngine) ---
+# Calculados a partir das notificações e publicados de volta no servidor (pasta KPIs_Linha)
+PUBLISH_KPIS = True
+KPI_PUBLISH_PERIOD_S = 0.5
+
+# --- Encaminhamento para a ingestão (controller.Forwarder) ---
+# Os mesmos registros do log local, em lotes comprimidos, para um transporte
+# plugável: "spool" (diretório FORWARD_TARGET) ou "tcp" (broker em host:porta,
+# ver python -m controller.Forwarder). Lotes não entregues ficam em FORWARD_RETRY_DIR.
+FORWARD = False
+FORWARD_TRANSPORT = "spool"
+FORWARD_TARGET = "..\\..\\logs\\ingestao"
+FORWARD_RETRY_DIR = "..\\..\\logs\\ingestao_pendente"
+
+# --- Métricas internas (controller.Metrics) ---
+# Latência das notificações, tempo de processamento e gravação do log, em
+# http://127.0.0.1:METRICS_PORT/metrics (0 desativa) e nas variáveis
+# Diagnostico.Logger.* do servidor.
+METRICS_PORT = 19000        # Fora da faixa do servidor (19100 + processo)
+PUBLISH_DIAGNOSTICS = True
+
+
+def group_node_ids(table, ns_index, groups=SUBSCRIPTION_GROUPS, default=DEFAULT_SUBSCRIPTION_GROUP,
+                   exclude_folders=(KPI_FOLDER,)) -> List[Tuple[SubscriptionGroup, List[str]]]:
+    """ Distribui os NodeIds da tabela pelos grupos de assinatura (grupos vazios são omitidos). """
+    by_folder = {folder: group for group in groups for folder in group.folders}
+    grouped = {}
+    for tag in table.tags:
+        if tag.folder in exclude_folders:
+            continue
+        group = by_folder.get(tag.folder, default)
+        grouped.setdefault(group, []).append(table.node_id(tag, ns_index))
+    return [(group, grouped[group]) for group in list(groups) + [default] if group in grouped]
+
+
+def monitored_item_requests(ua, node_ids, group: SubscriptionGroup):
+    """
+    MonitoredItemCreateRequests de um grupo, para uma única chamada
+    CreateMonitoredItems. 'ua' é o módulo opcua.ua ou asyncua.ua. Os client
+    handles (1..n) só precisam ser únicos dentro da assinatura do grupo.
+    """
+    requests = []
+    for handle, node_id in enumerate(node_ids, 1):
+        item = ua.ReadValueId()
+        item.NodeId = ua.NodeId.from_string(node_id)
+        item.AttributeId = ua.AttributeIds.Value
+        params = ua.MonitoringParameters()
+        params.ClientHandle = handle
+        params.SamplingInterval = group.sampling_interval_ms
+        params.QueueSize = group.queue_size
+        params.DiscardOldest = True
+        request = ua.MonitoredItemCreateRequest()
+        request.ItemToMonitor = item
+        request.MonitoringMode = ua.MonitoringMode.Reporting
+        request.RequestedParameters = params
+        requests.append(request)
+    return requests
+
+
+def read_data_values(client, node_ids):
+    """ DataValues (valor, tipo e SourceTimestamp) de vários nós em um único Read. """
+    params = ua.ReadParameters()
+    for node_id in node_ids:
+        item = ua.ReadValueId()
+        item.NodeId = ua.NodeId.from_string(node_id)
+        item.AttributeId = ua.AttributeIds.Value
+        params.NodesToRead.append(item)
+    return client.uaclient.read(params)
+
+
+def subscribe_groups(client, handler, grouped):
+    """
+    Cria uma assinatura por grupo e registra todos os itens do grupo em uma
+    chamada CreateMonitoredItems. Retorna (assinaturas, [(node_id, resultado)]),
+    onde resultado é o MonitoredItemId ou o StatusCode de erro.
+    """
+    subscriptions, results = [], []
+    for group, node_ids in grouped:
+        subscription = client.create_subscription(group.publishing_interval_ms, handler)
+        subscriptions.append(subscription)
+        results.extend(zip(node_ids, subscription.create_monitored_items(monitored_item_requests(ua, node_ids, group))))
+    return subscriptions, results
+
+
+def make_log_writer(log_file_path, log_format=LOG_FORMAT):
+    """
+    Cria o writer de log do formato pedido. No formato colunar a extensão
+    do arquivo passa a ser .ocol; os dois writers têm a mesma interface.
+    """
+    if log_format == "ndjson":
+        return BufferedNdjsonWriter(log_file_path)
+    if log_format == "columnar":
+        # Import tardio: só o formato colunar depende do NumPy
+        from controller.ColumnarLog import ColumnarLogWriter
+        return ColumnarLogWriter(os.path.splitext(log_file_path)[0] + ".ocol")
+    raise ValueError(f"Formato de log inválido '{log_format}'. Use um de: {', '.join(LOG_FORMATS)}.")
+
+
+def make_forwarder(transport=FORWARD_TRANSPORT, target=FORWARD_TARGET, retry_dir=FORWARD_RETRY_DIR):
+    """ Cria o Forwarder com o transporte configurado. """
+    from controller.Forwarder import Forwarder, make_transport
+
+    return Forwarder(make_transport(transport, target), retry_dir)
+
+
+# Encoder reutilizado por SubHandler.to_line (json.dumps com default=str cria um encoder por chamada)
+_encode_json = json.JSONEncoder(default=str).encode
 
-# Lista de NodeIds a serem monitorados
-NODES_TO_MONITOR = [
-    # Contadores_PLC (ns=2;i=2)
-    "ns=2;i=7",  # C_TOTAL
-    "ns=2;i=8",  # C_APROVADAS
-    "ns=2;i=9",  # C_REJEITADAS
-    
-    # IOs_Sensores_Fisicos (ns=2;i=3)
-    "ns=2;i=10", # Diffuse_Sensor_0
-    "ns=2;i=11", # Diffuse_Sensor_1
-    "ns=2;i=12", # Pusher_0_Back_Limit
-    "ns=2;i=13", # Pusher_0_Front_Limit
-    "ns=2;i=14", # Emergency_Stop_0
-    "ns=2;i=15", # Start_Button_0
-    "ns=2;i=16", # Stop_Button_0
-    "ns=2;i=17", # Reset_Button_0
-    
-    # IOs_Atuadores_Fisicos (ns=2;i=4)
-    "ns=2;i=18", # Belt_Conveyor_6m_0
-    "ns=2;i=19", # Pusher_0
-    "ns=2;i=20", # Emitter_0_Emit
-    "ns=2;i=21", # Emitter_0_Base
-    "ns=2;i=22", # Emitter_0_Part
-    "ns=2;i=23", # Remover_0_Remove
-    "ns=2;i=24", # Remover_1_Remove
-    "ns=2;i=25", # Stack_Light_0_Green
-    "ns=2;i=26", # Stack_Light_0_Red
-    "ns=2;i=27", # Stack_Light_0_Yellow
-    "ns=2;i=28", # Warning_Light_0
-    "ns=2;i=29", # Start_Button_0_Light
-    "ns=2;i=30", # Stop_Button_0_Light
-    "ns=2;i=31", # Reset_Button_0_Light
-    "ns=2;i=32", # Digital_Display_0
-    "ns=2;i=33", # Digital_Display_1
-    
-    # IOs_Encoder (ns=2;i=5)
-    "ns=2;i=34", # Belt_Conveyor_0_Encoder_Signal_A
-    "ns=2;i=35", # Belt_Conveyor_0_Encoder_Signal_B
-    
-    # IOs_Internos_FactoryIO (ns=2;i=6)
-    "ns=2;i=36", # FACTORY_IO_Running
-    "ns=2;i=37", # FACTORY_IO_Reset
-    "ns=2;i=38", # FACTORY_IO_Paused
-    "ns=2;i=39", # FACTORY_IO_Run
-    "ns=2;i=40", # FACTORY_IO_Pause
-    "ns=2;i=41", # FACTORY_IO_TimeScale
-    "ns=2;i=42", # FACTORY_IO_CameraPosition
-]
 
 class SubHandler(object):
     """
     Handler para processar notificações de data change, armazenar o último valor
     e registrar o evento em um arquivo NDJSON.
+
+    A escrita é feita por um BufferedNdjsonWriter: a notificação só enfileira o
+    registro e a gravação em lote acontece numa thread própria, então o disco
+    lento não atrasa a entrega das notificações. Chame close() ao encerrar.
+
+    Com change_only=True só as mudanças reais são registradas (ver Deadband) e
+    keyframe()/maybe_keyframe() gravam o estado completo periodicamente; as
+    notificações descartadas são contadas em 'suppressed'.
+
+    Com um 'forwarder' (controller.Forwarder), cada registro gravado também é
+    enfileirado para a ingestão; como no writer, isso nunca bloqueia.
+
+    O estado das tags fica num TagRegistry (controller.TagRegistry): cada nó
+    recebe um índice na primeira notificação (ou no seed) e a notificação vira
+    uma atualização de arrays por índice. O registro do log é enfileirado
+    como uma tupla (índice, valor, anterior, SourceTimestamp, relógio
+    monotônico) e só vira JSON na thread do writer (to_line, direto para a
+    linha, ou to_record para writers que precisam do dict), sem strings ou
+    dicts criados por evento na thread de notificações.
+
+    Com 'metrics' (controller.Metrics.MetricsRegistry), cada notificação
+    registra a latência desde o SourceTimestamp do servidor e o tempo de
+    processamento no handler; ver register_metrics(). A notificação inicial
+    de cada item (valor atual, com o SourceTimestamp da última mudança) não
+    entra na latência.
     """
-    def __init__(self, log_file_path):
-        # Dicionário para armazenar o último valor lido de cada nó: {node_id_str: last_value}
-        self.last_values = {}
+    def __init__(self, log_file_path, writer=None, change_only=CHANGE_ONLY, deadband=DEFAULT_DEADBAND,
+                 deadbands=None, keyframe_interval_s=KEYFRAME_INTERVAL_S, kpi=None,
+                 forwarder=None, metrics=None, registry=None):
+        # Último valor (e o anterior) de cada nó, por índice
+        self.registry = registry if registry is not None else TagRegistry()
         self.log_file_path = log_file_path
+        self.writer = writer if writer is not None else BufferedNdjsonWriter(log_file_path)
+        self.writer.formatter = self._formatter_for(self.writer)
 
-    def datachange_notification(self, node, val, data):
-        node_id_str = str(node.nodeid)
-        
-        # 1. Obter valor anterior e atualizar o valor armazenado
-        # Usamos .get() para retornar None se for a primeira notificação
-        valor_anterior = self.last_values.get(node_id_str)
-        
-        # 2. Extrair informações do evento
-        # O 'data' é um opcua.Subscription.EventData que contém a DataValue completa
-        
-        # O timestamp do servidor (útil para agrupar eventos simultâneos)
-        server_ts = data.monitored_item.Value.SourceTimestamp
-        timestamp_servidor = server_ts.isoformat() if server_ts else None
-        
-        # O tipo de dado
-        # O VariantType contém o enum do tipo de dado (ex: ua.VariantType.Boolean)
-        data_type = data.monitored_item.Value.Value.VariantType.name
-        
-        # 3. Construir o registro (JSON object)
-        log_entry = {
+        self.change_only = change_only
+        self.deadband = deadband
+        self.deadbands = TAG_DEADBANDS if deadbands is None else deadbands
+        self.keyframe_interval_s = keyframe_interval_s
+        # Último valor efetivamente registrado de cada nó (referência da banda morta)
+        self.last_logged = {}
+        self.suppressed = 0
+        self.keyframes = 0
+        self._next_keyframe = None
+        self._lock = threading.Lock()
+        # KpiEngine opcional: recebe todas as notificações, antes do filtro de mudanças
+        self.kpi = kpi
+        self.forwarder = forwarder
+        if forwarder is not None:
+            forwarder.formatter = self._formatter_for(forwarder)
+        self.metrics = None
+        if metrics is not None:
+            self.register_metrics(metrics)
+
+    def register_metrics(self, metrics):
+        """ Cria os histogramas do handler em 'metrics' e expõe os contadores do writer e do handler. """
+        self.metrics = metrics
+        self._latency = metrics.histogram("notificacao_latencia")
+        self._processing = metrics.histogram("notificacao_processamento")
+        self._latency_nodes = set()
+        metrics.add_histogram("log_lote", self.writer.batch_time)
+        metrics.gauge("notificacoes", lambda: self._processing.total)
+        metrics.gauge("log_gravados", lambda: self.writer.written)
+        metrics.gauge("log_descartados", lambda: self.writer.dropped)
+        metrics.gauge("log_suprimidos", lambda: self.suppressed)
+
+    @property
+    def last_values(self):
+        """ {node_id_str: último valor} (cópia, montada a partir do registro). """
+        return self.registry.snapshot()
+
+    @property
+    def data_types(self):
+        """ {node_id_str: VariantType} dos nós conhecidos. """
+        return dict(zip(self.registry.node_ids, self.registry.datatypes))
+
+    def close(self):
+        """ Grava os registros pendentes, fecha o arquivo de log e encerra o forwarder. """
+        self.writer.close()
+        if self.forwarder is not None:
+            self.forwarder.close()
+
+    def _emit(self, record):
+        self.writer.write(record)
+        if self.forwarder is not None:
+            self.forwarder.write(record)
+
+    def _formatter_for(self, sink):
+        return self.to_line if getattr(sink, "accepts_lines", False) else self.to_record
+
+    def to_line(self, event):
+        """
+        Como to_record, mas já serializado: a linha JSON é montada direto da
+        tupla, sem o dict intermediário (mesmo texto de json.dumps(to_record(event))).
+        """
+        if type(event) is dict:
+            return event
+        index, value, previous, server_ts, local_ns = event
+        registry = self.registry
+        dumps = _encode_json
+        return (f'{{"evento_realizado": "DataChangeNotification", "quem_realizou": "OPCUA_Client", '
+                f'"node_id": {dumps(registry.node_ids[index])}, "valor_atual": {dumps(value)}, '
+                f'"valor_anterior": {dumps(previous)}, "data_type": {dumps(registry.datatypes[index])}, '
+                f'"timestamp_servidor": {dumps(server_ts.isoformat()) if server_ts else "null"}, '
+                f'"timestamp_local_processamento": "{registry.wall_time(local_ns).isoformat(timespec="milliseconds")}"}}')
+
+    def to_record(self, event):
+        """
+        Converte o evento enfileirado por datachange_notification no registro
+        NDJSON de sempre (os keyframes já são dicts e passam direto).
+        Executado na thread do writer/forwarder.
+        """
+        if type(event) is dict:
+            return event
+        index, value, previous, server_ts, local_ns = event
+        registry = self.registry
+        return {
             "evento_realizado": "DataChangeNotification",
             "quem_realizou": "OPCUA_Client", # Identificador do cliente
-            "node_id": node_id_str,
-            "valor_atual": val,
-            "valor_anterior": valor_anterior,
-            "data_type": data_type,
-            "timestamp_servidor": timestamp_servidor,
-            "timestamp_local_processamento": datetime.datetime.now().isoformat(timespec='milliseconds'),
+            "node_id": registry.node_ids[index],
+            "valor_atual": value,
+            "valor_anterior": previous,
+            "data_type": registry.datatypes[index],
+            "timestamp_servidor": server_ts.isoformat() if server_ts else None,
+            "timestamp_local_processamento": registry.wall_time(local_ns).isoformat(timespec='milliseconds'),
         }
 
-        # 4. Escrever no arquivo NDJSON
-        try:
-            with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                # O default=str é usado para garantir que objetos complexos (como datetime.datetime) 
-                # sejam serializados corretamente se ainda não tiverem sido convertidos.
-                json.dump(log_entry, f, default=str) 
-                f.write('\n') # Adiciona o delimitador de nova linha para o formato NDJSON
+    @property
+    def deadbands(self):
+        return self._tag_deadbands
+
+    @deadbands.setter
+    def deadbands(self, deadbands):
+        self._tag_deadbands = deadbands
+        # Banda morta resolvida por índice do registro (ver _deadband_at)
+        self._index_deadbands = []
+
+    def _deadband_at(self, index):
+        """
+        Banda morta da tag 'index' do registro, resolvida uma única vez por
+        índice (no _intern/seed ou na primeira consulta, para tags que já
+        vieram no registro): a de TAG_DEADBANDS pelo NodeId ou pelo nome curto,
+        se houver; senão a padrão para tags analógicas (Float/Double) e nenhuma
+        para as demais, para que um contador Int32 nunca perca um incremento.
+        """
+        resolved = self._index_deadbands
+        registry = self.registry
+        while len(resolved) <= index:
+            i = len(resolved)
+            deadband = self.deadbands.get(registry.node_ids[i])
+            if deadband is None:
+                deadband = self.deadbands.get(registry.names[i])
+            if deadband is None and registry.datatypes[i] in ANALOG_DATATYPES:
+                deadband = _ANALOG_DEFAULT
+            resolved.append(deadband)
+        deadband = resolved[index]
+        # A padrão é lida na hora: self.deadband pode mudar depois da resolução
+        return self.deadband if deadband is _ANALOG_DEFAULT else deadband
 
-        except Exception as e:
-            print(f"🚨 ERRO ao escrever no arquivo de log: {e}")
+    def _deadband_for(self, node_id_str, val):
+        """ Banda morta de uma tag pelo NodeId; fora do registro, decide pelo tipo do valor. """
+        index = self.registry.get_index(node_id_str)
+        if index is not None:
+            return self._deadband_at(index)
+        deadband = self.deadbands.get(node_id_str)
+        if deadband is None:
+            deadband = self.deadbands.get(node_id_str.rsplit(".", 1)[-1])
+        if deadband is None and isinstance(val, float):
+            return self.deadband
+        return deadband
 
-        # 5. Atualiza o valor após o log (para o valor anterior ser correto no próximo evento)
-        self.last_values[node_id_str] = val
+    def is_change(self, node_id_str, val, index=None):
+        """ Indica se 'val' deve ser registrado no modo somente mudanças ('index': índice da tag, se já conhecido). """
+        if node_id_str not in self.last_logged:
+            return True
+        ref = self.last_logged[node_id_str]
+        numeric = (int, float)
+        if isinstance(val, bool) or isinstance(ref, bool) or not isinstance(val, numeric) or not isinstance(ref, numeric):
+            # Booleanos (borda) e demais tipos: qualquer diferença
+            return val != ref
+        deadband = self._deadband_for(node_id_str, val) if index is None else self._deadband_at(index)
+        if deadband is None:
+            return val != ref
+        return abs(val - ref) > max(deadband.absolute, abs(ref) * deadband.percent / 100.0)
+
+    def keyframe(self):
+        """ Registra o último valor de todos os nós (evento "Keyframe") e reinicia as referências da banda morta. """
+        timestamp_local = datetime.datetime.now().isoformat(timespec='milliseconds')
+        registry = self.registry
+        with self._lock:
+            snapshot = [(index, node_id_str, registry.get(index)) for index, node_id_str in enumerate(registry.node_ids)
+                        if registry.has_value(index)]
+            self.last_logged.update((node_id_str, value) for _, node_id_str, value in snapshot)
+            self._next_keyframe = time.monotonic() + self.keyframe_interval_s if self.keyframe_interval_s else None
+        for index, node_id_str, value in snapshot:
+            self._emit({
+                "evento_realizado": "Keyframe",
+                "quem_realizou": "OPCUA_Client",
+                "node_id": node_id_str,
+                "valor_atual": value,
+                "valor_anterior": None,
+                "data_type": registry.datatypes[index],
+                "timestamp_servidor": None,
+                "timestamp_local_processamento": timestamp_local,
+            })
+        self.keyframes += 1
+
+    def maybe_keyframe(self):
+        """ Grava um keyframe se o intervalo venceu (chamar periodicamente no loop principal). """
+        if self.change_only and self._next_keyframe is not None and time.monotonic() >= self._next_keyframe:
+            self.keyframe()
+
+    def seed(self, node_id_str, data_value):
+        """ Inicializa o último valor (e o tipo) de um nó a partir de uma DataValue lida. """
+        index = self.registry.intern(node_id_str, data_value.Value.VariantType.name)
+        self.registry.set(index, data_value.Value.Value)
+        self._deadband_at(index)
+        # O valor lido é a referência inicial: a notificação inicial da assinatura não conta como mudança
+        self.last_logged[node_id_str] = data_value.Value.Value
+        if self.kpi is not None:
+            self.kpi.datachange(node_id_str, data_value.Value.Value, data_value.SourceTimestamp)
+
+    def datachange_notification(self, node, val, data):
+        if self.metrics is None:
+            self._handle_datachange(node, val, data)
+            return
+        start = time.perf_counter_ns()
+        source_ts = data.monitored_item.Value.SourceTimestamp
+        if node.nodeid not in self._latency_nodes:
+            self._latency_nodes.add(node.nodeid)
+        elif source_ts is not None:
+            # SourceTimestamp vem em UTC (sem tzinfo no python-opcua)
+            if source_ts.tzinfo is None:
+                source_ts = source_ts.replace(tzinfo=datetime.timezone.utc)
+            self._latency.record(int((time.time() - source_ts.timestamp()) * 1e9))
+        self._handle_datachange(node, val, data)
+        self._processing.record(time.perf_counter_ns() - start)
+
+    def _intern(self, node, data):
+        """ Primeira notificação de um nó: registra o índice (com o ua.NodeId como alias). """
+        # O VariantType contém o enum do tipo de dado (ex: ua.VariantType.Boolean)
+        data_type = data.monitored_item.Value.Value.VariantType.name
+        index = self.registry.intern(node.nodeid.to_string(), data_type)
+        self.registry.alias(node.nodeid, index)
+        self._deadband_at(index)
+        return index
+
+    def _handle_datachange(self, node, val, data):
+        registry = self.registry
+        index = registry.get_index(node.nodeid)
+        if index is None:
+            index = self._intern(node, data)
+        # String do NodeId interna ao registro (a mesma a cada evento)
+        node_id_str = registry.node_ids[index]
+
+        # O timestamp do servidor (útil para agrupar eventos simultâneos)
+        server_ts = data.monitored_item.Value.SourceTimestamp
+        if self.kpi is not None:
+            self.kpi.datachange(node_id_str, val, server_ts)
+
+        if self.change_only:
+            with self._lock:
+                if not self.is_change(node_id_str, val, index):
+                    registry.set(index, val)
+                    self.suppressed += 1
+                    return
+                self.last_logged[node_id_str] = val
+
+        # Enfileira o evento compacto; o writer monta o registro NDJSON (to_record).
+        # O valor anterior é o atual do registro (None se for a primeira notificação).
+        # Se a fila estiver cheia o registro é descartado e contado em writer.dropped
+        now_ns = time.monotonic_ns()
+        self._emit((index, val, registry.get(index), server_ts, now_ns))
+
+        # Atualiza o valor após o log (para o valor anterior ser correto no próximo evento)
+        registry.set(index, val, now_ns)
+
+
+def print_kpi_window(start, end, kpis):
+    """ Resumo de uma janela fixa de KPIs encerrada (callback do KpiEngine). """
+    inicio = datetime.datetime.fromtimestamp(start).strftime("%H:%M")
+    fim = datetime.datetime.fromtimestamp(end).strftime("%H:%M")
+    print(f"📊 KPIs {inicio}-{fim}: OEE {kpis['oee']:.1%} | disponibilidade {kpis['availability']:.1%} | "
+          f"rejeição {kpis['rejection_rate']:.1%} | {kpis['total']} peças | {kpis['timeouts']} timeouts")
+
+
+def rebuild_state(records, until=None):
+    """
+    Reconstrói o estado {node_id: valor} a partir dos registros de um log
+    (keyframes + mudanças), opcionalmente só até o timestamp local 'until' (ISO 8601).
+    """
+    state = {}
+    for record in records:
+        if until is not None and record["timestamp_local_processamento"] > until:
+            break
+        state[record["node_id"]] = record["valor_atual"]
+    return state
 
 
 if __name__ == "__main__":
@@ -120,34 +499,58 @@ if __name__ == "__main__":
         client.connect()
         print(f"✅ Cliente conectado ao servidor em {server_url}")
 
-        # 2. Criação do Handler e Assinatura
-        # Inicializa o handler passando o caminho do arquivo de log
-        handler = SubHandler(LOG_FILE_PATH)
-        # Cria uma assinatura com um intervalo de amostragem (200ms)
-        subscription = client.create_subscription(200, handler)
+        # Resolve o índice do namespace da tabela de tags neste servidor
+        ns_index = client.get_namespace_index(TAG_TABLE.namespace_uri)
+        grouped = group_node_ids(TAG_TABLE, ns_index)
+        NODES_TO_MONITOR = [node_id for _, node_ids in grouped for node_id in node_ids]
 
-        # 3. Inscrição para todos os Nodes
-        nodes_count = 0
-        print(f"\n📝 Arquivo de log: {LOG_FILE_PATH}")
+        # 2. Criação do Handler
+        kpi_engine = KpiEngine(on_window_closed=print_kpi_window) if PUBLISH_KPIS else None
+        metrics = MetricsRegistry()
+        handler = SubHandler(LOG_FILE_PATH, writer=make_log_writer(LOG_FILE_PATH, LOG_FORMAT), kpi=kpi_engine,
+                             forwarder=make_forwarder() if FORWARD else None, metrics=metrics)
+        publisher = KpiPublisher(client, TAG_TABLE, ns_index, period_s=KPI_PUBLISH_PERIOD_S) if PUBLISH_KPIS else None
+        diagnostics = DiagnosticsPublisher(client, metrics, "Logger", ns_index) if PUBLISH_DIAGNOSTICS else None
+        if METRICS_PORT and serve_http(metrics, METRICS_PORT, prefix="logger_"):
+            print(f"📈 Métricas em http://127.0.0.1:{METRICS_PORT}/metrics")
+        print(f"\n📝 Arquivo de log: {handler.writer.path}")
+
+        # Inicializa os valores no handler com uma única leitura de todos os nós
+        # (garante o primeiro 'valor_anterior' como o valor inicial lido)
+        for node_id_str, data_value in zip(NODES_TO_MONITOR, read_data_values(client, NODES_TO_MONITOR)):
+            if data_value.StatusCode.is_good():
+                handler.seed(node_id_str, data_value)
+
+        # 3. Uma assinatura por grupo de tags, cada uma com um único CreateMonitoredItems
         print("⏳ Inscrevendo para monitorar os nós...")
-        
-        for node_id_str in NODES_TO_MONITOR:
-            try:
-                node = client.get_node(node_id_str)
-                subscription.subscribe_data_change(node)
-                # Inicializa o valor no handler lendo o valor atual imediatamente (opcional, mas garante o primeiro 'valor_anterior' como o valor inicial lido)
-                handler.last_values[node_id_str] = node.get_value()
+        for group, node_ids in grouped:
+            print(f"   - Grupo '{group.name}': {len(node_ids)} nós, publicação {group.publishing_interval_ms:g} ms, "
+                  f"amostragem {group.sampling_interval_ms:g} ms, fila {group.queue_size}")
+        subscriptions, results = subscribe_groups(client, handler, grouped)
+
+        nodes_count = 0
+        for node_id_str, result in results:
+            if isinstance(result, int):
                 print(f"   - Assinado com sucesso: {node_id_str}")
                 nodes_count += 1
-            except Exception as e:
-                print(f"   - ❌ ERRO ao assinar {node_id_str}: {e}")
+            else:
+                print(f"   - ❌ ERRO ao assinar {node_id_str}: {result}")
 
         print(f"\n✨ Total de {nodes_count} nós monitorados.")
+        if handler.change_only:
+            # Keyframe inicial: estado completo antes da primeira mudança registrada
+            handler.keyframe()
+            print(f"🔎 Modo somente mudanças (keyframe a cada {handler.keyframe_interval_s:g} s).")
         print("📢 Aguardando notificações e registrando em NDJSON... (Pressione Ctrl+C para sair)")
 
         # 4. Loop principal
         while True:
-            time.sleep(0.5)
+            time.sleep(0.25)
+            handler.maybe_keyframe()
+            if publisher is not None and publisher.due():
+                publisher.publish(kpi_engine.kpis())
+            if diagnostics is not None and diagnostics.due():
+                diagnostics.publish()
 
     except KeyboardInterrupt:
         print("\nInterrupção pelo usuário detectada.")
@@ -158,4 +561,17 @@ if __name__ == "__main__":
         if 'client' in locals() and client:
             print("\nDesconectando o cliente.")
             client.disconnect()
-            print("🛑 Cliente desconectado.")
\ No newline at end of file
+            print("🛑 Cliente desconectado.")
+        # 6. Grava o que ainda estiver na fila do log
+        if 'handler' in locals():
+            handler.close()
+            print(f"📝 Log finalizado: {handler.writer.written} registros gravados, {handler.writer.dropped} descartados, "
+                  f"{handler.suppressed} suprimidos (sem mudança).")
+            if handler.forwarder is not None:
+                forwarder = handler.forwarder
+                print(f"📤 Encaminhados: {forwarder.written} registros em {forwarder.batches} lotes, "
+                      f"{forwarder.pending} pendentes em disco, {forwarder.dropped} descartados.")
+            if handler.metrics is not None:
+                print(f"⏱️ Latência das notificações: {handler.metrics.histogram('notificacao_latencia').summary()}")
+                print(f"⏱️ Processamento no handler: {handler.metrics.histogram('notificacao_processamento').summary()}")
+                print(f"⏱️ Gravação de lotes do log: {handler.writer.batch_time.summary()}")
\ No newline at end of file
@@ -0,0 +1,121 @@
+from asyncua import Client, ua
+import asyncio
+
+from controller.KpiEngine import KpiEngine, KpiPublisher
+from controller.Metrics import DiagnosticsPublisher, MetricsRegistry, serve_http
+from controller.OPCUAVariableLogger import (
+    CHANGE_ONLY, FORWARD, KPI_PUBLISH_PERIOD_S, LOG_FILE_PATH, LOG_FORMAT, METRICS_PORT, PUBLISH_DIAGNOSTICS, PUBLISH_KPIS,
+    TAG_TABLE, SubHandler, group_node_ids, make_forwarder, make_log_writer, monitored_item_requests, print_kpi_window,
+)
+
+# Variante asyncio (asyncua) do OPCUAVariableLogger: mesmo SubHandler e mesmo
+# formato NDJSON, mas a assinatura roda no event loop, sem threads por cliente.
+
+SERVER_URL = "opc.tcp://127.0.0.2:4840"
+
+
+async def subscribe_groups(client, handler, grouped):
+    """ Igual a OPCUAVariableLogger.subscribe_groups: uma assinatura e um CreateMonitoredItems por grupo. """
+    subscriptions, results = [], []
+    for group, node_ids in grouped:
+        subscription = await client.create_subscription(group.publishing_interval_ms, handler)
+        subscriptions.append(subscription)
+        items = monitored_item_requests(ua, node_ids, group)
+        results.extend(zip(node_ids, await subscription.create_monitored_items(items)))
+    return subscriptions, results
+
+
+async def run_logger(server_url: str = SERVER_URL, log_file_path: str = LOG_FILE_PATH, log_format: str = LOG_FORMAT,
+                     change_only: bool = CHANGE_ONLY, forward: bool = FORWARD, metrics_port: int = METRICS_PORT):
+    client = Client(server_url)
+    handler = None
+    metrics_server = None
+
+    try:
+        # 1. Conexão
+        await client.connect()
+        print(f"✅ Cliente conectado ao servidor em {server_url}")
+
+        # Resolve o índice do namespace da tabela de tags neste servidor
+        ns_index = await client.get_namespace_index(TAG_TABLE.namespace_uri)
+        grouped = group_node_ids(TAG_TABLE, ns_index)
+        nodes_to_monitor = [node_id for _, node_ids in grouped for node_id in node_ids]
+
+        # 2. Criação do Handler
+        kpi_engine = KpiEngine(on_window_closed=print_kpi_window) if PUBLISH_KPIS else None
+        metrics = MetricsRegistry()
+        handler = SubHandler(log_file_path, writer=make_log_writer(log_file_path, log_format), change_only=change_only,
+                             kpi=kpi_engine, forwarder=make_forwarder() if forward else None, metrics=metrics)
+        publisher = KpiPublisher(client, TAG_TABLE, ns_index, period_s=KPI_PUBLISH_PERIOD_S) if PUBLISH_KPIS else None
+        diagnostics = DiagnosticsPublisher(client, metrics, "Logger", ns_index) if PUBLISH_DIAGNOSTICS else None
+        if metrics_port:
+            metrics_server = serve_http(metrics, metrics_port, prefix="logger_")
+            if metrics_server is not None:
+                print(f"📈 Métricas em http://127.0.0.1:{metrics_port}/metrics")
+        print(f"\n📝 Arquivo de log: {handler.writer.path}")
+
+        # Inicializa os valores no handler com uma única leitura de todos os nós
+        nodes = [client.get_node(node_id_str) for node_id_str in nodes_to_monitor]
+        for node_id_str, data_value in zip(nodes_to_monitor, await client.read_attributes(nodes)):
+            if data_value.StatusCode.is_good():
+                handler.seed(node_id_str, data_value)
+
+        # 3. Uma assinatura por grupo de tags, cada uma com um único CreateMonitoredItems
+        print("⏳ Inscrevendo para monitorar os nós...")
+        for group, node_ids in grouped:
+            print(f"   - Grupo '{group.name}': {len(node_ids)} nós, publicação {group.publishing_interval_ms:g} ms, "
+                  f"amostragem {group.sampling_interval_ms:g} ms, fila {group.queue_size}")
+        subscriptions, results = await subscribe_groups(client, handler, grouped)
+
+        nodes_count = 0
+        for node_id_str, result in results:
+            if isinstance(result, int):
+                print(f"   - Assinado com sucesso: {node_id_str}")
+                nodes_count += 1
+            else:
+                print(f"   - ❌ ERRO ao assinar {node_id_str}: {result}")
+
+        print(f"\n✨ Total de {nodes_count} nós monitorados.")
+        if handler.change_only:
+            # Keyframe inicial: estado completo antes da primeira mudança registrada
+            handler.keyframe()
+            print(f"🔎 Modo somente mudanças (keyframe a cada {handler.keyframe_interval_s:g} s).")
+        print("📢 Aguardando notificações e registrando em NDJSON... (Pressione Ctrl+C para sair)")
+
+        # 4. Loop principal
+        while True:
+            await asyncio.sleep(0.25)
+            handler.maybe_keyframe()
+            if publisher is not None and publisher.due():
+                await publisher.publish_async(kpi_engine.kpis())
+            if diagnostics is not None and diagnostics.due():
+                await diagnostics.publish_async()
+
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        # 5. Desconexão
+        print("\nDesconectando o cliente.")
+        await client.disconnect()
+        print("🛑 Cliente desconectado.")
+        # 6. Grava o que ainda estiver na fila do log
+        if handler is not None:
+            handler.close()
+            print(f"📝 Log finalizado: {handler.writer.written} registros gravados, {handler.writer.dropped} descartados, "
+                  f"{handler.suppressed} suprimidos (sem mudança).")
+            if handler.forwarder is not None:
+                forwarder = handler.forwarder
+                print(f"📤 Encaminhados: {forwarder.written} registros em {forwarder.batches} lotes, "
+                      f"{forwarder.pending} pendentes em disco, {forwarder.dropped} descartados.")
+            print(f"⏱️ Latência das notificações: {metrics.histogram('notificacao_latencia').summary()}")
+            print(f"⏱️ Processamento no handler: {metrics.histogram('notificacao_processamento').summary()}")
+            print(f"⏱️ Gravação de lotes do log: {handler.writer.batch_time.summary()}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_logger())
+    except KeyboardInterrupt:
+        print("\nInterrupção pelo usuário detectada.")
+    except Exception as e:
+        print(f"\n🚨 Ocorreu um erro: {e}")
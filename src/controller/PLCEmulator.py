@@ -0,0 +1,303 @@
+import argparse
+import random
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from controller.TagTable import TagTable, load_tag_table
+
+# Emulação em Python do programa src/plc_code/PLC_PRG.st (CODESYS), para rodar
+# a lógica da linha sem CODESYS nem Factory I/O e mais rápido que o tempo real.
+#
+# - R_TRIG e TON reproduzem os blocos IEC 61131-3 de mesmo nome.
+# - PLC_PRG lê e escreve uma imagem de processo {nome da tag: valor} com as
+#   mesmas tags do servidor (config/linha_triagem_tags.json).
+# - ScanEngine executa ciclos de varredura sobre um relógio virtual: o tempo
+#   dos temporizadores avança cycle_ms por varredura, sem esperar o relógio real.
+
+CYCLE_MS = 10                       # Ciclo da tarefa do CLP (ms)
+TEMPO_PULSO_PUSHER_MS = 500         # C_TEMPO_PULSO_PUSHER : TIME := T#500MS
+TEMPO_TIMEOUT_CICLO_MS = 10_000     # C_TEMPO_TIMEOUT_CICLO : TIME := T#10S
+
+# Pastas cujas tags o CLP lê (entradas) e escreve (saídas) na imagem de processo
+INPUT_FOLDERS = ("IOs_Sensores_Fisicos",)
+OUTPUT_FOLDERS = ("IOs_Atuadores_Fisicos", "Contadores_PLC")
+
+
+class VirtualClock(object):
+    """ Relógio do CLP em milissegundos, avançado explicitamente pelo ScanEngine. """
+    def __init__(self, start_ms: int = 0):
+        self.now_ms = start_ms
+
+    def advance(self, ms: int):
+        self.now_ms += ms
+
+
+class R_TRIG(object):
+    """ Detector de borda de subida (IEC 61131-3): Q fica TRUE por uma varredura. """
+    def __init__(self):
+        self.CLK = False
+        self.Q = False
+        self._M = False
+
+    def __call__(self, CLK: bool):
+        self.CLK = CLK
+        self.Q = CLK and not self._M
+        self._M = CLK
+
+
+class TON(object):
+    """ Temporizador de atraso na energização (IEC 61131-3) sobre um VirtualClock. """
+    def __init__(self, clock: VirtualClock, PT: int = 0):
+        self.clock = clock
+        self.IN = False
+        self.PT = PT
+        self.Q = False
+        self.ET = 0
+        self._start: Optional[int] = None
+
+    def __call__(self, IN: bool, PT: Optional[int] = None):
+        if PT is not None:
+            self.PT = PT
+        self.IN = IN
+        if not IN:
+            self._start = None
+            self.Q = False
+            self.ET = 0
+            return
+        if self._start is None:
+            self._start = self.clock.now_ms
+        self.ET = min(self.clock.now_ms - self._start, self.PT)
+        self.Q = self.ET >= self.PT
+
+    def deadline_ms(self) -> Optional[int]:
+        """ Instante em que Q vai a TRUE se IN continuar ligado; None se não está contando. """
+        if self._start is None or self.Q:
+            return None
+        return self._start + self.PT
+
+
+def process_image(table: Optional[TagTable] = None) -> Dict[str, Any]:
+    """ Imagem de processo inicial: {nome da tag: valor inicial} da tabela de tags. """
+    table = table or load_tag_table()
+    return {tag.name: tag.initial for tag in table.tags}
+
+
+class PLC_PRG(object):
+    """
+    Tradução linha a linha de PLC_PRG.st. Cada chamada executa uma varredura
+    sobre 'io' (imagem de processo); as variáveis VAR do programa são atributos.
+    """
+    def __init__(self, clock: VirtualClock):
+        # Flancos (Edge Detection) para Sensores/Botões
+        self.R_TRIG_StartButton = R_TRIG()
+        self.R_TRIG_StopButton = R_TRIG()
+        self.R_TRIG_ResetButton = R_TRIG()
+        self.R_TRIG_Sensor_In = R_TRIG()
+
+        # Variáveis de Estado da Máquina
+        self.B_Sistema_Ligado = False
+        self.B_Emergencia_Ativa = True
+
+        # Variáveis de Controle de Ação
+        self.B_Rejeitar_Peca = False
+
+        # Instâncias de Temporizadores IEC
+        self.T_PULSE_PUSHER_Inst = TON(clock)
+        self.T_CYCLE_TIMEOUT_Inst = TON(clock)
+
+        # Variáveis de Estado Interno
+        self.B_Timeout_Ativo = False
+
+    def state(self) -> tuple:
+        """ Estado interno que pode exigir novas varreduras (flags e saídas dos temporizadores). """
+        return (self.B_Sistema_Ligado, self.B_Emergencia_Ativa, self.B_Rejeitar_Peca, self.B_Timeout_Ativo,
+                self.T_PULSE_PUSHER_Inst.Q, self.T_CYCLE_TIMEOUT_Inst.Q)
+
+    def timers(self) -> Tuple[TON, ...]:
+        return (self.T_PULSE_PUSHER_Inst, self.T_CYCLE_TIMEOUT_Inst)
+
+    def __call__(self, io: Dict[str, Any]):
+        # 1. GERENCIAMENTO DE EMERGÊNCIA E ESTADO
+        self.B_Emergencia_Ativa = not io["Emergency_Stop_0"]
+
+        self.R_TRIG_StartButton(io["Start_Button_0"])
+        self.R_TRIG_StopButton(io["Stop_Button_0"])
+        self.R_TRIG_ResetButton(io["Reset_Button_0"])
+
+        if self.R_TRIG_StartButton.Q and not self.B_Emergencia_Ativa:
+            self.B_Sistema_Ligado = True
+        if self.R_TRIG_StopButton.Q or self.B_Emergencia_Ativa:
+            self.B_Sistema_Ligado = False
+
+        rodando = self.B_Sistema_Ligado and not self.B_Emergencia_Ativa
+        io["Belt_Conveyor_6m_0"] = rodando
+        io["Emitter_0_Emit"] = rodando
+        io["Remover_0_Remove"] = rodando
+        io["Remover_1_Remove"] = rodando
+
+        # 2. INSPEÇÃO, CONTAGEM E DECISÃO
+        self.R_TRIG_Sensor_In(io["Diffuse_Sensor_0"])
+
+        if self.R_TRIG_Sensor_In.Q and self.B_Sistema_Ligado:
+            self.T_CYCLE_TIMEOUT_Inst(IN=False)
+            io["C_TOTAL"] += 1
+            if io["Diffuse_Sensor_1"]:
+                io["C_APROVADAS"] += 1
+                self.B_Rejeitar_Peca = False
+            else:
+                io["C_REJEITADAS"] += 1
+                self.B_Rejeitar_Peca = True
+
+        # 3. CONTROLE DO PISTÃO DE REJEIÇÃO (PULSO DE 0.5S)
+        self.T_PULSE_PUSHER_Inst(IN=self.B_Rejeitar_Peca, PT=TEMPO_PULSO_PUSHER_MS)
+        io["Pusher_0"] = self.B_Rejeitar_Peca
+        if self.T_PULSE_PUSHER_Inst.Q:
+            self.B_Rejeitar_Peca = False
+            self.T_PULSE_PUSHER_Inst(IN=False)
+
+        # 4. MONITORAMENTO DE TIMEOUT
+        self.T_CYCLE_TIMEOUT_Inst(IN=self.B_Sistema_Ligado and not io["Diffuse_Sensor_0"], PT=TEMPO_TIMEOUT_CICLO_MS)
+        self.B_Timeout_Ativo = self.T_CYCLE_TIMEOUT_Inst.Q
+
+        # 5. SINALIZAÇÃO E DISPLAY
+        io["Stack_Light_0_Green"] = self.B_Sistema_Ligado and not self.B_Timeout_Ativo and not self.B_Emergencia_Ativa
+        io["Stack_Light_0_Red"] = self.B_Emergencia_Ativa or self.B_Rejeitar_Peca
+        io["Stack_Light_0_Yellow"] = self.B_Timeout_Ativo and not self.B_Emergencia_Ativa
+        io["Start_Button_0_Light"] = rodando
+        io["Stop_Button_0_Light"] = not self.B_Sistema_Ligado or self.B_Emergencia_Ativa
+        io["Warning_Light_0"] = self.B_Timeout_Ativo
+        io["Digital_Display_0"] = io["C_TOTAL"]
+        io["Digital_Display_1"] = io["C_APROVADAS"]
+
+        # 6. LÓGICA DE RESET
+        if self.R_TRIG_ResetButton.Q:
+            io["C_TOTAL"] = 0
+            io["C_APROVADAS"] = 0
+            io["C_REJEITADAS"] = 0
+            self.T_PULSE_PUSHER_Inst(IN=False)
+            self.T_CYCLE_TIMEOUT_Inst(IN=False)
+            self.B_Timeout_Ativo = False
+            self.B_Rejeitar_Peca = False
+            self.B_Sistema_Ligado = False
+
+
+class ScanEngine(object):
+    """
+    Executa o PLC_PRG em ciclos de varredura sobre um relógio virtual.
+
+    A cada varredura: before_scan(io, now_ms) (estímulos/planta), programa,
+    after_scan(io, now_ms) (ex.: troca da imagem com o servidor OPC UA) e o
+    relógio avança cycle_ms.
+    """
+    def __init__(self, io: Optional[Dict[str, Any]] = None, cycle_ms: int = CYCLE_MS,
+                 before_scan: Optional[Callable[[Dict[str, Any], int], None]] = None,
+                 after_scan: Optional[Callable[[Dict[str, Any], int], None]] = None):
+        self.clock = VirtualClock()
+        self.io = io if io is not None else process_image()
+        self.cycle_ms = cycle_ms
+        self.program = PLC_PRG(self.clock)
+        self.before_scan = before_scan
+        self.after_scan = after_scan
+        self.scans = 0
+
+    def scan(self):
+        """ Uma varredura completa. """
+        if self.before_scan is not None:
+            self.before_scan(self.io, self.clock.now_ms)
+        self.program(self.io)
+        if self.after_scan is not None:
+            self.after_scan(self.io, self.clock.now_ms)
+        self.clock.advance(self.cycle_ms)
+        self.scans += 1
+
+    def next_deadline_ms(self) -> Optional[int]:
+        """ Próximo vencimento de temporizador do programa (para avanço de tempo por eventos). """
+        deadlines = [d for d in (timer.deadline_ms() for timer in self.program.timers()) if d is not None]
+        return min(deadlines) if deadlines else None
+
+    def run_for(self, duration_ms: int):
+        """ Executa varreduras até o relógio virtual avançar duration_ms. """
+        end = self.clock.now_ms + duration_ms
+        while self.clock.now_ms < end:
+            self.scan()
+
+
+class ServerIO(object):
+    """
+    Liga a imagem de processo às tags de uma linha do servidor através do seu
+    TagCache (controller.TagCache): read_inputs() copia os sensores para a
+    imagem e write_outputs() enfileira as saídas no cache, que descarta as que
+    não mudaram e as escreve em lote no flush do ciclo do servidor.
+    """
+    def __init__(self, cache, table: Optional[TagTable] = None):
+        table = table or load_tag_table()
+        self.cache = cache
+        self.inputs = [tag.name for tag in table.tags if tag.folder in INPUT_FOLDERS]
+        self.outputs = [tag.name for tag in table.tags if tag.folder in OUTPUT_FOLDERS]
+
+    def load(self, io: Dict[str, Any]):
+        """ Carrega o estado atual de todas as tags do servidor (ex.: contadores) para a imagem. """
+        for name in self.cache.nodes:
+            io[name] = self.cache.get(name)
+
+    def read_inputs(self, io: Dict[str, Any], now_ms: int = 0):
+        for name in self.inputs:
+            io[name] = self.cache.get(name)
+
+    def write_outputs(self, io: Dict[str, Any], now_ms: int = 0):
+        for name in self.outputs:
+            self.cache.set(name, io[name])
+
+
+class PartStimulus(object):
+    """
+    Estímulo simples para rodar o PLC_PRG sem Factory I/O: liga a linha
+    (Emergency_Stop_0 liberado + pulso no Start) e, com a esteira ligada, gera
+    uma peça a cada part_interval_ms: Diffuse_Sensor_0 fica ativo por
+    sensor_on_ms e Diffuse_Sensor_1 indica se a peça é alta (aprovada).
+    """
+    def __init__(self, part_interval_ms: int = 3000, sensor_on_ms: int = 400, approval_rate: float = 0.8,
+                 seed: Optional[int] = None):
+        self.part_interval_ms = part_interval_ms
+        self.sensor_on_ms = sensor_on_ms
+        self.approval_rate = approval_rate
+        self._random = random.Random(seed)
+        self._next_part_ms = part_interval_ms
+        self._sensor_off_ms: Optional[int] = None
+
+    def __call__(self, io: Dict[str, Any], now_ms: int):
+        io["Emergency_Stop_0"] = True
+        io["Start_Button_0"] = now_ms < 100
+        if not io["Belt_Conveyor_6m_0"]:
+            return
+        if self._sensor_off_ms is not None and now_ms >= self._sensor_off_ms:
+            io["Diffuse_Sensor_0"] = False
+            self._sensor_off_ms = None
+        if now_ms >= self._next_part_ms:
+            io["Diffuse_Sensor_0"] = True
+            io["Diffuse_Sensor_1"] = self._random.random() < self.approval_rate
+            self._sensor_off_ms = now_ms + self.sensor_on_ms
+            self._next_part_ms = now_ms + self.part_interval_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa o PLC_PRG emulado (relógio virtual), sem CODESYS nem Factory I/O.")
+    parser.add_argument("--hours", type=float, default=8.0, help="Duração simulada (h).")
+    parser.add_argument("--cycle-ms", type=int, default=CYCLE_MS, help="Ciclo de varredura do CLP (ms).")
+    parser.add_argument("--part-interval-ms", type=int, default=3000, help="Intervalo entre peças (ms).")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    engine = ScanEngine(cycle_ms=args.cycle_ms, before_scan=PartStimulus(args.part_interval_ms, seed=args.seed))
+    started = time.perf_counter()
+    engine.run_for(int(args.hours * 3_600_000))
+    elapsed = time.perf_counter() - started
+
+    io = engine.io
+    print(f"⏱️ {args.hours:g} h simuladas em {elapsed:.2f} s ({engine.scans} varreduras, "
+          f"{args.hours * 3600 / elapsed:.0f}x o tempo real)")
+    print(f"C_TOTAL: {io['C_TOTAL']} | C_APROVADAS: {io['C_APROVADAS']} | C_REJEITADAS: {io['C_REJEITADAS']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from controller.EmitterController import BoxCompetitor
+from controller.NdjsonWriter import BufferedNdjsonWriter
+
+# Varredura Monte Carlo dos parâmetros de BoxCompetitor.DISTRIBUTION_PARAMS:
+# cada cenário (combinação da grade + réplica) roda uma simulação completa da
+# linha (ConveyorSimulator + PLC_PRG emulado) em um processo do pool, com a
+# sua própria semente derivada de uma SeedSequence. Os KPIs de cada cenário são
+# gravados em NDJSON assim que ele termina; o resumo por combinação vem no fim.
+
+DEFAULT_HOURS = 8.0
+DEFAULT_REPLICATES = 1
+# Cenários em voo por processo (mantém o pool ocupado sem submeter milhares de uma vez)
+INFLIGHT_PER_WORKER = 4
+# Parâmetros que não mudam a simulação: exp(-λX) com X ~ Exp(λ) é Uniforme(0, 1)
+# para qualquer λ, então variar EXPONENTIAL.lambda só gera réplicas.
+INERT_PARAMS = ("EXPONENTIAL.lambda",)
+
+
+class Scenario(NamedTuple):
+    scenario_id: int
+    combination: int                            # Índice da combinação na grade
+    replicate: int
+    params: Dict[str, Dict[str, float]]         # DISTRIBUTION_PARAMS completo do cenário
+    overrides: Dict[str, float]                 # Só os valores variados ("POISSON.lambda": 5.0)
+    hours: float
+    seed: int
+    sweep: str = ""                             # Impressão digital da varredura (ver sweep_fingerprint)
+    entropy: str = ""                           # Entropia da SeedSequence (retomada sem --seed)
+
+
+def parse_grid_arg(text: str) -> Dict[str, List[float]]:
+    """ "POISSON.lambda=1,2,4" -> {"POISSON.lambda": [1.0, 2.0, 4.0]} """
+    key, _, values = text.partition("=")
+    if not values:
+        raise ValueError(f"Grade inválida '{text}'. Use DISTRIBUICAO.parametro=v1,v2,...")
+    return {key.strip(): [float(value) for value in values.split(",")]}
+
+
+def sweep_fingerprint(grid: Dict[str, Sequence[float]], replicates: int, hours: float, entropy: int) -> str:
+    """
+    Identifica uma varredura: grade, réplicas, horas e a entropia da SeedSequence
+    (a semente base ou, sem ela, a entropia sorteada). Só resultados da mesma
+    varredura podem ser retomados ou resumidos juntos.
+    """
+    key = json.dumps({"grid": {k: [float(v) for v in values] for k, values in sorted(grid.items())},
+                      "replicates": replicates, "hours": float(hours), "entropy": str(entropy)}, sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def expand_grid(grid: Dict[str, Sequence[float]], replicates: int = DEFAULT_REPLICATES, hours: float = DEFAULT_HOURS,
+                base_seed: Optional[int] = None) -> List[Scenario]:
+    """
+    Produto cartesiano da grade × réplicas. Cada cenário recebe um fluxo de
+    números aleatórios independente (SeedSequence.spawn), então o resultado não
+    depende de qual processo executa qual cenário. Sem base_seed a entropia é
+    sorteada; ela vai em cada resultado e, passada de volta como base_seed
+    (ver stored_entropy), reproduz as mesmas sementes.
+    """
+    import numpy as np
+
+    base = BoxCompetitor.DISTRIBUTION_PARAMS
+    for key in grid:
+        distribution, _, param = key.partition(".")
+        if distribution not in base or param not in base[distribution]:
+            raise ValueError(f"Parâmetro desconhecido '{key}'. Disponíveis: "
+                             + ", ".join(f"{d}.{p}" for d, ps in base.items() for p in ps))
+
+    keys = list(grid)
+    combinations = list(itertools.product(*(grid[key] for key in keys)))
+    sequence = np.random.SeedSequence(base_seed)
+    seeds = sequence.spawn(len(combinations) * replicates)
+    sweep = sweep_fingerprint(grid, replicates, hours, sequence.entropy)
+
+    scenarios = []
+    for combination, values in enumerate(combinations):
+        params = copy.deepcopy(base)
+        overrides = dict(zip(keys, values))
+        for key, value in overrides.items():
+            distribution, _, param = key.partition(".")
+            params[distribution][param] = value
+        for replicate in range(replicates):
+            scenario_id = len(scenarios)
+            seed = int(seeds[scenario_id].generate_state(1)[0])
+            scenarios.append(Scenario(scenario_id, combination, replicate, params, overrides, hours, seed, sweep,
+                                      str(sequence.entropy)))
+    return scenarios
+
+
+def run_scenario(scenario: Scenario) -> Dict[str, Any]:
+    """ Executa um cenário (em um processo do pool) e retorna os seus KPIs. """
+    from controller.ConveyorSimulator import ConveyorSimulator, cosimulate
+    from controller.PLCEmulator import ScanEngine
+
+    started = time.perf_counter()
+    competitor = BoxCompetitor(scenario.seed)
+    competitor.DISTRIBUTION_PARAMS = scenario.params
+
+    engine = ScanEngine()
+    # Encoder desligado: não afeta os KPIs e domina o número de eventos
+    sim = ConveyorSimulator(engine.io, competitor, encoder_pulses_per_m=0)
+    sim.schedule_input("Emergency_Stop_0", True, 0)
+    sim.press("Start_Button_0", 10)
+    cosimulate(sim, engine, int(scenario.hours * 3_600_000))
+
+    io = engine.io
+    inspected = io["C_APROVADAS"] + io["C_REJEITADAS"]
+    emitted = sum(sim.part_counts.values())
+    return {
+        "sweep": scenario.sweep,
+        "entropy": scenario.entropy,
+        "scenario_id": scenario.scenario_id,
+        "combination": scenario.combination,
+        "replicate": scenario.replicate,
+        "seed": scenario.seed,
+        "params": scenario.overrides,
+        "hours": scenario.hours,
+        "C_TOTAL": io["C_TOTAL"],
+        "C_APROVADAS": io["C_APROVADAS"],
+        "C_REJEITADAS": io["C_REJEITADAS"],
+        "throughput_per_h": io["C_TOTAL"] / scenario.hours,
+        "approved_per_h": io["C_APROVADAS"] / scenario.hours,
+        "rejection_rate": io["C_REJEITADAS"] / inspected if inspected else 0.0,
+        "part_mix": {part: count / emitted for part, count in sorted(sim.part_counts.items())} if emitted else {},
+        "elapsed_s": time.perf_counter() - started,
+    }
+
+
+def run_scenarios(scenarios: Sequence[Scenario], output_path: str, workers: Optional[int] = None,
+                  skip_done: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Executa os cenários em um ProcessPoolExecutor e grava cada resultado em
+    output_path (NDJSON) assim que o processo termina. Com skip_done, os
+    scenario_id já presentes no arquivo são pulados (retomada de uma varredura);
+    um arquivo com resultados de outra varredura (grade, horas, réplicas ou
+    semente diferentes) é recusado com ValueError.
+    Gera os resultados na ordem em que terminam.
+    """
+    workers = workers or os.cpu_count() or 1
+    sweep = scenarios[0].sweep if scenarios else ""
+    done = _done_ids(output_path, sweep) if skip_done else set()
+    pending = iter([scenario for scenario in scenarios if scenario.scenario_id not in done])
+
+    writer = BufferedNdjsonWriter(output_path, block=True, flush_interval_s=0.2)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            inflight = set()
+            for scenario in itertools.islice(pending, workers * INFLIGHT_PER_WORKER):
+                inflight.add(pool.submit(run_scenario, scenario))
+            while inflight:
+                finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    writer.write(result)
+                    yield result
+                    scenario = next(pending, None)
+                    if scenario is not None:
+                        inflight.add(pool.submit(run_scenario, scenario))
+    finally:
+        writer.close(timeout=None)
+
+
+def _done_ids(path: str, sweep: str) -> set:
+    """ scenario_id já gravados em 'path' pela varredura 'sweep'. """
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row.get("sweep") != sweep:
+                raise ValueError(f"{path} contém resultados de outra varredura ({row.get('sweep') or 'sem identificação'}). "
+                                 f"Use outro --out ou apague o arquivo.")
+            done.add(row["scenario_id"])
+    return done
+
+
+def stored_entropy(path: str) -> Optional[int]:
+    """ Entropia da varredura gravada em 'path' (None se o arquivo não existe ou não a registra). """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entropy = json.loads(line).get("entropy")
+                return int(entropy) if entropy else None
+    return None
+
+
+def load_results(path: str, sweep: str) -> List[Dict[str, Any]]:
+    """ Resultados gravados em 'path' pela varredura 'sweep'. """
+    with open(path, "r", encoding="utf-8") as f:
+        return [row for row in (json.loads(line) for line in f if line.strip()) if row.get("sweep") == sweep]
+
+
+def summarize(results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """ Agrega as réplicas de cada combinação: média e desvio padrão dos KPIs e mix médio de peças. """
+    groups: Dict[int, List[Dict[str, Any]]] = {}
+    for result in results:
+        groups.setdefault(result["combination"], []).append(result)
+
+    summary = []
+    for combination in sorted(groups):
+        rows = groups[combination]
+        entry = {"combination": combination, "params": rows[0]["params"], "replicates": len(rows)}
+        for kpi in ("throughput_per_h", "approved_per_h", "rejection_rate"):
+            values = [row[kpi] for row in rows]
+            mean = sum(values) / len(values)
+            entry[kpi] = mean
+            entry[f"{kpi}_std"] = math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1)) if len(values) > 1 else 0.0
+        parts = sorted({part for row in rows for part in row["part_mix"]})
+        entry["part_mix"] = {part: sum(row["part_mix"].get(part, 0.0) for row in rows) / len(rows) for part in parts}
+        summary.append(entry)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura Monte Carlo dos parâmetros do BoxCompetitor em vários processos.")
+    parser.add_argument("--grid", action="append", default=[], metavar="DIST.param=v1,v2",
+                        help="Valores de um parâmetro (repetível), ex.: --grid POISSON.lambda=1,2,4")
+    parser.add_argument("--replicates", type=int, default=DEFAULT_REPLICATES, help="Réplicas por combinação.")
+    parser.add_argument("--hours", type=float, default=DEFAULT_HOURS, help="Horas simuladas por cenário.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Semente base da SeedSequence. Sem ela, se --out já existe, a varredura é retomada "
+                             "com a entropia gravada nos resultados.")
+    parser.add_argument("--workers", type=int, default=None, help="Processos (padrão: todos os núcleos).")
+    parser.add_argument("--out", default="scenarios.ndjson", help="Resultados por cenário (NDJSON).")
+    parser.add_argument("--summary", default=None, help="Resumo por combinação (JSON).")
+    args = parser.parse_args()
+
+    grid: Dict[str, List[float]] = {}
+    for text in args.grid:
+        grid.update(parse_grid_arg(text))
+    for key in INERT_PARAMS:
+        if len(set(grid.get(key, ()))) > 1:
+            print(f"⚠️ {key} não altera a simulação (exp(-λX) com X ~ Exp(λ) é uniforme): os valores só geram réplicas.")
+
+    seed = args.seed
+    if seed is None:
+        seed = stored_entropy(args.out)
+        if seed is not None:
+            print(f"♻️ Retomando {args.out} com a entropia gravada ({seed}).")
+    scenarios = expand_grid(grid, args.replicates, args.hours, seed)
+    sweep = scenarios[0].sweep
+    workers = args.workers or os.cpu_count() or 1
+    print(f"🎲 {len(scenarios)} cenários ({args.hours:g} h cada, varredura {sweep}) em {workers} processo(s) -> {args.out}")
+
+    started = time.perf_counter()
+    try:
+        for i, result in enumerate(run_scenarios(scenarios, args.out, workers), 1):
+            print(f"   [{i}/{len(scenarios)}] cenário {result['scenario_id']} {result['params']}: "
+                  f"{result['throughput_per_h']:.0f} peças/h, rejeição {result['rejection_rate']:.1%}")
+    except ValueError as exc:
+        print(f"🚨 {exc}")
+        return
+    elapsed = time.perf_counter() - started
+
+    summary = summarize(load_results(args.out, sweep))
+    print(f"\n✅ Concluído em {elapsed:.1f} s.")
+    for entry in summary:
+        print(f"   {entry['params']}: {entry['throughput_per_h']:.0f} ± {entry['throughput_per_h_std']:.0f} peças/h, "
+              f"rejeição {entry['rejection_rate']:.1%} ± {entry['rejection_rate_std']:.1%}")
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"📝 Resumo salvo em {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from controller.TagRegistry import TagRegistry
+
+# --- Snapshot das tags em memória compartilhada (mesma máquina) ---
+#
+# O servidor publica, ao fim de cada ciclo, os valores atuais de todas as tags
+# em um segmento multiprocessing.shared_memory. Consumidores locais (dashboards,
+# análises) leem o segmento direto, sem abrir sessão OPC UA.
+#
+# Layout do segmento:
+#
+#   0   HEADER "<8sII": MAGIC, VERSION, tamanho do diretório (JSON)
+#   16  int64 seq           Seqlock: ímpar durante a escrita, par quando estável
+#   24  int64 published_ns  Relógio monotônico (ns) da última publicação
+#   32  int64 publishes     Número de publicações
+#   40  int64 writer_pid    PID do servidor que escreve no segmento
+#   64  Diretório JSON: tags [[node_id, nome, data_type, bloco, posição], ...],
+#       blocos {nome: [offset, count, dtype]} e a âncora de tempo do servidor
+#   ... Blocos (alinhados em 64 bytes): um array por tipo de valor ("bool",
+#       "int32", "int64", "float64"), "updated_ns" (int64, relógio monotônico
+#       da última mudança de cada tag) e "valid" (uint8, tag já tem valor e
+#       ainda está na sua coluna tipada).
+#
+# Protocolo seqlock: o escritor (uma única thread) incrementa seq para ímpar,
+# copia os blocos e incrementa seq para par. O leitor copia os blocos entre
+# duas leituras de seq e repete se seq era ímpar ou mudou no meio. Nenhuma
+# trava é compartilhada entre processos: o servidor nunca espera o leitor.
+
+MAGIC = b"OPCUASHM"
+VERSION = 2
+HEADER = struct.Struct("<8sII")
+COUNTERS_OFFSET = 16
+DIRECTORY_OFFSET = 64
+ALIGN = 64
+CLOSED = -1                 # seq do segmento encerrado pelo escritor (ímpar: leitores não o aceitam)
+
+# typecode do TagRegistry -> (bloco, dtype do escritor, dtype do leitor)
+BLOCKS = {
+    "b": ("bool", "i1", "?"),
+    "i": ("int32", "<i4", "<i4"),
+    "q": ("int64", "<i8", "<i8"),
+    "d": ("float64", "<f8", "<f8"),
+}
+
+
+DEFAULT_HOST = "127.0.0.2"  # Host padrão do servidor (opcuaServer.OPCUA_HOST)
+DEFAULT_PORT = 4840
+
+
+def snapshot_name(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, prefix: str = "opcua_snapshot") -> str:
+    """ Nome padrão do segmento do servidor que escuta em host:port. """
+    return f"{prefix}_{host}_{port}"
+
+
+def _pid_alive(pid: int) -> bool:
+    """ Indica se o processo 'pid' existe (no Windows o segmento some com o último handle: sempre vivo). """
+    if pid <= 0:
+        return False
+    if sys.platform == "win32":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+# Segmentos criados por este processo (registrados no resource_tracker dele)
+_created = set()
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    """ Tira o segmento do resource_tracker, que o apagaria quando este processo saísse. """
+    if sys.platform != "win32":
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Abre um segmento existente sem registrá-lo no resource_tracker: antes do
+    Python 3.13 o tracker do leitor apagaria o segmento do servidor ao sair.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    shm = shared_memory.SharedMemory(name)
+    if name not in _created:
+        _untrack(shm)
+    return shm
+
+
+def _counters(shm: shared_memory.SharedMemory) -> memoryview:
+    """ View int64 [seq, published_ns, publishes, writer_pid] sobre o cabeçalho. """
+    return shm.buf[COUNTERS_OFFSET:COUNTERS_OFFSET + 32].cast("q")
+
+
+class SnapshotWriter(object):
+    """
+    Lado do servidor: um segmento com as tags de um ou mais TagRegistry (um por
+    linha), na ordem dos registros. O layout é fixado na criação; publish()
+    copia as colunas tipadas dos registros (memcpy por coluna, sem percorrer as
+    tags em Python).
+
+    Tags de tipos sem coluna tipada (strings) ficam fora do snapshot. Uma tag
+    rebaixada para a coluna de objetos depois da criação (valor fora do tipo
+    declarado) passa a ter valid = 0.
+
+    Se já existir um segmento com o mesmo nome cujo servidor ainda está vivo,
+    a criação falha com FileExistsError (o segmento não é removido).
+    """
+    def __init__(self, name: str, registries: Sequence[TagRegistry]):
+        self.name = name
+        self.registries = list(registries)
+        tags: List[list] = []
+        counts = {typecode: 0 for typecode in BLOCKS}
+        # Para cada registro: (typecode, primeira posição no bloco, tamanho) de cada coluna copiada
+        self._plan: List[List[Tuple[str, int, int]]] = []
+        first_tag = 0
+        for registry in self.registries:
+            columns = []
+            for typecode in BLOCKS:
+                size = len(registry.column(typecode))
+                if size:
+                    columns.append((typecode, counts[typecode], size))
+            starts = {typecode: start for typecode, start, _ in columns}
+            for index, (typecode, slot) in enumerate(registry.layout()):
+                if typecode in BLOCKS:
+                    tags.append([registry.node_ids[index], registry.names[index], registry.datatypes[index],
+                                 BLOCKS[typecode][0], starts[typecode] + slot, first_tag + index])
+            for typecode, _, size in columns:
+                counts[typecode] += size
+            self._plan.append(columns)
+            first_tag += len(registry)
+        self.tag_count = first_tag
+
+        # Diretório e offsets dos blocos
+        sizes = [(BLOCKS[typecode][0], counts[typecode], BLOCKS[typecode][2]) for typecode in BLOCKS]
+        sizes += [("updated_ns", self.tag_count, "<i8"), ("valid", self.tag_count, "?")]
+        anchor = self.registries[0] if self.registries else TagRegistry()
+        directory = {"tags": tags, "blocks": {},
+                     "epoch_wall_ns": anchor.epoch_wall_ns, "epoch_monotonic_ns": anchor.epoch_monotonic_ns}
+        # O tamanho do JSON depende dos offsets; uma folga fixa evita recalcular
+        data_offset = _align(DIRECTORY_OFFSET + len(json.dumps(directory)) + 64 * len(sizes))
+        offset = data_offset
+        for block, count, dtype in sizes:
+            directory["blocks"][block] = [offset, count, dtype]
+            offset = _align(offset + count * np.dtype(dtype).itemsize)
+        encoded = json.dumps(directory).encode()
+        assert DIRECTORY_OFFSET + len(encoded) <= data_offset
+
+        self.shm = self._create(name, offset)
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, len(encoded))
+        self.shm.buf[DIRECTORY_OFFSET:DIRECTORY_OFFSET + len(encoded)] = encoded
+        self._counters = _counters(self.shm)
+        self._counters[0] = self._counters[1] = self._counters[2] = 0
+        self._counters[3] = os.getpid()
+
+        # Cópias do publish(): (array de origem, offset no segmento, bytes), na ordem dos registros
+        blocks = directory["blocks"]
+        self._copies: List[Tuple[Any, int, int]] = []
+        first_tag = 0
+        for registry, columns in zip(self.registries, self._plan):
+            for typecode, start, size in columns:
+                block, writer_dtype, _ = BLOCKS[typecode]
+                itemsize = np.dtype(writer_dtype).itemsize
+                self._copies.append((registry.column(typecode), blocks[block][0] + start * itemsize, size * itemsize))
+            size = len(registry)
+            self._copies.append((registry.updated, blocks["updated_ns"][0] + first_tag * 8, size * 8))
+            self._copies.append((registry.valid, blocks["valid"][0] + first_tag, size))
+            first_tag += size
+        self._valid_offset = blocks["valid"][0]
+        # Tags rebaixadas para objeto: posição global em 'valid'; recalculado quando 'demotions' muda
+        self._demotions = [registry.demotions for registry in self.registries]
+        self._demoted: List[int] = []
+        self.publishes = 0
+
+    @staticmethod
+    def _create(name: str, size: int) -> shared_memory.SharedMemory:
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name)
+            try:
+                magic, _, _ = HEADER.unpack_from(stale.buf, 0)
+                counters = _counters(stale)
+                pid = counters[3] if magic == MAGIC else 0
+                counters.release()
+            except (struct.error, TypeError, ValueError):
+                pid = 0
+            if pid and pid != os.getpid() and _pid_alive(pid):
+                if name not in _created:
+                    _untrack(stale)
+                stale.close()
+                raise FileExistsError(f"Snapshot {name} em uso pelo processo {pid}.")
+            # Segmento deixado por um servidor que não encerrou de forma limpa
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        _created.add(name)
+        return shm
+
+    def _find_demoted(self):
+        """ Posições globais das tags que saíram da coluna tipada (valor rebaixado para objeto). """
+        demoted, first_tag = [], 0
+        for registry in self.registries:
+            demoted.extend(first_tag + index for index, (typecode, _) in enumerate(registry.layout())
+                           if typecode not in BLOCKS)
+            first_tag += len(registry)
+        self._demotions = [registry.demotions for registry in self.registries]
+        self._demoted = demoted
+
+    def publish(self, now_ns: Optional[int] = None):
+        """ Copia os valores atuais dos registros para o segmento (seção crítica do seqlock). """
+        counters, buf = self._counters, self.shm.buf
+        seq = counters[0] + 1
+        counters[0] = seq
+        for source, offset, size in self._copies:
+            buf[offset:offset + size] = memoryview(source).cast("B")[:size]
+        if any(registry.demotions != seen for registry, seen in zip(self.registries, self._demotions)):
+            self._find_demoted()
+        for index in self._demoted:
+            buf[self._valid_offset + index] = 0
+        counters[1] = time.monotonic_ns() if now_ns is None else now_ns
+        counters[2] += 1
+        counters[0] = seq + 1
+        self.publishes += 1
+
+    def close(self):
+        """ Marca o segmento como encerrado e o remove (leitores já conectados recebem ConnectionError). """
+        self._counters[0] = CLOSED
+        self._counters.release()
+        self._copies.clear()
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        _created.discard(self.name)
+
+
+class Snapshot(NamedTuple):
+    """ Cópia consistente do segmento (uma publicação do servidor). """
+    sequence: int
+    published_ns: int                  # Relógio monotônico do servidor
+    blocks: Dict[str, np.ndarray]      # Cópias dos blocos (bool, int32, int64, float64, updated_ns, valid)
+
+
+class SnapshotReader(object):
+    """
+    Lado do consumidor.
+
+    - blocks: views NumPy sem cópia sobre o segmento, atualizadas pelo servidor
+      a cada ciclo. Para leitura consistente com as views, compare 'sequence'
+      antes e depois (igual e par = sem escrita no meio).
+    - read(): cópia consistente de todos os blocos (repete enquanto o
+      servidor estiver escrevendo).
+    - values() / get(): valores Python por nome curto ou NodeId.
+    - wait(seq): espera a próxima publicação depois de 'seq'.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.shm = _attach(name)
+        magic, version, directory_length = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} não é um snapshot de tags (versão {VERSION}).")
+        directory = json.loads(bytes(self.shm.buf[DIRECTORY_OFFSET:DIRECTORY_OFFSET + directory_length]))
+        self._counters = _counters(self.shm)
+        self.epoch_wall_ns = directory["epoch_wall_ns"]
+        self.epoch_monotonic_ns = directory["epoch_monotonic_ns"]
+
+        self.blocks: Dict[str, np.ndarray] = {
+            block: np.ndarray((count,), dtype=dtype, buffer=self.shm.buf, offset=offset)
+            for block, (offset, count, dtype) in directory["blocks"].items()
+        }
+        self.node_ids: List[str] = []
+        self.names: List[str] = []
+        self.datatypes: List[str] = []
+        # Por tag: (bloco do valor, posição no bloco, posição em updated_ns/valid)
+        self.locations: List[Tuple[str, int, int]] = []
+        self._index: Dict[str, int] = {}
+        for node_id, tag_name, datatype, block, position, tag_index in directory["tags"]:
+            self._index[node_id] = len(self.node_ids)
+            self._index.setdefault(tag_name, len(self.node_ids))
+            self.node_ids.append(node_id)
+            self.names.append(tag_name)
+            self.datatypes.append(datatype)
+            self.locations.append((block, position, tag_index))
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def index(self, key: str) -> int:
+        """ Índice da tag por NodeId string ou nome curto (o primeiro com esse nome). """
+        return self._index[key]
+
+    @property
+    def sequence(self) -> int:
+        """ Número de sequência atual (par = estável). Mudou = há dados novos. """
+        sequence = self._counters[0]
+        if sequence == CLOSED:
+            raise ConnectionError(f"Snapshot {self.name} encerrado pelo servidor.")
+        return sequence
+
+    def wall_time(self, monotonic_ns: int) -> float:
+        """ Epoch (s) correspondente a um instante do relógio monotônico do servidor. """
+        return (self.epoch_wall_ns + monotonic_ns - self.epoch_monotonic_ns) / 1e9
+
+    def read(self, retries: int = 10000) -> Snapshot:
+        """ Cópia consistente dos blocos (protocolo seqlock). """
+        counters = self._counters
+        for _ in range(retries):
+            sequence = self.sequence
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            blocks = {block: view.copy() for block, view in self.blocks.items()}
+            published_ns = counters[1]
+            if counters[0] == sequence:
+                return Snapshot(sequence, published_ns, blocks)
+        raise TimeoutError(f"Snapshot {self.name}: nenhuma leitura consistente em {retries} tentativas.")
+
+    def values(self, keys: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """ {chave: valor} consistente das tags pedidas (padrão: todas as que já têm valor, por NodeId). """
+        pairs = zip(self.node_ids, range(len(self))) if keys is None else [(key, self.index(key)) for key in keys]
+        blocks = self.read().blocks
+        valid = blocks["valid"]
+        values = {}
+        for key, index in pairs:
+            block, position, tag_index = self.locations[index]
+            if valid[tag_index]:
+                values[key] = blocks[block][position].item()
+        return values
+
+    def get(self, key: str) -> Any:
+        """ Valor atual de uma tag (None se ainda não tiver valor). """
+        return self.values([key]).get(key)
+
+    def wait(self, sequence: int, timeout: Optional[float] = None, poll_s: float = 0.001) -> Optional[int]:
+        """ Espera uma publicação posterior a 'sequence'. Retorna a nova sequência ou None no timeout. """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self.sequence
+            if current != sequence and not current & 1:
+                return current
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_s)
+
+    def close(self):
+        """ Desconecta do segmento (views de 'blocks' guardadas pelo chamador precisam ter sido liberadas). """
+        self.blocks.clear()
+        self._counters.release()
+        self.shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lê o snapshot de tags publicado pelo servidor em memória compartilhada.")
+    parser.add_argument("--name", default=None, help="Nome do segmento (padrão: o do servidor em --host:--port).")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Host do servidor OPC UA.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Porta do servidor OPC UA.")
+    parser.add_argument("--tags", nargs="*", default=None, help="Nomes curtos ou NodeIds (padrão: todas).")
+    parser.add_argument("--watch", type=float, default=0.0, help="Reimprime a cada N segundos (0 = uma vez).")
+    args = parser.parse_args()
+    name = args.name or snapshot_name(args.host, args.port)
+
+    try:
+        reader = SnapshotReader(name)
+    except FileNotFoundError:
+        print(f"🚨 Snapshot {name} não encontrado. O servidor está rodando nesta máquina, com --snapshot?")
+        return
+    with reader:
+        print(f"📡 {name}: {len(reader)} tags, {reader.shm.size} bytes")
+        try:
+            while True:
+                started = time.perf_counter()
+                values = reader.values(args.tags)
+                elapsed_us = (time.perf_counter() - started) * 1e6
+                print(f"seq {reader.sequence} ({elapsed_us:.0f} µs)")
+                for name, value in values.items():
+                    print(f"  {name}: {value}")
+                if not args.watch:
+                    break
+                time.sleep(args.watch)
+        except KeyboardInterrupt:
+            pass
+        except ConnectionError as exc:
+            print(f"🚨 {exc}")
+
+
+if __name__ == "__main__":
+    main()
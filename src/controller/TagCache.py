@@ -0,0 +1,149 @@
+import datetime
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from controller.TagRegistry import TagRegistry
+from controller.TagTable import TagTable, load_tag_table
+
+# Tags cujas transições precisam chegar todas ao servidor (pulsos do encoder,
+# sensores): uma segunda mudança da mesma tag no mesmo ciclo força o flush do
+# lote pendente em vez de sobrescrever o valor ainda não escrito.
+EDGE_FOLDERS = ("IOs_Encoder", "IOs_Sensores_Fisicos")
+
+
+class TagCache(object):
+    """
+    Cache do lado do servidor (python-opcua) para as tags de uma linha.
+
+    - Valores-sombra: get() lê do TagRegistry da linha (arrays tipados por
+      índice de tag), sem passar pelo address space. Escritas feitas por
+      clientes (CLP, Factory I/O) chegam pelo callback interno de data change
+      do address space e atualizam a sombra.
+    - set() descarta escritas redundantes (valor igual à sombra, contadas em
+      'suppressed') e só enfileira as demais.
+    - flush() grava todas as escritas pendentes de uma vez (Variants tipados
+      conforme a tabela de tags, todos com o mesmo timestamp), normalmente uma
+      vez por ciclo do servidor. A escrita vai direto ao address space, que é o
+      que o serviço Write da sessão interna faria para cada WriteValue, sem
+      montar os WriteParameters.
+
+    set() / flush() rodam na thread do ciclo e o callback de data change na
+    thread do servidor OPC UA; 'pending' e a sombra são protegidos por uma
+    trava. Em conflito vale a última escrita que chegou ao address space:
+      - um cliente que escreve numa tag com escrita pendente vence (a escrita
+        pendente é descartada, não sobrescreve o valor do cliente no flush);
+      - uma notificação de cliente que chega depois de o flush já ter gravado
+        outro valor é ignorada (a sombra segue o address space);
+      - as notificações das escritas do próprio flush não contam em 'external'.
+    """
+    def __init__(self, server, nodes: Dict[str, Any], table: Optional[TagTable] = None,
+                 edge_folders: Iterable[str] = EDGE_FOLDERS):
+        from opcua import ua
+
+        table = table or load_tag_table()
+        self._ua = ua
+        self._aspace = server.iserver.aspace
+        self.nodes = nodes
+        self.datatypes = {tag.name: tag.datatype for tag in table.tags if tag.name in nodes}
+        self.edge_tags = {tag.name for tag in table.tags if tag.folder in set(edge_folders) and tag.name in nodes}
+        self.registry = TagRegistry()
+        self.index: Dict[str, int] = {}
+        for name, node in nodes.items():
+            index = self.registry.intern(node.nodeid.to_string(), self.datatypes.get(name, ""), name)
+            self.registry.set(index, node.get_value())
+            self.index[name] = index
+        self.pending: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._flushing = False      # Notificações das próprias escritas (mesma thread, dentro do flush)
+
+        # Contadores
+        self.writes = 0             # Valores escritos no servidor
+        self.suppressed = 0         # Escritas descartadas (valor igual à sombra)
+        self.flushes = 0            # Chamadas Write em lote
+        self.edge_flushes = 0       # Flushes antecipados para não perder uma transição
+        self.external = 0           # Mudanças feitas por clientes
+
+        for name, node in nodes.items():
+            self._aspace.add_datachange_callback(node.nodeid, ua.AttributeIds.Value, self._make_callback(name))
+
+    def _make_callback(self, name: str):
+        registry, index = self.registry, self.index[name]
+        nodeid, value_attribute = self.nodes[name].nodeid, self._ua.AttributeIds.Value
+
+        def on_change(handle, data_value):
+            value = data_value.Value.Value
+            with self._lock:
+                if self._flushing:
+                    return
+                # Escrita do cliente já sobrescrita por um flush posterior: a sombra fica com o valor do flush
+                if self._aspace.get_attribute_value(nodeid, value_attribute).Value.Value != value:
+                    return
+                self.pending.pop(name, None)
+                if registry.get(index) != value:
+                    registry.set(index, value)
+                    self.external += 1
+        return on_change
+
+    def _cast(self, name: str, value: Any) -> Any:
+        """ Converte para o tipo Python da tag (ex.: numpy.int32 ou bool em Int32 -> int). """
+        datatype = self.datatypes[name]
+        if datatype == "Boolean":
+            return bool(value)
+        if datatype in ("Float", "Double"):
+            return float(value)
+        if datatype.startswith(("Int", "UInt", "Byte", "SByte")):
+            return int(value)
+        return value
+
+    def get(self, name: str) -> Any:
+        """ Valor atual da tag (sombra, incluindo escritas ainda pendentes). """
+        with self._lock:
+            return self.registry.get(self.index[name])
+
+    def __getitem__(self, name: str) -> Any:
+        return self.get(name)
+
+    def set(self, name: str, value: Any) -> bool:
+        """ Enfileira a escrita se o valor mudou. Retorna False se ela foi descartada. """
+        value = self._cast(name, value)
+        index = self.index[name]
+        with self._lock:
+            if self.registry.get(index) == value:
+                self.suppressed += 1
+                return False
+            if name in self.pending and name in self.edge_tags:
+                self.edge_flushes += 1
+                self.flush()
+            self.registry.set(index, value)
+            self.pending[name] = value
+            return True
+
+    def flush(self) -> int:
+        """ Escreve as tags pendentes no address space. Retorna quantas. """
+        with self._lock:
+            if not self.pending:
+                return 0
+            ua = self._ua
+            pending, self.pending = self.pending, {}
+            now = datetime.datetime.now(datetime.timezone.utc)
+            value_attribute = ua.AttributeIds.Value
+            self._flushing = True
+            try:
+                for name, value in pending.items():
+                    data_value = ua.DataValue(ua.Variant(value, getattr(ua.VariantType, self.datatypes[name])))
+                    data_value.SourceTimestamp = now
+                    data_value.ServerTimestamp = now
+                    status = self._aspace.set_attribute_value(self.nodes[name].nodeid, value_attribute, data_value)
+                    if not status.is_good():
+                        print(f"🚨 ERRO ao escrever {name}: {status}")
+            finally:
+                self._flushing = False
+            self.writes += len(pending)
+            self.flushes += 1
+            return len(pending)
+
+    def report(self) -> str:
+        total = self.writes + self.suppressed + len(self.pending)
+        ratio = self.suppressed / total if total else 0.0
+        return (f"{self.writes} escritas em {self.flushes} lotes, {self.suppressed} suprimidas ({ratio:.0%}), "
+                f"{self.edge_flushes} flushes por borda, {self.external} mudanças externas")
@@ -0,0 +1,221 @@
+import datetime
+import time
+from array import array
+from time import monotonic_ns
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from controller.TagTable import TagTable
+
+# --- Registro central de tags (servidor e logger) ---
+#
+# Cada tag recebe um índice inteiro na primeira vez em que aparece; valor
+# atual e anterior ficam em arrays tipados, uma coluna por tipo de dado
+# (Boolean, inteiros, Float/Double; os demais tipos em lista), e o instante da
+# última atualização em nanossegundos de relógio monotônico. Atualizar uma tag
+# é escrever em posições de arrays: nenhum dict ou string é criado por evento.
+
+# VariantType -> typecode do array ("o" = lista de objetos Python)
+TYPECODES = {
+    "Boolean": "b",
+    "SByte": "i", "Byte": "i", "Int16": "i", "UInt16": "i", "Int32": "i",
+    "UInt32": "q", "Int64": "q",
+    # Float também em double: o valor lido volta idêntico ao escrito (comparações de igualdade)
+    "Float": "d",
+    "Double": "d",
+}
+OBJECT_TYPECODE = "o"
+
+
+class _Column(object):
+    """ Valores atual e anterior das tags de um mesmo typecode. """
+    __slots__ = ("typecode", "current", "previous", "cast")
+
+    def __init__(self, typecode: str):
+        self.typecode = typecode
+        if typecode == OBJECT_TYPECODE:
+            self.current: Any = []
+            self.previous: Any = []
+        else:
+            self.current = array(typecode)
+            self.previous = array(typecode)
+        # Booleanos são guardados como 0/1 e voltam como bool
+        self.cast = bool if typecode == "b" else None
+
+    def append(self):
+        empty = None if self.typecode == OBJECT_TYPECODE else 0
+        self.current.append(empty)
+        self.previous.append(empty)
+        return len(self.current) - 1
+
+
+class TagRegistry(object):
+    """
+    Registro de tags com índice inteiro estável por tag.
+
+    - intern(node_id, datatype, name): índice da tag (criada se necessário);
+      index(chave) procura por NodeId string, nome curto ou alias (ex.: o
+      objeto ua.NodeId, registrado com alias()).
+    - set(i, valor): o valor atual vira o anterior; get(i) / previous(i)
+      devolvem None enquanto a tag não tiver valor.
+    - updated[i]: relógio monotônico (ns) da última atualização; wall_time()
+      converte para datetime local.
+    - node_ids, names e datatypes são listas indexadas pelo índice da tag, com
+      as mesmas strings de sempre (sem alocar nada na leitura).
+
+    Não é thread-safe para escritores concorrentes na mesma tag; cada processo
+    (servidor, logger) atualiza o seu a partir de uma única thread.
+    """
+    def __init__(self):
+        self.node_ids: List[str] = []
+        self.names: List[str] = []
+        self.datatypes: List[str] = []
+        self._columns: Dict[str, _Column] = {}
+        # Posição de cada tag: (valores atuais, valores anteriores, slot, conversão na leitura)
+        self._loc: List[tuple] = []
+        self._has_value = array("b")
+        self._has_previous = array("b")
+        self.updated = array("q")
+        self.demotions = 0          # Tags que saíram da coluna tipada (ver _demote)
+        self._index: Dict[Any, int] = {}
+        self._by_name: Dict[str, int] = {}
+        # Âncora para converter o relógio monotônico em hora local
+        self.epoch_wall_ns = time.time_ns()
+        self.epoch_monotonic_ns = time.monotonic_ns()
+
+    @classmethod
+    def from_table(cls, table: TagTable, ns_index: int = 2, root: Optional[str] = None,
+                   exclude_folders=()) -> "TagRegistry":
+        """ Registro com as tags da tabela, na ordem da tabela. """
+        registry = cls()
+        for tag in table.tags:
+            if tag.folder not in exclude_folders:
+                registry.intern(table.node_id(tag, ns_index, root), tag.datatype, tag.name)
+        return registry
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index or key in self._by_name
+
+    # --- Índices ---
+
+    def intern(self, node_id: str, datatype: str, name: Optional[str] = None) -> int:
+        """ Índice da tag 'node_id', registrando-a (com o tipo e o nome curto) se for nova. """
+        index = self._index.get(node_id)
+        if index is not None:
+            return index
+        index = len(self.node_ids)
+        name = name or node_id.rsplit(";s=", 1)[-1].rsplit(".", 1)[-1]
+        typecode = TYPECODES.get(datatype, OBJECT_TYPECODE)
+        column = self._columns.get(typecode)
+        if column is None:
+            column = self._columns[typecode] = _Column(typecode)
+        self.node_ids.append(node_id)
+        self.names.append(name)
+        self.datatypes.append(datatype)
+        self._loc.append((column.current, column.previous, column.append(), column.cast))
+        self._has_value.append(0)
+        self._has_previous.append(0)
+        self.updated.append(0)
+        self._index[node_id] = index
+        self._by_name.setdefault(name, index)
+        return index
+
+    def alias(self, key, index: int):
+        """ Registra outra chave (ex.: o ua.NodeId da notificação) para o mesmo índice. """
+        self._index[key] = index
+
+    def index(self, key) -> int:
+        """ Índice por NodeId string, alias ou nome curto (KeyError se não existir). """
+        index = self._index.get(key)
+        if index is None:
+            index = self._by_name[key]
+        return index
+
+    def get_index(self, key) -> Optional[int]:
+        index = self._index.get(key)
+        return self._by_name.get(key) if index is None else index
+
+    # --- Valores ---
+
+    def set(self, index: int, value: Any, now_ns: Optional[int] = None):
+        """ Atualiza a tag: valor atual -> anterior, 'value' -> atual. """
+        current, previous, slot, _ = self._loc[index]
+        previous[slot] = current[slot]
+        has_value = self._has_value
+        self._has_previous[index] = has_value[index]
+        try:
+            current[slot] = value
+        except (TypeError, OverflowError):
+            # Valor fora do tipo declarado (ex.: None, string): a tag passa a usar a coluna de objetos
+            self._demote(index)
+            current, _, slot, _ = self._loc[index]
+            current[slot] = value
+        has_value[index] = 1
+        self.updated[index] = monotonic_ns() if now_ns is None else now_ns
+
+    def get(self, index: int) -> Any:
+        if not self._has_value[index]:
+            return None
+        current, _, slot, cast = self._loc[index]
+        return current[slot] if cast is None else cast(current[slot])
+
+    def previous(self, index: int) -> Any:
+        if not self._has_previous[index]:
+            return None
+        _, previous, slot, cast = self._loc[index]
+        return previous[slot] if cast is None else cast(previous[slot])
+
+    def has_value(self, index: int) -> bool:
+        return bool(self._has_value[index])
+
+    def _demote(self, index: int):
+        _, old_previous, old_slot, cast = self._loc[index]
+        column = self._columns.get(OBJECT_TYPECODE)
+        if column is None:
+            column = self._columns[OBJECT_TYPECODE] = _Column(OBJECT_TYPECODE)
+        slot = column.append()
+        if self._has_previous[index]:
+            value = old_previous[old_slot]
+            column.previous[slot] = value if cast is None else cast(value)
+        self._loc[index] = (column.current, column.previous, slot, column.cast)
+        self.demotions += 1
+
+    # --- Leitura em bloco e tempo ---
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """ (node_id, valor atual) das tags que já têm valor. """
+        for index, node_id in enumerate(self.node_ids):
+            if self._has_value[index]:
+                yield node_id, self.get(index)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def layout(self) -> List[Tuple[str, int]]:
+        """ (typecode, posição na coluna) de cada tag, na ordem dos índices. """
+        typecodes = {id(column.current): column.typecode for column in self._columns.values()}
+        return [(typecodes[id(current)], slot) for current, _, slot, _ in self._loc]
+
+    def column(self, typecode: str):
+        """ Array dos valores atuais de um typecode (vazio se nenhuma tag o usa). """
+        column = self._columns.get(typecode)
+        return column.current if column is not None else array(typecode)
+
+    @property
+    def valid(self) -> array:
+        """ 1 para as tags que já têm valor (array 'b' indexado pelo índice da tag). """
+        return self._has_value
+
+    def wall_time(self, monotonic_ns: int) -> datetime.datetime:
+        """ Hora local (datetime) correspondente a um instante do relógio monotônico. """
+        return datetime.datetime.fromtimestamp((self.epoch_wall_ns + monotonic_ns - self.epoch_monotonic_ns) / 1e9)
+
+    def memory_bytes(self) -> int:
+        """ Bytes ocupados pelos arrays de valores e tempos (sem as strings dos nomes). """
+        total = sum(a.itemsize * len(a) for a in (self._has_value, self._has_previous, self.updated))
+        for column in self._columns.values():
+            if column.typecode != OBJECT_TYPECODE:
+                total += 2 * column.current.itemsize * len(column.current)
+        return total
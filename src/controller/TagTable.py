@@ -0,0 +1,171 @@
+import json
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from opcua import Node, ua
+
+# Tabela de tags padrão da Linha de Triagem
+DEFAULT_TAG_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "linha_triagem_tags.json")
+
+# Tipos de dado aceitos na coluna "datatype"
+DATATYPES: Dict[str, int] = {
+    "Boolean": ua.ObjectIds.Boolean,
+    "Int32": ua.ObjectIds.Int32,
+    "Float": ua.ObjectIds.Float,
+    "Double": ua.ObjectIds.Double,
+    "String": ua.ObjectIds.String,
+}
+
+# Valores aceitos na coluna "access"
+ACCESS_LEVELS: Dict[str, int] = {
+    "r": ua.AccessLevel.CurrentRead.mask,
+    "rw": ua.AccessLevel.CurrentRead.mask | ua.AccessLevel.CurrentWrite.mask,
+}
+
+
+class TagDefinition(NamedTuple):
+    """ Uma linha da tabela de tags. """
+    name: str
+    folder: str
+    datatype: str
+    initial: Any
+    access: str = "rw"
+
+
+class TagTable(NamedTuple):
+    """
+    Esquema declarativo do Address Space: namespace, pasta raiz, subpastas e tags.
+    Os NodeIds são strings estáveis no formato "<raiz>.<pasta>.<tag>", então não
+    dependem da ordem de criação dos nós.
+    """
+    namespace_uri: str
+    root: str
+    folders: Tuple[str, ...]
+    tags: Tuple[TagDefinition, ...]
+
+    def node_id(self, tag: TagDefinition, ns_index: int = 2, root: Optional[str] = None) -> str:
+        """ NodeId (string) de uma tag, ex.: "ns=2;s=Linha_Triagem_IIoT.Contadores_PLC.C_TOTAL". """
+        return f"ns={ns_index};s={root or self.root}.{tag.folder}.{tag.name}"
+
+    def node_ids(self, ns_index: int = 2, root: Optional[str] = None, exclude_folders: Tuple[str, ...] = ()) -> List[str]:
+        """ Lista de NodeIds das tags (exceto as das pastas em exclude_folders), na ordem da tabela. """
+        return [self.node_id(tag, ns_index, root) for tag in self.tags if tag.folder not in exclude_folders]
+
+
+def load_tag_table(path: str = DEFAULT_TAG_TABLE_PATH) -> TagTable:
+    """ Carrega e valida o arquivo JSON da tabela de tags. """
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    folders = tuple(raw["folders"])
+    tags = tuple(TagDefinition(**entry) for entry in raw["tags"])
+
+    seen = set()
+    for tag in tags:
+        if tag.folder not in folders:
+            raise ValueError(f"Tag '{tag.name}' referencia a pasta desconhecida '{tag.folder}'.")
+        if tag.datatype not in DATATYPES:
+            raise ValueError(f"Tag '{tag.name}' usa o tipo de dado não suportado '{tag.datatype}'.")
+        if tag.access not in ACCESS_LEVELS:
+            raise ValueError(f"Tag '{tag.name}' usa o nível de acesso inválido '{tag.access}'.")
+        if tag.name in seen:
+            raise ValueError(f"Tag '{tag.name}' declarada mais de uma vez.")
+        seen.add(tag.name)
+
+    return TagTable(raw["namespace_uri"], raw["root"], folders, tags)
+
+
+def _folder_item(ua, parent_id, node_id, name: str, idx: int, reference: int):
+    addnode = ua.AddNodesItem()
+    addnode.RequestedNewNodeId = node_id
+    addnode.BrowseName = ua.QualifiedName(name, idx)
+    addnode.ParentNodeId = parent_id
+    addnode.ReferenceTypeId = ua.NodeId(reference)
+    addnode.NodeClass = ua.NodeClass.Object
+    addnode.TypeDefinition = ua.NodeId(ua.ObjectIds.FolderType)
+    attrs = ua.ObjectAttributes()
+    attrs.EventNotifier = 0
+    attrs.Description = ua.LocalizedText(name)
+    attrs.DisplayName = ua.LocalizedText(name)
+    attrs.WriteMask = 0
+    attrs.UserWriteMask = 0
+    addnode.NodeAttributes = attrs
+    return addnode
+
+
+def _variable_item(ua, parent_id, node_id, tag: TagDefinition, idx: int):
+    addnode = ua.AddNodesItem()
+    addnode.RequestedNewNodeId = node_id
+    addnode.BrowseName = ua.QualifiedName(tag.name, idx)
+    addnode.NodeClass = ua.NodeClass.Variable
+    addnode.ParentNodeId = parent_id
+    addnode.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HasComponent)
+    addnode.TypeDefinition = ua.NodeId(ua.ObjectIds.BaseDataVariableType)
+    attrs = ua.VariableAttributes()
+    attrs.Description = ua.LocalizedText(tag.name)
+    attrs.DisplayName = ua.LocalizedText(tag.name)
+    attrs.DataType = ua.NodeId(DATATYPES[tag.datatype])
+    attrs.Value = ua.Variant(tag.initial, getattr(ua.VariantType, tag.datatype))
+    attrs.ValueRank = ua.ValueRank.Scalar
+    attrs.WriteMask = 0
+    attrs.UserWriteMask = 0
+    attrs.Historizing = False
+    attrs.AccessLevel = ACCESS_LEVELS[tag.access]
+    attrs.UserAccessLevel = ACCESS_LEVELS[tag.access]
+    addnode.NodeAttributes = attrs
+    return addnode
+
+
+def _address_space_items(ua, parent_id, idx: int, table: TagTable, root: str):
+    """
+    Monta as requisições AddNodes da pasta raiz, das subpastas e das variáveis.
+    'ua' é o módulo de tipos da biblioteca em uso (opcua.ua ou asyncua.ua).
+    """
+    root_id = ua.NodeId(root, idx)
+
+    folder_items = [_folder_item(ua, parent_id, root_id, root, idx, ua.ObjectIds.Organizes)]
+    folder_ids = {}
+    for folder in table.folders:
+        folder_ids[folder] = ua.NodeId(f"{root}.{folder}", idx)
+        folder_items.append(_folder_item(ua, root_id, folder_ids[folder], folder, idx, ua.ObjectIds.Organizes))
+
+    variable_items = [
+        _variable_item(ua, folder_ids[tag.folder], ua.NodeId(f"{root}.{tag.folder}.{tag.name}", idx), tag, idx)
+        for tag in table.tags
+    ]
+    return folder_items, variable_items
+
+
+def build_address_space(parent: Node, idx: int, table: TagTable, root: Optional[str] = None) -> Dict[str, Node]:
+    """
+    Cria a pasta raiz, as subpastas e todas as variáveis da tabela em duas
+    chamadas AddNodes (uma para as pastas, outra para as variáveis), já com o
+    nível de acesso final — sem add_variable/set_writable nó a nó.
+
+    :param parent: Nó onde a pasta raiz será criada (ex.: server.get_objects_node()).
+    :param idx: Índice do namespace registrado.
+    :param root: Nome alternativo para a pasta raiz (padrão: table.root).
+    :return: Dicionário {nome_da_tag: Node}.
+    """
+    session = parent.server
+    folder_items, variable_items = _address_space_items(ua, parent.nodeid, idx, table, root or table.root)
+
+    for items in (folder_items, variable_items):
+        for result in session.add_nodes(items):
+            result.StatusCode.check()
+
+    return {tag.name: Node(session, item.RequestedNewNodeId) for tag, item in zip(table.tags, variable_items)}
+
+
+async def build_address_space_async(parent, idx: int, table: TagTable, root: Optional[str] = None) -> Dict[str, Any]:
+    """ Equivalente de build_address_space para servidores asyncua. """
+    from asyncua import Node as AsyncNode, ua as async_ua
+
+    session = parent.session
+    folder_items, variable_items = _address_space_items(async_ua, parent.nodeid, idx, table, root or table.root)
+
+    for items in (folder_items, variable_items):
+        for result in await session.add_nodes(items):
+            result.StatusCode.check()
+
+    return {tag.name: AsyncNode(session, item.RequestedNewNodeId) for tag, item in zip(table.tags, variable_items)}
@@ -0,0 +1,164 @@
+import asyncio
+import inspect
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+from controller.Metrics import LatencyHistogram
+
+
+class TickTask(NamedTuple):
+    """ Tarefa executada a cada 'every' ciclos. """
+    name: str
+    callback: Callable[[int], None]
+    every: int
+
+
+class TickScheduler(object):
+    """
+    Executa tarefas periódicas contra deadlines absolutos (inicio + k * periodo),
+    então o tempo gasto nas tarefas não acumula deriva como em um
+    "trabalho + time.sleep(periodo)".
+
+    Se um ciclo termina depois do próximo deadline, conta-se um overrun e os
+    ciclos perdidos são pulados (contados em 'skipped'), mantendo a fase. Uma
+    tarefa cujo ciclo caiu dentro dos pulados roda no primeiro ciclo seguinte
+    (uma única vez, mesmo que tenha perdido vários), e volta à sua fase.
+
+    São mantidos dois histogramas:
+      - wakeup_latency: atraso entre o deadline e o início efetivo do ciclo;
+      - tick_duration: tempo de execução das tarefas de um ciclo.
+    """
+    MIN_PERIOD_S = 0.001
+    MAX_PERIOD_S = 1.0
+
+    def __init__(self, period_s: float, spin_s: float = 0.0005):
+        """
+        :param period_s: Período do ciclo, entre 1 ms e 1 s.
+        :param spin_s: Antes do deadline, os últimos spin_s segundos são aguardados
+                       em espera ativa (o time.sleep não tem resolução para ciclos de 1 ms).
+        """
+        if not self.MIN_PERIOD_S <= period_s <= self.MAX_PERIOD_S:
+            raise ValueError(f"Período deve estar entre {self.MIN_PERIOD_S}s e {self.MAX_PERIOD_S}s (recebido {period_s}s).")
+        self.period_ns = int(period_s * 1e9)
+        self.spin_ns = int(spin_s * 1e9)
+        self.tasks: List[TickTask] = []
+        self._next_due: List[int] = []          # Próximo ciclo de cada tarefa (mesma ordem de 'tasks')
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.wakeup_latency = LatencyHistogram()
+        self.tick_duration = LatencyHistogram()
+        self._stop_event = threading.Event()
+
+    @property
+    def period_s(self) -> float:
+        return self.period_ns / 1e9
+
+    def add_task(self, callback: Callable[[int], None], every: int = 1, name: Optional[str] = None):
+        """
+        Registra uma tarefa. O callback recebe o número do ciclo.
+
+        :param every: Executa a tarefa a cada 'every' ciclos (1 = todo ciclo).
+        """
+        if every < 1:
+            raise ValueError("'every' deve ser >= 1.")
+        self.tasks.append(TickTask(name or getattr(callback, "__name__", "task"), callback, every))
+        self._next_due.append(0)
+
+    def every_seconds(self, seconds: float) -> int:
+        """ Converte um intervalo em segundos para um número de ciclos (mínimo 1). """
+        return max(1, round(seconds / self.period_s))
+
+    def stop(self):
+        """ Solicita a parada do loop (pode ser chamado de outra thread). """
+        self._stop_event.set()
+
+    def _wait_until(self, deadline_ns: int):
+        remaining = deadline_ns - time.perf_counter_ns()
+        if remaining > self.spin_ns:
+            self._stop_event.wait((remaining - self.spin_ns) / 1e9)
+        while time.perf_counter_ns() < deadline_ns and not self._stop_event.is_set():
+            pass
+
+    def due(self, tick: int) -> List[TickTask]:
+        """
+        Tarefas a executar no ciclo 'tick', na ordem de registro: as que chegaram
+        ao seu próximo ciclo (ou o perderam num overrun). O próximo ciclo de cada
+        uma volta ao múltiplo de 'every' seguinte.
+        """
+        tasks = []
+        next_due = self._next_due
+        for i, task in enumerate(self.tasks):
+            if tick >= next_due[i]:
+                tasks.append(task)
+                next_due[i] = (tick // task.every + 1) * task.every
+        return tasks
+
+    def _advance(self, tick: int, deadline: int, started: int, finished: int):
+        """ Registra as métricas do ciclo e calcula o próximo (tick, deadline). """
+        self.tick_duration.record(finished - started)
+        self.ticks += 1
+        tick += 1
+
+        # Próximo deadline absoluto; se já passou, conta overrun e pula os ciclos perdidos
+        deadline += self.period_ns
+        if finished > deadline:
+            self.overruns += 1
+            missed = (finished - deadline) // self.period_ns + 1
+            self.skipped += missed
+            tick += missed
+            deadline += missed * self.period_ns
+        return tick, deadline
+
+    def run(self, max_ticks: Optional[int] = None):
+        """ Executa o loop até stop() (ou até max_ticks ciclos). """
+        self._stop_event.clear()
+        self._next_due = [0] * len(self.tasks)
+        tick = 0
+        deadline = time.perf_counter_ns()
+        while not self._stop_event.is_set() and (max_ticks is None or tick < max_ticks):
+            self._wait_until(deadline)
+            if self._stop_event.is_set():
+                break
+
+            started = time.perf_counter_ns()
+            self.wakeup_latency.record(started - deadline)
+
+            for task in self.due(tick):
+                task.callback(tick)
+
+            tick, deadline = self._advance(tick, deadline, started, time.perf_counter_ns())
+
+    async def run_async(self, max_ticks: Optional[int] = None):
+        """
+        Versão asyncio de run(): aguarda os deadlines com asyncio.sleep (sem espera
+        ativa, para não bloquear o event loop) e aceita callbacks síncronos ou
+        corrotinas.
+        """
+        self._stop_event.clear()
+        self._next_due = [0] * len(self.tasks)
+        tick = 0
+        deadline = time.perf_counter_ns()
+        while not self._stop_event.is_set() and (max_ticks is None or tick < max_ticks):
+            remaining = deadline - time.perf_counter_ns()
+            if remaining > 0:
+                await asyncio.sleep(remaining / 1e9)
+            if self._stop_event.is_set():
+                break
+
+            started = time.perf_counter_ns()
+            self.wakeup_latency.record(started - deadline)
+
+            for task in self.due(tick):
+                result = task.callback(tick)
+                if inspect.isawaitable(result):
+                    await result
+
+            tick, deadline = self._advance(tick, deadline, started, time.perf_counter_ns())
+
+    def report(self) -> str:
+        """ Resumo textual dos contadores e histogramas. """
+        return (f"ciclos: {self.ticks} | overruns: {self.overruns} | pulados: {self.skipped}\n"
+                f"   latência de despertar: {self.wakeup_latency.summary()}\n"
+                f"   duração do ciclo:      {self.tick_duration.summary()}")
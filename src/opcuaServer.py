@@ -1,150 +1,350 @@
+import argparse
+import multiprocessing
 import time
-from opcua import Server, ua
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
+from opcua import Node, Server
+
+from controller.ConveyorSimulator import ConveyorSimulator
 from controller.EmitterController import BoxCompetitor
+from controller.Metrics import LatencyHistogram, MetricsRegistry, build_diagnostic_nodes, serve_http, timed
+from controller.PLCEmulator import ScanEngine, ServerIO
+from controller.TagCache import TagCache
+from controller.TagTable import build_address_space, load_tag_table
+from controller.TickScheduler import TickScheduler
 
 # --- 1. CONFIGURAÇÕES BÁSICAS ---
 # Endereço de conexão do Servidor
-OPCUA_ENDPOINT = "opc.tcp://127.0.0.2:4840"
+OPCUA_HOST = "127.0.0.2"
+OPCUA_PORT = 4840
+OPCUA_ENDPOINT = f"opc.tcp://{OPCUA_HOST}:{OPCUA_PORT}"
 SERVER_NAME = "Servidor_PLC_Linha_Triagem"
-NAMESPACE_URI = "http://controle.fabrica.com/ns"
 
-def run_opcua_server():
+# Temporização do loop de manutenção
+TICK_PERIOD_S = 1.0         # Período do ciclo do servidor (1 ms a 1 s)
+EMITTER_PERIOD_S = 1.0      # Intervalo entre sorteios de peça do emissor
+MONITOR_PERIOD_S = 10.0     # Intervalo das mensagens de monitoramento no console
+METRICS_PORT = 19100        # Métricas em http://127.0.0.1:19100/metrics (0 desativa; processo w usa 19100 + w)
+METRICS_PORT_RANGE = 100    # Portas reservadas aos processos do servidor (o logger usa 19000)
+DIAGNOSTIC_PERIOD_S = 1.0   # Intervalo de atualização das variáveis Diagnostico.Servidor.*
+SHARED_SNAPSHOT = False     # Publica as tags em memória compartilhada (opcua_snapshot_<host>_<porta>) a cada ciclo
+
+# Esquema do Address Space (namespace, pastas e tags)
+TAG_TABLE = load_tag_table()
+NAMESPACE_URI = TAG_TABLE.namespace_uri
+
+
+class SortingLine:
+    """
+    Uma linha de triagem exposta pelo servidor: seus nós (contadores, sensores,
+    atuadores...), o seu próprio BoxCompetitor para o emissor e o TagCache por
+    onde passam todas as leituras e escritas do servidor nas tags da linha.
+    Com competition_time, cada run_competition (emissor ou planta simulada) é cronometrado.
+    """
+    def __init__(self, name: str, nodes: Dict[str, Node], cache: TagCache, seed: Optional[int] = None,
+                 competition_time: Optional[LatencyHistogram] = None):
+        self.name = name
+        self.nodes = nodes
+        self.cache = cache
+        self.competitor = BoxCompetitor(seed)
+        if competition_time is not None:
+            self.competitor.run_competition = timed(self.competitor.run_competition, competition_time)
+        self.plc: Optional[ScanEngine] = None
+        self.simulator: Optional[ConveyorSimulator] = None
+
+    def tick(self):
+        """ Sorteia a próxima peça do emissor e a enfileira em Emitter_0_Part (Int32), se mudou. """
+        vencedor, _, _, _ = self.competitor.run_competition()
+        self.cache.set("Emitter_0_Part", self.competitor.PART_TYPES[vencedor])
+
+    def attach_plc(self, cycle_ms: int) -> ScanEngine:
+        """
+        Executa o PLC_PRG emulado (controller.PLCEmulator) sobre os nós desta linha,
+        no lugar do CODESYS: a cada varredura lê os sensores e escreve as saídas que mudaram.
+        """
+        server_io = ServerIO(self.cache, TAG_TABLE)
+        self.plc = ScanEngine(cycle_ms=cycle_ms, before_scan=server_io.read_inputs, after_scan=server_io.write_outputs)
+        server_io.load(self.plc.io)
+        return self.plc
+
+    def attach_simulator(self) -> ConveyorSimulator:
+        """
+        Simula a planta (controller.ConveyorSimulator) no lugar do Factory I/O: as peças
+        usam o BoxCompetitor da linha e as transições de sensores passam pelo TagCache.
+        """
+        def write(name, value, t_ms):
+            self.cache.set(name, value)
+
+        io = {name: self.cache.get(name) for name in self.nodes}
+        self.simulator = ConveyorSimulator(io, self.competitor, on_change=write)
+        return self.simulator
+
+    def simulate(self, now_ms: float):
+        """ Lê os atuadores do servidor e avança a planta simulada até now_ms. """
+        simulator = self.simulator
+        for name in ("Belt_Conveyor_6m_0", "Emitter_0_Emit", "Pusher_0"):
+            simulator.io[name] = self.cache.get(name)
+        simulator.apply_outputs()
+        simulator.advance_to(now_ms)
+
+
+def line_names(n_lines: int, first: int = 0, total: Optional[int] = None) -> List[str]:
+    """
+    Nomes das pastas raiz das linhas. Com uma única linha mantém o nome original
+    (Linha_Triagem_IIoT); com várias, numera: Linha_Triagem_IIoT_000, _001, ...
+    """
+    total = n_lines if total is None else total
+    if total == 1:
+        return [TAG_TABLE.root]
+    return [f"{TAG_TABLE.root}_{i:03d}" for i in range(first, first + n_lines)]
+
+
+def create_server(endpoint: str, names: List[str], seed: Optional[int] = None,
+                  metrics: Optional[MetricsRegistry] = None) -> Tuple[Server, List[SortingLine]]:
+    """
+    Cria o servidor e o Address Space de cada linha (ainda sem iniciá-lo).
+    Com metrics, o BoxCompetitor de cada linha é cronometrado em metrics.histogram("competicao").
+    """
     # Inicializa o servidor
     server = Server()
-    server.set_endpoint(OPCUA_ENDPOINT)
+    server.set_endpoint(endpoint)
     server.set_server_name(SERVER_NAME)
-    
+
     # --- 2. REGISTRO DO NAMESPACE E ESTRUTURA ---
-    
+
     # Registra o namespace e obtém o índice (idx)
     idx = server.register_namespace(NAMESPACE_URI)
-    
+
     # Obtém o nó de objetos raiz
     objects = server.get_objects_node()
-    
-    # Cria a pasta principal para o processo
-    process_node = objects.add_folder(idx, "Linha_Triagem_IIoT")
-    
-    # Cria subpastas para organização das variáveis
-    contadores_node = process_node.add_folder(idx, "Contadores_PLC")
-    sensores_node = process_node.add_folder(idx, "IOs_Sensores_Fisicos")
-    atuadores_node = process_node.add_folder(idx, "IOs_Atuadores_Fisicos")
-    encoder_node = process_node.add_folder(idx, "IOs_Encoder")
-    interno_node = process_node.add_folder(idx, "IOs_Internos_FactoryIO")
 
     # --- 3. CRIAÇÃO E EXPOSIÇÃO DAS VARIÁVEIS ---
-    
-    # 3.1. Variáveis de Contagem (Int32)
-    print("Criando Contadores PLC...")
-    var_total = contadores_node.add_variable(idx, "C_TOTAL", 0, datatype=ua.NodeId(ua.ObjectIds.Int32))
-    var_aprovadas = contadores_node.add_variable(idx, "C_APROVADAS", 0, datatype=ua.NodeId(ua.ObjectIds.Int32))
-    var_rejeitadas = contadores_node.add_variable(idx, "C_REJEITADAS", 0, datatype=ua.NodeId(ua.ObjectIds.Int32))
-    var_total.set_writable(); var_aprovadas.set_writable(); var_rejeitadas.set_writable()
-    
-    # 3.2. IOs de Sensores Físicos (Boolean)
-    print("Criando Sensores...")
-    
-    # Sensores Chave
-    var_diffuse_sensor_0 = sensores_node.add_variable(idx, "Diffuse_Sensor_0", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_diffuse_sensor_1 = sensores_node.add_variable(idx, "Diffuse_Sensor_1", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_pusher_back = sensores_node.add_variable(idx, "Pusher_0_Back_Limit", True, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_pusher_front = sensores_node.add_variable(idx, "Pusher_0_Front_Limit", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_emergency_stop = sensores_node.add_variable(idx, "Emergency_Stop_0", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    
-    # Botões (Entradas)
-    var_start_button = sensores_node.add_variable(idx, "Start_Button_0", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_stop_button = sensores_node.add_variable(idx, "Stop_Button_0", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_reset_button = sensores_node.add_variable(idx, "Reset_Button_0", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    
-    # Tornar todos os sensores físicos writeable (para simulação via cliente Python)
-    for var in [var_diffuse_sensor_0, var_diffuse_sensor_1, var_pusher_back, var_pusher_front, var_emergency_stop, var_start_button, var_stop_button, var_reset_button]:
-        var.set_writable()
-
-
-    # 3.3. IOs de Atuadores Físicos (Digital e Analógico)
-    print("Criando Atuadores...")
-    
-    # Transporte e Atuação
-    var_conveyor = atuadores_node.add_variable(idx, "Belt_Conveyor_6m_0", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_pusher = atuadores_node.add_variable(idx, "Pusher_0", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_emitter_emit = atuadores_node.add_variable(idx, "Emitter_0_Emit", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_emitter_base = atuadores_node.add_variable(idx, "Emitter_0_Base", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_emitter_part = atuadores_node.add_variable(idx, "Emitter_0_Part", 0, datatype=ua.NodeId(ua.ObjectIds.Int32)) # Analógico (seleção da peça)
-    var_remover_0 = atuadores_node.add_variable(idx, "Remover_0_Remove", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_remover_1 = atuadores_node.add_variable(idx, "Remover_1_Remove", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    
-    # Sinalização (Stack Light e Botões)
-    var_sl_green = atuadores_node.add_variable(idx, "Stack_Light_0_Green", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_sl_red = atuadores_node.add_variable(idx, "Stack_Light_0_Red", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_sl_yellow = atuadores_node.add_variable(idx, "Stack_Light_0_Yellow", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_warning_light = atuadores_node.add_variable(idx, "Warning_Light_0", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_start_light = atuadores_node.add_variable(idx, "Start_Button_0_Light", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_stop_light = atuadores_node.add_variable(idx, "Stop_Button_0_Light", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_reset_light = atuadores_node.add_variable(idx, "Reset_Button_0_Light", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    
-    # Displays
-    var_display_0 = atuadores_node.add_variable(idx, "Digital_Display_0", 0, datatype=ua.NodeId(ua.ObjectIds.Int32))
-    var_display_1 = atuadores_node.add_variable(idx, "Digital_Display_1", 0, datatype=ua.NodeId(ua.ObjectIds.Int32))
-    
-    # Tornar todos os atuadores writeable
-    for var in [var_conveyor, var_pusher, var_emitter_emit, var_emitter_base, var_emitter_part, var_remover_0, var_remover_1, var_sl_green, var_sl_red, var_sl_yellow, var_warning_light, var_start_light, var_stop_light, var_reset_light, var_display_0, var_display_1]:
-        var.set_writable()
-        
-    # 3.4. IOs de Encoder (Boolean)
-    print("Criando Encoder...")
-    var_encoder_a = encoder_node.add_variable(idx, "Belt_Conveyor_0_Encoder_Signal_A", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_encoder_b = encoder_node.add_variable(idx, "Belt_Conveyor_0_Encoder_Signal_B", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_encoder_a.set_writable(); var_encoder_b.set_writable()
-
-    # 3.5. IOs Internos do Factory I/O (Boolean/Analógico)
-    print("Criando Variáveis Internas...")
-    var_io_running = interno_node.add_variable(idx, "FACTORY_IO_Running", True, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_io_reset = interno_node.add_variable(idx, "FACTORY_IO_Reset", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_io_paused = interno_node.add_variable(idx, "FACTORY_IO_Paused", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_io_run = interno_node.add_variable(idx, "FACTORY_IO_Run", True, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_io_pause = interno_node.add_variable(idx, "FACTORY_IO_Pause", False, datatype=ua.NodeId(ua.ObjectIds.Boolean))
-    var_io_timescale = interno_node.add_variable(idx, "FACTORY_IO_TimeScale", 1.0, datatype=ua.NodeId(ua.ObjectIds.Float))
-    var_io_cam_pos = interno_node.add_variable(idx, "FACTORY_IO_CameraPosition", 0.0, datatype=ua.NodeId(ua.ObjectIds.Float)) # Usando Float simples para simplificar
-    
-    for var in [var_io_running, var_io_reset, var_io_paused, var_io_run, var_io_pause, var_io_timescale, var_io_cam_pos]:
-        var.set_writable()
-
-    # --- 4. INICIALIZAÇÃO DO SERVIDOR ---
-    
+
+    # Pastas e variáveis vêm da tabela de tags (config/linha_triagem_tags.json),
+    # criadas em lote com NodeIds string estáveis (ex.: ns=2;s=Linha_Triagem_IIoT.Contadores_PLC.C_TOTAL)
+    print(f"Criando {len(names)} linha(s) com {len(TAG_TABLE.tags)} variáveis em {len(TAG_TABLE.folders)} pastas...")
+    competition_time = metrics.histogram("competicao") if metrics is not None else None
+    lines = []
+    for i, name in enumerate(names):
+        nodes = build_address_space(objects, idx, TAG_TABLE, root=name)
+        lines.append(SortingLine(name, nodes, TagCache(server, nodes, TAG_TABLE), None if seed is None else seed + i,
+                                 competition_time))
+    return server, lines
+
+
+def run_opcua_server(names: Optional[List[str]] = None, endpoint: str = OPCUA_ENDPOINT, seed: Optional[int] = None,
+                     period_s: float = TICK_PERIOD_S, emitter_period_s: float = EMITTER_PERIOD_S, plc: bool = False,
+                     simulate: bool = False, metrics_port: int = METRICS_PORT, snapshot: bool = SHARED_SNAPSHOT):
+    """
+    Executa um servidor com uma ou mais linhas de triagem.
+
+    :param names: Pastas raiz das linhas (padrão: uma única Linha_Triagem_IIoT).
+    :param endpoint: Endpoint OPC UA deste servidor.
+    :param seed: Semente base; a linha i usa seed + i.
+    :param period_s: Período do ciclo do servidor (TickScheduler).
+    :param emitter_period_s: Intervalo entre sorteios de peça do emissor.
+    :param plc: Executa o PLC_PRG emulado em cada linha, uma varredura por ciclo do servidor.
+    :param simulate: Simula a planta (peças, sensores, pistão, encoder) em cada linha; o
+                     emissor passa a escrever Emitter_0_Part a cada peça emitida.
+    :param metrics_port: Porta HTTP local das métricas (/metrics e /metrics.json); 0 desativa.
+    :param snapshot: Publica os valores de todas as tags em memória compartilhada ao fim de cada
+                     ciclo (controller.SharedSnapshot), para consumidores na mesma máquina.
+    """
+    names = names or line_names(1)
+    metrics = MetricsRegistry()
+    server, lines = create_server(endpoint, names, seed, metrics)
+    first_line = lines[0]
+    # Variáveis de diagnóstico (Diagnostico/Servidor, escritas aqui, e Diagnostico/Logger, escritas pelo logger)
+    diagnostic_nodes = build_diagnostic_nodes(server.get_objects_node(), server.get_namespace_index(NAMESPACE_URI))
+
+    # --- 4. LOOP DE MANUTENÇÃO (Mantém o servidor rodando) ---
+    # ************************************************************
+    # * CLIENTE (CODESYS/PYTHON ORQUESTRADOR) ESCREVE AQUI       *
+    # * O SERVIDOR APENAS MANTÉM OS NÓS ATIVOS                   *
+    # ************************************************************
+    scheduler = TickScheduler(period_s)
+    metrics.add_histogram("ciclo_duracao", scheduler.tick_duration)
+    metrics.add_histogram("ciclo_despertar", scheduler.wakeup_latency)
+    metrics.gauge("ciclo_overruns", lambda: scheduler.overruns)
+    metrics.gauge("ciclo_pulados", lambda: scheduler.skipped)
+    metrics.gauge("tags_escritas", lambda: sum(line.cache.writes for line in lines))
+    metrics.gauge("tags_suprimidas", lambda: sum(line.cache.suppressed for line in lines))
+    flush_time = metrics.histogram("flush_tags")
+    snapshot_writer = None
+    if snapshot:
+        # Só o snapshot depende do NumPy no servidor
+        from controller.SharedSnapshot import SnapshotWriter, snapshot_name
+
+        address = urlparse(endpoint)
+        snapshot_writer = SnapshotWriter(snapshot_name(address.hostname, address.port),
+                                         [line.cache.registry for line in lines])
+        snapshot_writer.publish()
+        snapshot_time = metrics.histogram("snapshot_publicacao")
+        metrics.gauge("snapshot_publicacoes", lambda: snapshot_writer.publishes)
+        print(f"Snapshot das tags em memória compartilhada: {snapshot_writer.name} ({snapshot_writer.shm.size} bytes)")
+    http_server = serve_http(metrics, metrics_port, prefix="servidor_") if metrics_port else None
+    if http_server:
+        print(f"Métricas em http://127.0.0.1:{metrics_port}/metrics")
+
+    def tick_emitters(tick):
+        for line in lines:
+            line.tick()
+
+    def monitor(tick):
+        # Exemplo Simples de Monitoramento para o console
+        print(f"Server ativo. C_TOTAL: {first_line.cache['C_TOTAL']} | Sensor Difuso: {first_line.cache['Diffuse_Sensor_0']}"
+              f" | overruns: {scheduler.overruns}")
+
+    scheduler.add_task(monitor, every=scheduler.every_seconds(MONITOR_PERIOD_S), name="monitor")
+
+    if simulate:
+        # A planta avança em tempo real (um período do servidor por ciclo), antes da varredura do CLP
+        for line in lines:
+            line.attach_simulator()
+
+        def simulate_plant(tick):
+            now_ms = tick * period_s * 1000
+            for line in lines:
+                line.simulate(now_ms)
+
+        scheduler.add_task(simulate_plant, every=1, name="plant")
+        print(f"Planta simulada ativa em {len(lines)} linha(s).")
+    else:
+        scheduler.add_task(tick_emitters, every=scheduler.every_seconds(emitter_period_s), name="emitters")
+
+    if plc:
+        # O relógio virtual do CLP avança um período do servidor por varredura
+        engines = [line.attach_plc(round(period_s * 1000)) for line in lines]
+
+        def scan_plc(tick):
+            for engine in engines:
+                engine.scan()
+
+        scheduler.add_task(scan_plc, every=1, name="plc")
+        print(f"PLC_PRG emulado ativo em {len(engines)} linha(s), ciclo de {period_s * 1000:g} ms.")
+
+    published_changes = [-1]
+
+    def flush_caches(tick):
+        # Último passo do ciclo: uma escrita em lote por linha com o que mudou
+        start = time.perf_counter_ns()
+        for line in lines:
+            line.cache.flush()
+        flush_time.record(time.perf_counter_ns() - start)
+        if snapshot_writer is not None:
+            # Republica só se alguma tag mudou (escrita do servidor ou de um cliente)
+            changes = sum(line.cache.writes + line.cache.external for line in lines)
+            if changes != published_changes[0]:
+                published_changes[0] = changes
+                start = time.perf_counter_ns()
+                snapshot_writer.publish()
+                snapshot_time.record(time.perf_counter_ns() - start)
+
+    def publish_diagnostics(tick):
+        for name, value in metrics.diagnostic_values("Servidor").items():
+            diagnostic_nodes["Servidor"][name].set_value(value)
+
+    scheduler.add_task(publish_diagnostics, every=scheduler.every_seconds(DIAGNOSTIC_PERIOD_S), name="diagnostics")
+    scheduler.add_task(flush_caches, every=1, name="flush")
+
+    # --- 5. INICIALIZAÇÃO DO SERVIDOR ---
+
     print("\n" + "="*50)
-    print(f"Servidor OPC UA iniciado em: {OPCUA_ENDPOINT}")
+    print(f"Servidor OPC UA iniciado em: {endpoint}")
     print("Namespace Registrado:", NAMESPACE_URI)
-    print("Todas as variáveis de I/O e Lógica foram criadas e estão Writeable.")
+    print(f"Linhas: {len(lines)} ({names[0]} ... {names[-1]})" if len(lines) > 1 else f"Linha: {names[0]}")
+    print("Todas as variáveis de I/O e Lógica foram criadas conforme a tabela de tags.")
     print("="*50 + "\n")
+    # Tudo o que pode falhar (porta das métricas, snapshot) foi montado antes de
+    # server.start(): a ThreadLoop do python-opcua não é daemon e manteria o processo vivo
     server.start()
-    
-    # --- 5. LOOP DE MANUTENÇÃO (Mantém o servidor rodando) ---
+
     try:
-        count = 0
-        competitor = BoxCompetitor()
-        while True:
-            # ************************************************************
-            # * CLIENTE (CODESYS/PYTHON ORQUESTRADOR) ESCREVE AQUI       *
-            # * O SERVIDOR APENAS MANTÉM OS NÓS ATIVOS                   *
-            # ************************************************************
-            vencedor, _, _, _ = competitor.run_competition()
-            var_emitter_part.set_value(competitor.PART_TYPES[vencedor])
-            # Exemplo Simples de Monitoramento para o console
-            if count % 10 == 0:
-                print(f"Server ativo. C_TOTAL: {var_total.get_value()} | Sensor Difuso: {var_diffuse_sensor_0.get_value()}")
-            
-            # Simulação de alteração do C_TOTAL para mostrar que está vivo
-            #var_total.set_value(var_total.get_value() + 1)
-            count += 1
-            time.sleep(1)
-            
+        scheduler.run()
+
     except KeyboardInterrupt:
         print("\nServidor sendo desligado.")
     finally:
         # Desliga o servidor de forma limpa
+        if http_server:
+            http_server.shutdown()
         server.stop()
+        if snapshot_writer is not None:
+            snapshot_writer.close()
+            print(f"Snapshot ({snapshot_writer.publishes} publicações): {snapshot_time.summary()}")
+        print(f"Escalonador ({scheduler.period_s * 1000:g} ms): {scheduler.report()}")
+        print(f"Cache de tags ({first_line.name}): {first_line.cache.report()}")
+        print(f"BoxCompetitor.run_competition: {metrics.histogram('competicao').summary()}")
+        print(f"Flush do cache de tags: {flush_time.summary()}")
         print("Servidor OPC UA desligado com sucesso.")
 
+
+def shard_endpoints(workers: int, host: str = OPCUA_HOST, base_port: int = OPCUA_PORT) -> List[str]:
+    """ Endpoint de cada processo no modo particionado (uma porta por processo). """
+    return [f"opc.tcp://{host}:{base_port + w}" for w in range(workers)]
+
+
+def run_sharded(n_lines: int, workers: int, host: str = OPCUA_HOST, base_port: int = OPCUA_PORT, seed: Optional[int] = None,
+                period_s: float = TICK_PERIOD_S, emitter_period_s: float = EMITTER_PERIOD_S, plc: bool = False,
+                simulate: bool = False, metrics_port: int = METRICS_PORT, snapshot: bool = SHARED_SNAPSHOT):
+    """
+    Distribui n_lines linhas entre 'workers' processos, cada um com seu próprio
+    servidor OPC UA em uma porta (base_port, base_port + 1, ...) e suas métricas
+    em metrics_port + w (só os METRICS_PORT_RANGE primeiros processos; o snapshot de cada processo leva a porta no nome).
+    """
+    workers = max(1, min(workers, n_lines))
+    per_worker, extra = divmod(n_lines, workers)
+
+    processes = []
+    first = 0
+    for w, endpoint in enumerate(shard_endpoints(workers, host, base_port)):
+        count = per_worker + (1 if w < extra else 0)
+        names = line_names(count, first, total=n_lines)
+        kwargs = {"names": names, "endpoint": endpoint, "seed": None if seed is None else seed + first,
+                  "period_s": period_s, "emitter_period_s": emitter_period_s, "plc": plc,
+                  "simulate": simulate, "metrics_port": metrics_port + w if metrics_port and w < METRICS_PORT_RANGE else 0,
+                  "snapshot": snapshot}
+        process = multiprocessing.Process(target=run_opcua_server, kwargs=kwargs, name=f"opcua-shard-{w}")
+        process.start()
+        processes.append(process)
+        first += count
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("\nEncerrando processos do servidor...")
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor OPC UA da Linha de Triagem IIoT.")
+    parser.add_argument("--lines", type=int, default=1, help="Número de linhas de triagem.")
+    parser.add_argument("--workers", type=int, default=1, help="Processos servidores (cada um em uma porta).")
+    parser.add_argument("--host", default=OPCUA_HOST)
+    parser.add_argument("--port", type=int, default=OPCUA_PORT, help="Porta (base, no modo com vários processos).")
+    parser.add_argument("--seed", type=int, default=None, help="Semente base dos emissores.")
+    parser.add_argument("--period", type=float, default=TICK_PERIOD_S, help="Período do ciclo do servidor em segundos (0.001 a 1).")
+    parser.add_argument("--emitter-period", type=float, default=EMITTER_PERIOD_S, help="Intervalo entre sorteios do emissor (s).")
+    parser.add_argument("--plc", action="store_true", help="Executa o PLC_PRG emulado (sem CODESYS) a cada ciclo do servidor.")
+    parser.add_argument("--simulate", action="store_true", help="Simula a planta (sem Factory I/O) a cada ciclo do servidor.")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Porta HTTP local das métricas (0 desativa; processo w usa porta + w, até porta + 99).")
+    parser.add_argument("--snapshot", action="store_true", default=SHARED_SNAPSHOT,
+                        help="Publica o snapshot das tags em memória compartilhada (consumidores locais).")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_sharded(args.lines, args.workers, args.host, args.port, args.seed, args.period, args.emitter_period,
+                    args.plc, args.simulate, args.metrics_port, args.snapshot)
+    else:
+        run_opcua_server(line_names(args.lines), f"opc.tcp://{args.host}:{args.port}", args.seed, args.period,
+                         args.emitter_period, args.plc, args.simulate, args.metrics_port, args.snapshot)
+
+
 if __name__ == "__main__":
-   run_opcua_server()
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from asyncua import Node, Server, ua
+
+from controller.EmitterController import BoxCompetitor
+from controller.TagTable import build_address_space_async
+from controller.TickScheduler import TickScheduler
+from opcuaServer import (
+    EMITTER_PERIOD_S, MONITOR_PERIOD_S, NAMESPACE_URI, OPCUA_ENDPOINT, OPCUA_HOST, OPCUA_PORT,
+    SERVER_NAME, TAG_TABLE, TICK_PERIOD_S, line_names,
+)
+
+# Variante asyncio (asyncua) do opcuaServer.py: mesmo Address Space, mesmas
+# linhas e mesmo ciclo de manutenção, mas todas as sessões e assinaturas são
+# atendidas por um único event loop, sem uma thread por cliente.
+
+
+class AsyncSortingLine:
+    """ Equivalente asyncio de opcuaServer.SortingLine. """
+    def __init__(self, name: str, nodes: Dict[str, Node], seed: Optional[int] = None):
+        self.name = name
+        self.nodes = nodes
+        self.competitor = BoxCompetitor(seed)
+
+    async def tick(self):
+        """ Sorteia a próxima peça do emissor e a escreve em Emitter_0_Part. """
+        vencedor, _, _, _ = self.competitor.run_competition()
+        part = ua.Variant(self.competitor.PART_TYPES[vencedor], ua.VariantType.Int32)
+        await self.nodes["Emitter_0_Part"].write_value(part)
+
+
+async def create_server(endpoint: str, names: List[str], seed: Optional[int] = None) -> Tuple[Server, List[AsyncSortingLine]]:
+    """ Cria o servidor e o Address Space de cada linha (ainda sem iniciá-lo). """
+    # Inicializa o servidor
+    server = Server()
+    await server.init()
+    server.set_endpoint(endpoint)
+    server.set_server_name(SERVER_NAME)
+
+    # --- 2. REGISTRO DO NAMESPACE E ESTRUTURA ---
+    idx = await server.register_namespace(NAMESPACE_URI)
+    objects = server.nodes.objects
+
+    # --- 3. CRIAÇÃO E EXPOSIÇÃO DAS VARIÁVEIS ---
+    print(f"Criando {len(names)} linha(s) com {len(TAG_TABLE.tags)} variáveis em {len(TAG_TABLE.folders)} pastas...")
+    lines = []
+    for i, name in enumerate(names):
+        nodes = await build_address_space_async(objects, idx, TAG_TABLE, root=name)
+        lines.append(AsyncSortingLine(name, nodes, None if seed is None else seed + i))
+    return server, lines
+
+
+async def run_opcua_server(names: Optional[List[str]] = None, endpoint: str = OPCUA_ENDPOINT, seed: Optional[int] = None,
+                           period_s: float = TICK_PERIOD_S, emitter_period_s: float = EMITTER_PERIOD_S):
+    """ Executa o servidor asyncio com uma ou mais linhas de triagem (ver opcuaServer.run_opcua_server). """
+    names = names or line_names(1)
+    server, lines = await create_server(endpoint, names, seed)
+    first_line = lines[0]
+
+    # --- 4. INICIALIZAÇÃO DO SERVIDOR ---
+    print("\n" + "="*50)
+    print(f"Servidor OPC UA (asyncio) iniciado em: {endpoint}")
+    print("Namespace Registrado:", NAMESPACE_URI)
+    print(f"Linhas: {len(lines)} ({names[0]} ... {names[-1]})" if len(lines) > 1 else f"Linha: {names[0]}")
+    print("="*50 + "\n")
+
+    # --- 5. LOOP DE MANUTENÇÃO ---
+    scheduler = TickScheduler(period_s)
+
+    async def tick_emitters(tick):
+        await asyncio.gather(*(line.tick() for line in lines))
+
+    async def monitor(tick):
+        total = await first_line.nodes["C_TOTAL"].read_value()
+        sensor = await first_line.nodes["Diffuse_Sensor_0"].read_value()
+        print(f"Server ativo. C_TOTAL: {total} | Sensor Difuso: {sensor} | overruns: {scheduler.overruns}")
+
+    scheduler.add_task(tick_emitters, every=scheduler.every_seconds(emitter_period_s), name="emitters")
+    scheduler.add_task(monitor, every=scheduler.every_seconds(MONITOR_PERIOD_S), name="monitor")
+
+    try:
+        async with server:
+            await scheduler.run_async()
+    finally:
+        print(f"Escalonador ({scheduler.period_s * 1000:g} ms): {scheduler.report()}")
+        print("Servidor OPC UA desligado com sucesso.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor OPC UA (asyncio) da Linha de Triagem IIoT.")
+    parser.add_argument("--lines", type=int, default=1, help="Número de linhas de triagem.")
+    parser.add_argument("--host", default=OPCUA_HOST)
+    parser.add_argument("--port", type=int, default=OPCUA_PORT)
+    parser.add_argument("--seed", type=int, default=None, help="Semente base dos emissores.")
+    parser.add_argument("--period", type=float, default=TICK_PERIOD_S, help="Período do ciclo do servidor em segundos (0.001 a 1).")
+    parser.add_argument("--emitter-period", type=float, default=EMITTER_PERIOD_S, help="Intervalo entre sorteios do emissor (s).")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_opcua_server(line_names(args.lines), f"opc.tcp://{args.host}:{args.port}",
+                                     args.seed, args.period, args.emitter_period))
+    except KeyboardInterrupt:
+        print("\nServidor sendo desligado.")
+
+
+if __name__ == "__main__":
+    main()
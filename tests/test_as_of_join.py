@@ -0,0 +1,73 @@
+import pytest
+
+from controller.ColumnarLog import LogSample
+from controller.LogPivot import AsOfJoin
+
+S = 1_000_000
+
+
+def _sample(name, t_s, value):
+    return LogSample(f"ns=2;s=L.P.{name}", name, "Int32", int(t_s * S), value)
+
+
+def test_snapshots_carry_last_value_forward():
+    samples = [_sample("A", 0.2, 1), _sample("B", 0.7, 10), _sample("A", 2.5, 2)]
+    rows = list(AsOfJoin(1.0).run(samples))
+    assert rows == [
+        (1 * S, {"A": 1, "B": 10}),
+        (2 * S, {"A": 1, "B": 10}),
+    ]
+
+
+def test_sample_on_grid_point_belongs_to_that_snapshot():
+    samples = [_sample("A", 1.0, 1), _sample("A", 2.0, 2)]
+    join = AsOfJoin(1.0, t0=1.0, t1=2.0)
+    assert list(join.run(samples)) == [(1 * S, {"A": 1}), (2 * S, {"A": 2})]
+
+
+def test_fixed_columns_and_max_age():
+    samples = [_sample("A", 0.5, 1), _sample("C", 0.5, 99), _sample("B", 2.6, 3)]
+    join = AsOfJoin(1.0, columns=["A", "B"], max_age_s=1.0, t1=3.0)
+    rows = list(join.run(samples))
+    assert rows[0] == (1 * S, {"A": 1, "B": None})
+    assert rows[1] == (2 * S, {"A": None, "B": None})
+    assert rows[2] == (3 * S, {"A": None, "B": 3})
+    assert join.samples == 2  # "C" não está nas colunas
+
+
+def test_t1_stops_the_grid_and_node_id_key():
+    samples = [_sample("A", 0.5, 1), _sample("A", 5.5, 2)]
+    join = AsOfJoin(1.0, key="node_id", t1=2.0)
+    rows = list(join.run(samples))
+    assert [t for t, _ in rows] == [1 * S, 2 * S]
+    assert rows[-1][1] == {"ns=2;s=L.P.A": 1}
+
+
+def test_late_samples_are_counted():
+    samples = [_sample("A", 0.5, 1), _sample("A", 1.5, 2), _sample("A", 0.9, 3)]
+    join = AsOfJoin(1.0)
+    list(join.run(samples))
+    assert join.late == 1
+    # A amostra atrasada não sobrescreve um valor mais novo
+    assert join.state["A"][0] == 2
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        AsOfJoin(0)
+    with pytest.raises(ValueError):
+        AsOfJoin(1.0, key="display_name")
+
+
+def test_naive_t0_t1_are_utc(monkeypatch):
+    import time
+    monkeypatch.setenv("TZ", "America/Sao_Paulo")
+    time.tzset()
+    try:
+        samples = [_sample("A", 1.0, 1), _sample("A", 2.0, 2)]
+        join = AsOfJoin(1.0, t0="1970-01-01T00:00:01", t1="1970-01-01T00:00:02")
+        assert list(join.run(samples)) == [(1 * S, {"A": 1}), (2 * S, {"A": 2})]
+        assert AsOfJoin(1.0, t0="1969-12-31T21:00:01-03:00").t0_us == 1 * S
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+import pytest
+
+from controller.ColumnarLog import ColumnarLogReader, ColumnarLogWriter, convert_ndjson
+
+T0 = 1_700_000_000.0
+
+
+def _row(t_s, name, value, data_type="Int32"):
+    return {"timestamp_utc": T0 + t_s, "node_id": f"ns=2;s=L.P.{name}", "value": value,
+            "display_name": name, "data_type": data_type}
+
+
+def _write(path, rows, **kwargs):
+    writer = ColumnarLogWriter(path, block=True, **kwargs)
+    for row in rows:
+        writer.write(row)
+    writer.close(timeout=None)
+    return writer
+
+
+def _read(path, *args, **kwargs):
+    """ read_range com cópias (os arrays do leitor são views sobre o arquivo mapeado). """
+    with ColumnarLogReader(path) as reader:
+        data = reader.read_range(*args, **kwargs)
+        copies = {node_id: (ts.copy(), values.copy()) for node_id, (ts, values) in data.items()}
+        del data
+        return copies
+
+
+def test_round_trip_keeps_types_and_order(tmp_path):
+    path = str(tmp_path / "log.ocol")
+    rows = [_row(i * 0.5, "C_TOTAL", i) for i in range(10)]
+    rows += [_row(i * 0.5, "Velocidade", i / 4, "Double") for i in range(10)]
+    rows += [_row(i * 0.5, "Sensor", bool(i % 2), "Boolean") for i in range(10)]
+    rows += [_row(1.0, "Peca", "SMALL_BOX", "String")]
+    _write(path, rows, batch_size=7)
+
+    data = _read(path)
+    ts, values = data["ns=2;s=L.P.C_TOTAL"]
+    assert ts.dtype == np.int64 and values.dtype == np.int32
+    assert list(values) == list(range(10))
+    assert list(np.diff(ts)) == [500_000] * 9
+    assert list(data["ns=2;s=L.P.Velocidade"][1]) == [i / 4 for i in range(10)]
+    assert data["ns=2;s=L.P.Sensor"][1].dtype == np.bool_
+    assert list(data["ns=2;s=L.P.Peca"][1]) == ["SMALL_BOX"]
+
+
+def test_read_range_filters_time_and_tags(tmp_path):
+    path = str(tmp_path / "log.ocol")
+    _write(path, [_row(i, "A", i) for i in range(10)] + [_row(i, "B", -i) for i in range(10)], batch_size=4)
+    data = _read(path, T0 + 2, T0 + 4, tags=["A"])
+    assert list(data) == ["ns=2;s=L.P.A"]
+    assert list(data["ns=2;s=L.P.A"][1]) == [2, 3, 4]
+    # ISO sem fuso = UTC, como os timestamps do log (T0 = 2023-11-14T22:13:20Z)
+    assert list(_read(path, "2023-11-14T22:13:27", None, ["B"])["ns=2;s=L.P.B"][1]) == [-7, -8, -9]
+
+
+def test_append_continues_the_tag_table(tmp_path):
+    path = str(tmp_path / "log.ocol")
+    _write(path, [_row(0, "A", 1), _row(1, "B", 2)])
+    _write(path, [_row(2, "B", 3), _row(3, "C", 4)])
+    with ColumnarLogReader(path) as reader:
+        assert [(tag.tag_id, tag.name) for tag in reader.tags] == [(0, "A"), (1, "B"), (2, "C")]
+    data = _read(path)
+    assert list(data["ns=2;s=L.P.B"][1]) == [2, 3]
+    assert list(data["ns=2;s=L.P.C"][1]) == [4]
+
+
+def test_values_outside_the_declared_type_fall_back_to_json(tmp_path):
+    path = str(tmp_path / "log.ocol")
+    writer = _write(path, [_row(0, "Novo", 1), _row(1, "C_TOTAL", 2 ** 40), _row(2, "C_TOTAL", None),
+                           _row(3, "Inteiro", 1.5), _row(4, "Depois", 7)], batch_size=2)
+    assert writer.errors == 0
+    data = _read(path)
+    assert list(data["ns=2;s=L.P.C_TOTAL"][1]) == [2 ** 40, None]
+    assert list(data["ns=2;s=L.P.Inteiro"][1]) == [1.5]
+    assert list(data["ns=2;s=L.P.Depois"][1]) == [7]
+    assert len(data) == 4
+
+
+def test_convert_ndjson_keeps_every_sample(tmp_path):
+    source = str(tmp_path / "log.ndjson")
+    rows = [_row(i * 0.1, name, i) for i in range(50) for name in ("A", "B")]
+    with open(source, "w", encoding="utf-8") as f:
+        f.write("\n".join(json.dumps(row) for row in rows) + "\n")
+    target = str(tmp_path / "log.ocol")
+    assert convert_ndjson(source, target, chunk_rows=16) == 100
+    data = _read(target)
+    assert {node_id: len(ts) for node_id, (ts, _) in data.items()} == {"ns=2;s=L.P.A": 50, "ns=2;s=L.P.B": 50}
+
+
+def test_not_a_columnar_file(tmp_path):
+    path = tmp_path / "log.ndjson"
+    path.write_text("{}\n")
+    with pytest.raises(ValueError):
+        ColumnarLogReader(str(path))
@@ -0,0 +1,113 @@
+import pytest
+
+from controller import ConveyorSimulator as conveyor
+from controller.ConveyorSimulator import (BELT_SPEED_M_S, PART_GEOMETRY, PUSHER_TRAVEL_MS, SENSOR_POS_M,
+                                          ConveyorSimulator, run_headless)
+
+
+def _running(encoder_pulses_per_m=0, **kwargs):
+    """ Simulador com a esteira ligada e uma única peça emitida em t = 0. """
+    changes = []
+    sim = ConveyorSimulator(seed=1, emit_interval_ms=10 ** 9, encoder_pulses_per_m=encoder_pulses_per_m,
+                            on_change=lambda name, value, t_ms: changes.append((t_ms, name, value)), **kwargs)
+    sim.io["Belt_Conveyor_6m_0"] = True
+    sim.io["Emitter_0_Emit"] = True
+    sim.apply_outputs()
+    sim.advance_to(0)
+    return sim, changes
+
+
+def _sensor(changes, value):
+    return [t_ms for t_ms, name, v in changes if name == "Diffuse_Sensor_0" and v == value]
+
+
+def test_part_crosses_the_presence_sensor_at_belt_speed():
+    sim, changes = _running()
+    length = PART_GEOMETRY[next(iter(sim.part_counts))][0]
+    sim.advance_to(60_000)
+    on_ms = SENSOR_POS_M / BELT_SPEED_M_S * 1000
+    assert _sensor(changes, True) == pytest.approx([on_ms])
+    assert _sensor(changes, False) == pytest.approx([on_ms + length / BELT_SPEED_M_S * 1000])
+    assert sim.stats().delivered == 1 and sim.stats().ejected == 0
+
+
+def test_stopped_belt_holds_the_part():
+    sim, changes = _running()
+    sim.advance_to(1000)
+    sim.io["Belt_Conveyor_6m_0"] = False
+    sim.apply_outputs()
+    sim.advance_to(11_000)
+    assert not _sensor(changes, True)
+    sim.io["Belt_Conveyor_6m_0"] = True
+    sim.apply_outputs()
+    sim.advance_to(60_000)
+    # 10 s parada atrasam a chegada no sensor em 10 s
+    assert _sensor(changes, True) == pytest.approx([SENSOR_POS_M / BELT_SPEED_M_S * 1000 + 10_000])
+
+
+def test_pusher_limits_follow_the_travel_time():
+    sim, changes = _running()
+    sim.io["Pusher_0"] = True
+    sim.apply_outputs()
+    assert not sim.io["Pusher_0_Back_Limit"] and not sim.io["Pusher_0_Front_Limit"]
+    sim.advance_to(PUSHER_TRAVEL_MS - 1)
+    assert not sim.io["Pusher_0_Front_Limit"]
+    sim.advance_to(PUSHER_TRAVEL_MS)
+    assert sim.io["Pusher_0_Front_Limit"]
+    sim.io["Pusher_0"] = False
+    sim.apply_outputs()
+    sim.advance_to(2 * PUSHER_TRAVEL_MS)
+    assert sim.io["Pusher_0_Back_Limit"] and not sim.io["Pusher_0_Front_Limit"]
+
+
+def _push_at(sim, t_ms):
+    sim.advance_to(t_ms)
+    sim.io["Pusher_0"] = True
+    sim.apply_outputs()
+    sim.advance_to(t_ms + PUSHER_TRAVEL_MS)
+    sim.io["Pusher_0"] = False
+    sim.apply_outputs()
+
+
+def test_pusher_ejects_the_part_in_front_of_it():
+    sim, changes = _running()
+    _push_at(sim, SENSOR_POS_M / BELT_SPEED_M_S * 1000 + 10)
+    sim.advance_to(60_000)
+    assert sim.stats().ejected == 1 and sim.stats().delivered == 0
+    assert not sim.io["Diffuse_Sensor_0"]
+
+
+def test_pusher_position_is_independent_of_the_sensor(monkeypatch):
+    monkeypatch.setattr(conveyor, "PUSHER_POS_M", 4.0)
+    sim, changes = _running()
+    # Com a peça no sensor o pistão ainda não a alcança
+    _push_at(sim, SENSOR_POS_M / BELT_SPEED_M_S * 1000 + 10)
+    assert sim.stats().ejected == 0
+    _push_at(sim, 4.0 / BELT_SPEED_M_S * 1000 + 10)
+    sim.advance_to(60_000)
+    assert sim.stats().ejected == 1 and sim.stats().delivered == 0
+
+
+def test_encoder_is_in_quadrature():
+    sim, changes = _running(encoder_pulses_per_m=10)
+    sim.advance_to(1000)
+    signals = {"Belt_Conveyor_0_Encoder_Signal_A": False, "Belt_Conveyor_0_Encoder_Signal_B": False}
+    states = []
+    for _, name, value in changes:
+        if name in signals:
+            signals[name] = value
+            states.append((signals["Belt_Conveyor_0_Encoder_Signal_A"], signals["Belt_Conveyor_0_Encoder_Signal_B"]))
+    assert states[:4] == [(True, False), (True, True), (False, True), (False, False)]
+    # 0,5 m/s * 1 s * 10 pulsos/m * 4 bordas por pulso
+    assert len(states) == 20
+
+
+def test_headless_run_matches_the_plc_counters():
+    sim, engine = run_headless(0.25, seed=3, encoder_pulses_per_m=0)
+    stats, io = sim.stats(), engine.io
+    assert stats.emitted == 300
+    assert io["C_REJEITADAS"] == stats.ejected
+    assert io["C_TOTAL"] == io["C_APROVADAS"] + io["C_REJEITADAS"]
+    # Peças ainda na esteira no fim do turno não foram entregues nem rejeitadas
+    assert stats.delivered + stats.ejected <= stats.emitted
+    assert io["C_APROVADAS"] - stats.delivered <= 2
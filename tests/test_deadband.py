@@ -0,0 +1,82 @@
+import pytest
+
+from controller.NdjsonWriter import BufferedNdjsonWriter
+from controller.OPCUAVariableLogger import Deadband, SubHandler
+from controller.TagRegistry import TagRegistry
+
+COUNTER = "ns=2;s=Linha_Triagem_IIoT.Contadores_PLC.C_TOTAL"
+ANALOG = "ns=2;s=Linha_Triagem_IIoT.Processo.Velocidade"
+FLAG = "ns=2;s=Linha_Triagem_IIoT.IOs.Conveyor"
+
+
+@pytest.fixture
+def handler(tmp_path):
+    registry = TagRegistry()
+    registry.intern(COUNTER, "Int32")
+    registry.intern(ANALOG, "Double")
+    registry.intern(FLAG, "Boolean")
+    handler = SubHandler(str(tmp_path / "log.ndjson"), writer=BufferedNdjsonWriter(str(tmp_path / "log.ndjson")),
+                         change_only=True, deadband=Deadband(percent=1.0), deadbands={}, registry=registry)
+    yield handler
+    handler.close()
+
+
+def test_first_value_is_always_a_change(handler):
+    assert handler.is_change(COUNTER, 150)
+
+
+def test_counter_increment_is_never_dropped(handler):
+    # A banda morta percentual padrão é só para Float/Double
+    handler.last_logged[COUNTER] = 150
+    assert handler.is_change(COUNTER, 151)
+    assert not handler.is_change(COUNTER, 150)
+
+
+def test_analog_percent_deadband(handler):
+    handler.last_logged[ANALOG] = 100.0
+    assert not handler.is_change(ANALOG, 100.9)
+    assert not handler.is_change(ANALOG, 99.0)
+    assert handler.is_change(ANALOG, 101.5)
+
+
+def test_tag_deadband_by_short_name_overrides_default(handler):
+    handler.deadbands = {"C_TOTAL": Deadband(absolute=5)}
+    handler.last_logged[COUNTER] = 150
+    assert not handler.is_change(COUNTER, 155)
+    assert handler.is_change(COUNTER, 156)
+
+
+def test_boolean_edges_and_type_changes(handler):
+    handler.last_logged[FLAG] = False
+    assert handler.is_change(FLAG, True)
+    assert not handler.is_change(FLAG, False)
+    handler.last_logged[ANALOG] = 100.0
+    assert handler.is_change(ANALOG, None)
+
+
+def test_unknown_tag_uses_default_only_for_floats(handler):
+    handler.last_logged["ns=2;s=Outra.Tag"] = 100.0
+    assert not handler.is_change("ns=2;s=Outra.Tag", 100.5)
+    handler.last_logged["ns=2;s=Outra.Contador"] = 100
+    assert handler.is_change("ns=2;s=Outra.Contador", 101)
+
+
+def test_deadband_is_resolved_once_per_index(handler, monkeypatch):
+    handler.deadbands = {"Velocidade": Deadband(absolute=5.0)}
+    handler.last_logged[ANALOG] = 100.0
+    index = handler.registry.index(ANALOG)
+    assert not handler.is_change(ANALOG, 104.0, index)
+    # Consultas seguintes usam o cache por índice, sem tocar no dicionário
+    monkeypatch.setattr(handler, "_tag_deadbands", None)
+    assert handler.is_change(ANALOG, 106.0, index)
+    assert handler._index_deadbands[index] == Deadband(absolute=5.0)
+    # Trocar as exceções refaz a resolução
+    handler.deadbands = {}
+    assert handler.is_change(ANALOG, 101.5)
+
+
+def test_default_deadband_change_applies_to_resolved_tags(handler):
+    handler.last_logged[ANALOG] = 100.0
+    assert not handler.is_change(ANALOG, 100.9)
+    handler.deadband = Deadband(percent=0.5)
+    assert handler.is_change(ANALOG, 100.9)
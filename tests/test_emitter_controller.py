@@ -0,0 +1,77 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from controller.EmitterController import BoxCompetitor
+
+ROUNDS = 20000
+
+
+def test_batch_and_single_round_agree_on_the_winner_distribution():
+    competitor = BoxCompetitor(seed=1)
+    single = Counter(competitor.run_competition()[0] for _ in range(ROUNDS))
+    codes, _, _ = BoxCompetitor(seed=1).run_competitions(ROUNDS)
+    names = {code: name for name, code in BoxCompetitor.PART_TYPES.items()}
+    batch = Counter(names[int(code)] for code in codes)
+    for part in BoxCompetitor.PART_TYPES:
+        # Frequências de vitória iguais dentro do erro amostral (~3 desvios padrão)
+        assert abs(single[part] - batch[part]) / ROUNDS < 0.02, part
+
+
+def test_batch_arrays_are_consistent():
+    competitor = BoxCompetitor(seed=2)
+    codes, values, index = competitor.run_competitions(1000)
+    order = competitor.part_order()
+    assert codes.shape == values.shape == index.shape == (1000,)
+    assert all(int(code) == BoxCompetitor.PART_TYPES[order[i]] for code, i in zip(codes, index))
+    assert np.all((values >= 0.0) & (values <= 1.0))
+
+
+def test_batch_is_reproducible():
+    first = BoxCompetitor(seed=3).run_competitions(5000)
+    second = BoxCompetitor(seed=3).run_competitions(5000)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_batch_in_several_chunks_fills_every_round():
+    competitor = BoxCompetitor(seed=3)
+    competitor.BATCH_CHUNK_SIZE = 700
+    codes, values, index = competitor.run_competitions(5000)
+    assert codes.shape == (5000,)
+    assert np.all(values > 0.0)
+    assert set(np.unique(index)) <= set(range(len(competitor.part_order())))
+
+
+def test_single_round_is_reproducible():
+    first = BoxCompetitor(seed=4).run_competition()
+    assert BoxCompetitor(seed=4).run_competition() == first
+    part, value, distribution, results = first
+    assert results[part] == value == max(results.values())
+    assert part in BoxCompetitor.DISTRIBUTION_GROUPS[distribution]
+
+
+def test_batch_edge_cases():
+    competitor = BoxCompetitor(seed=5)
+    codes, values, index = competitor.run_competitions(0)
+    assert len(codes) == len(values) == len(index) == 0
+    with pytest.raises(ValueError):
+        competitor.run_competitions(-1)
+
+
+def test_plan_is_rebuilt_when_parameters_change():
+    competitor = BoxCompetitor(seed=6)
+    plan = competitor.plan
+    assert competitor.plan is plan
+    assert plan.part_index[plan.part_names[3]] == 3
+    assert plan.part_distribution["STACKABLE_BOX"] == "NORMAL"
+
+    competitor.DISTRIBUTION_PARAMS = {**BoxCompetitor.DISTRIBUTION_PARAMS, "POISSON": {"lambda": 4.0}}
+    rebuilt = competitor.plan
+    assert rebuilt is not plan
+    assert rebuilt.pmf_table[4] == pytest.approx(4.0 ** 4 * np.exp(-4.0) / 24)
+    # O plano não é afetado por mudanças posteriores no dict original
+    competitor.DISTRIBUTION_PARAMS["NORMAL"] = {"mu": 0.9, "sigma": 0.1}
+    assert competitor.plan.params["NORMAL"] == {"mu": 0.9, "sigma": 0.1}
+    assert rebuilt.params["NORMAL"] == BoxCompetitor.DISTRIBUTION_PARAMS["NORMAL"]
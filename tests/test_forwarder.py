@@ -0,0 +1,164 @@
+import os
+import time
+
+from controller.Forwarder import Forwarder, RetryQueue, SpoolTransport, decode_records
+
+
+class FlakyTransport(object):
+    """ Guarda os frames entregues; com 'down' cada envio falha. """
+    def __init__(self, down=False):
+        self.down = down
+        self.frames = []
+        self.closed = False
+
+    def send(self, batch_id, frame):
+        if self.down:
+            raise ConnectionError("link fora")
+        self.frames.append(frame)
+
+    def close(self):
+        self.closed = True
+
+
+def _delivered(transport):
+    return [record["i"] for frame in transport.frames for record in decode_records(frame)]
+
+
+def _wait(condition, timeout_s=5.0):
+    deadline = time.monotonic() + timeout_s
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert condition()
+
+
+def _forwarder(transport, tmp_path, **kwargs):
+    kwargs = {"batch_size": 2, "linger_s": 0.01, "backoff_s": 0.01, "max_backoff_s": 0.05, **kwargs}
+    return Forwarder(transport, str(tmp_path / "retry"), **kwargs)
+
+
+def test_batches_are_delivered_in_order(tmp_path):
+    transport = SpoolTransport(str(tmp_path / "spool"))
+    forwarder = _forwarder(transport, tmp_path, batch_size=3)
+    for i in range(10):
+        assert forwarder.write({"i": i})
+    forwarder.close()
+    frames = []
+    for name in sorted(os.listdir(transport.directory)):
+        with open(os.path.join(transport.directory, name), "rb") as f:
+            frames.append(f.read())
+    assert [record["i"] for frame in frames for record in decode_records(frame)] == list(range(10))
+    assert (forwarder.written, forwarder.batches, forwarder.errors, forwarder.pending) == (10, 4, 0, 0)
+
+
+def test_link_down_spools_and_resends_in_order(tmp_path):
+    transport = FlakyTransport(down=True)
+    forwarder = _forwarder(transport, tmp_path)
+    for i in range(6):
+        forwarder.write({"i": i})
+    _wait(lambda: forwarder.pending == 6)
+    assert forwarder.spooled == 3 and forwarder.errors >= 1
+
+    transport.down = False
+    # Lotes novos entram depois dos pendentes
+    for i in range(6, 8):
+        forwarder.write({"i": i})
+    _wait(lambda: forwarder.written == 8)
+    forwarder.close()
+    assert _delivered(transport) == list(range(8))
+    assert forwarder.pending == 0 and not os.listdir(tmp_path / "retry")
+
+
+def test_pending_batches_survive_a_restart(tmp_path):
+    transport = FlakyTransport(down=True)
+    forwarder = _forwarder(transport, tmp_path)
+    for i in range(5):
+        forwarder.write({"i": i})
+    forwarder.close()
+    assert forwarder.written == 0 and forwarder.pending == 5 and transport.closed
+
+    # A nova thread já começa a reenviar; a fila é conferida direto no disco
+    assert RetryQueue(str(tmp_path / "retry")).records == 5
+    transport = FlakyTransport()
+    forwarder = _forwarder(transport, tmp_path)
+    forwarder.write({"i": 5})
+    forwarder.close()
+    assert _delivered(transport) == list(range(6))
+
+
+def test_failing_record_does_not_kill_the_forwarder(tmp_path):
+    def formatter(record):
+        if record == "ruim":
+            raise ValueError("registro inválido")
+        return record
+
+    transport = FlakyTransport()
+    forwarder = _forwarder(transport, tmp_path, formatter=formatter)
+    for record in ({"i": 0}, "ruim", {"i": 1}, {"i": 2}):
+        forwarder.write(record)
+    _wait(lambda: forwarder.written == 3)
+    assert forwarder._thread.is_alive()
+    forwarder.close()
+    assert _delivered(transport) == [0, 1, 2]
+    assert forwarder.errors == 1
+
+
+def test_disk_failure_keeps_batches_in_memory(tmp_path):
+    transport = FlakyTransport(down=True)
+    forwarder = _forwarder(transport, tmp_path, max_queue=4)
+    push = forwarder.retry.push
+
+    def broken_push(frame, count):
+        raise OSError("disco cheio")
+
+    forwarder.retry.push = broken_push
+    for i in range(8):
+        forwarder.write({"i": i})
+        _wait(lambda: forwarder.pending + forwarder.dropped >= i + 1)
+    assert forwarder._thread.is_alive()
+    # Só os max_queue registros mais recentes ficam em memória
+    assert forwarder.pending == 4 and forwarder.dropped == 4 and len(forwarder.retry) == 0
+
+    forwarder.retry.push = push
+    transport.down = False
+    _wait(lambda: forwarder.written == 4)
+    forwarder.close()
+    assert _delivered(transport) == [4, 5, 6, 7]
+    assert forwarder.pending == 0
+
+
+def test_link_up_sends_held_batches_when_the_disk_is_broken(tmp_path):
+    transport = FlakyTransport(down=True)
+    forwarder = _forwarder(transport, tmp_path)
+
+    def broken_push(frame, count):
+        raise OSError("disco somente leitura")
+
+    forwarder.retry.push = broken_push
+    for i in range(4):
+        forwarder.write({"i": i})
+    _wait(lambda: forwarder.pending == 4)
+    transport.down = False
+    _wait(lambda: forwarder.written == 4)
+    forwarder.close()
+    assert _delivered(transport) == [0, 1, 2, 3]
+
+
+def test_write_drops_once_the_thread_is_gone(tmp_path):
+    class Stopped(Forwarder):
+        def _run(self):
+            return
+
+    forwarder = Stopped(FlakyTransport(), str(tmp_path / "retry"))
+    forwarder._thread.join()
+    assert not forwarder.write({"i": 0})
+    assert forwarder.dropped == 1
+
+
+def test_retry_queue_drops_the_oldest_above_max_bytes(tmp_path):
+    retry = RetryQueue(str(tmp_path / "retry"), max_bytes=25)
+    for i in range(3):
+        retry.push(b"x" * 10 + bytes([i]), i + 1)
+    assert len(retry) == 2 and retry.dropped_records == 1
+    assert retry.peek() == (b"x" * 10 + bytes([1]), 2)
+    reopened = RetryQueue(str(tmp_path / "retry"), max_bytes=25)
+    assert reopened.records == 5
@@ -0,0 +1,145 @@
+import datetime
+
+import pytest
+
+from controller.KpiEngine import (APPROVED, REJECTED, RUN_S, TIMEOUTS, TOTAL, KpiEngine, SlidingWindow,
+                                  TumblingWindow, compute_kpis)
+
+
+def _sums(total=0, approved=0, rejected=0, run_s=0.0, timeouts=0):
+    return [total, approved, rejected, run_s, timeouts]
+
+
+def test_compute_kpis_oee_product():
+    kpis = compute_kpis(_sums(total=10, approved=8, rejected=2, run_s=30.0), 60.0, ideal_rate_per_h=1200.0)
+    # 30 s de esteira ligada a 1200 peças/h = 10 peças ideais
+    assert kpis["availability"] == pytest.approx(0.5)
+    assert kpis["performance"] == pytest.approx(1.0)
+    assert kpis["quality"] == pytest.approx(0.8)
+    assert kpis["oee"] == pytest.approx(0.4)
+    assert kpis["rejection_rate"] == pytest.approx(0.2)
+    assert kpis["parts_per_h"] == pytest.approx(600.0)
+
+
+def test_compute_kpis_empty_window():
+    kpis = compute_kpis(_sums(), 0.0)
+    assert kpis["oee"] == kpis["availability"] == kpis["parts_per_h"] == 0.0
+
+
+def test_sliding_window_expires_old_buckets():
+    window = SlidingWindow(10.0, 1.0)
+    window.add(0.0, TOTAL, 5)
+    window.add(5.5, TOTAL, 3)
+    window.advance(9.9)
+    assert window.sums[TOTAL] == 5 + 3
+    window.advance(10.0)
+    assert window.sums[TOTAL] == 3
+    window.advance(1000.0)
+    assert window.sums[TOTAL] == 0 and window.buckets[5][TOTAL] == 0.0
+    # Tempo que volta não move o balde atual
+    window.add(999.0, TOTAL, 1)
+    assert window.head == 1000 and window.sums[TOTAL] == 1
+
+
+def test_sliding_window_splits_intervals_by_bucket():
+    window = SlidingWindow(10.0, 1.0)
+    window.add_interval(0.5, 3.25, RUN_S)
+    assert window.sums[RUN_S] == pytest.approx(2.75)
+    assert [bucket[RUN_S] for bucket in window.buckets[:4]] == pytest.approx([0.5, 1.0, 1.0, 0.25])
+
+    # Um intervalo mais longo que a janela só conta a parte que cabe nela
+    longer = SlidingWindow(10.0, 1.0)
+    longer.add_interval(0.0, 25.0, RUN_S)
+    assert longer.sums[RUN_S] == pytest.approx(10.0)
+
+
+def test_tumbling_window_closes_on_boundaries():
+    closed = []
+    window = TumblingWindow(60.0, lambda start, end, sums: closed.append((start, end, list(sums))))
+    window.add(10.0, TOTAL, 1)
+    window.add(59.0, TOTAL, 2)
+    window.add(70.0, TOTAL, 4)
+    assert closed == [(0.0, 60.0, _sums(total=3))]
+    # Janelas vazias intermediárias não são reportadas
+    window.add(500.0, TOTAL, 1)
+    assert closed[1:] == [(60.0, 120.0, _sums(total=4))]
+    assert window.start == 480.0 and window.sums[TOTAL] == 1
+
+
+def test_tumbling_window_splits_intervals():
+    closed = []
+    window = TumblingWindow(60.0, lambda start, end, sums: closed.append((start, sums[RUN_S])))
+    window.add_interval(50.0, 130.0, RUN_S)
+    assert closed == [(0.0, 10.0), (60.0, 60.0)]
+    assert window.sums[RUN_S] == pytest.approx(10.0)
+
+
+@pytest.fixture
+def engine():
+    engine = KpiEngine(sliding_s=60.0, tumbling_s=120.0, resolution_s=1.0, ideal_rate_per_h=1200.0)
+    for name in ("C_TOTAL", "C_APROVADAS", "C_REJEITADAS"):
+        engine.update(name, 100, 1000.0)   # Primeira leitura: só a referência
+    engine.update("Belt_Conveyor_6m_0", True, 1000.0)
+    return engine
+
+
+def test_engine_counts_deltas_and_run_time(engine):
+    engine.update("C_TOTAL", 103, 1010.0)
+    engine.update("C_APROVADAS", 102, 1010.0)
+    engine.update("C_REJEITADAS", 101, 1010.0)
+    kpis = engine.kpis(1030.0)
+    assert (kpis["total"], kpis["approved"], kpis["rejected"]) == (3, 2, 1)
+    assert kpis["elapsed_s"] == pytest.approx(30.0)
+    assert kpis["run_s"] == pytest.approx(30.0)
+    assert kpis["availability"] == pytest.approx(1.0)
+    assert kpis["performance"] == pytest.approx(3 / 10)
+    assert kpis["parts_per_h"] == pytest.approx(360.0)
+
+    engine.update("Belt_Conveyor_6m_0", False, 1030.0)
+    kpis = engine.kpis(1060.0)
+    assert kpis["elapsed_s"] == pytest.approx(59.0)
+    assert kpis["run_s"] == pytest.approx(29.0)      # Só [1001, 1030) ainda está na janela
+    assert kpis["total"] == 3
+    assert engine.kpis(1090.0)["total"] == 0
+
+
+def test_engine_counter_reset_and_timeouts(engine):
+    engine.update("C_TOTAL", 108, 1001.0)
+    engine.update("C_TOTAL", 0, 1002.0)       # Reset_Button_0
+    engine.update("C_TOTAL", 2, 1003.0)
+    for t, yellow in ((1004.0, True), (1005.0, True), (1006.0, False), (1007.0, True)):
+        engine.update("Stack_Light_0_Yellow", yellow, t)
+    kpis = engine.kpis(1010.0)
+    assert kpis["total"] == 10 and kpis["timeouts"] == 2
+
+
+def test_engine_out_of_order_sample_goes_to_the_current_bucket(engine):
+    engine.update("C_TOTAL", 101, 1020.0)
+    engine.update("C_TOTAL", 102, 1005.0)
+    assert engine.sliding.buckets[1020 % 60][TOTAL] == 2
+    assert engine.kpis(1020.0)["total"] == 2
+
+
+def test_engine_reports_closed_tumbling_windows():
+    closed = []
+    engine = KpiEngine(sliding_s=60.0, tumbling_s=120.0, ideal_rate_per_h=1200.0,
+                       on_window_closed=lambda start, end, kpis: closed.append((start, end, kpis)))
+    engine.update("C_TOTAL", 0, 960.0)
+    engine.update("Belt_Conveyor_6m_0", True, 960.0)
+    engine.update("C_TOTAL", 20, 1000.0)
+    assert engine.current_window()["total"] == 20
+    engine.advance(1140.0)
+    (start, end, kpis), = closed
+    assert (start, end) == (960.0, 1080.0)
+    assert kpis["total"] == 20
+    assert kpis["availability"] == pytest.approx(1.0)
+    assert kpis["performance"] == pytest.approx(20 / 40)
+    assert engine.current_window()["run_s"] == pytest.approx(60.0)
+
+
+def test_datachange_uses_the_short_name_and_source_timestamp(engine):
+    timestamp = datetime.datetime.fromtimestamp(1020.0, datetime.timezone.utc).replace(tzinfo=None)
+    engine.datachange("ns=2;s=Linha_Triagem_IIoT.Contadores_PLC.C_TOTAL", 104, timestamp)
+    assert engine.sliding.head == 1020
+    assert engine.kpis(1020.0)["total"] == 4
+    assert engine.tumbling.sums[APPROVED] == engine.tumbling.sums[REJECTED] == engine.tumbling.sums[TIMEOUTS] == 0
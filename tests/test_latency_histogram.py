@@ -0,0 +1,49 @@
+import pytest
+
+from controller.Metrics import LatencyHistogram
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    limit = 2 << LatencyHistogram.SUB_BITS
+    for value_us in range(limit):
+        histogram.record(value_us * 1000)
+    assert [(low, high) for low, high, _ in histogram.buckets()] == [(us, us + 1) for us in range(limit)]
+
+
+@pytest.mark.parametrize("value_us", [64, 65, 100, 1000, 12_345, 10 ** 6, 987_654_321])
+def test_bucket_contains_value_with_bounded_error(value_us):
+    histogram = LatencyHistogram()
+    histogram.record(value_us * 1000)
+    (low, high, count), = histogram.buckets()
+    assert count == 1
+    assert low <= value_us < high
+    assert (high - low) / low <= 1 / (1 << LatencyHistogram.SUB_BITS)
+
+
+def test_percentiles_and_mean():
+    histogram = LatencyHistogram()
+    for value_us in range(1, 101):
+        histogram.record(value_us * 1000)
+    assert histogram.total == 100
+    assert histogram.mean_us() == pytest.approx(50.5)
+    assert histogram.percentile(50) == 51.0
+    assert 99 <= histogram.percentile(99) <= 100 * (1 + 1 / 32)
+    assert histogram.max_ns == 100_000
+
+
+def test_negative_and_huge_values_are_clamped():
+    histogram = LatencyHistogram()
+    histogram.record(-5)
+    histogram.record((LatencyHistogram.MAX_US + 10) * 1000)
+    buckets = histogram.buckets()
+    assert buckets[0] == (0, 1, 1)
+    assert buckets[-1][2] == 1
+    assert histogram.percentile(100) >= LatencyHistogram.MAX_US
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(99) == 0.0
+    assert histogram.mean_us() == 0.0
+    assert histogram.buckets() == []
@@ -0,0 +1,98 @@
+import json
+import os
+import time
+
+import pytest
+
+from controller.ColumnarLog import LogSample
+from controller.LogIndex import LogIndex, ReplayTargets
+from controller.TagTable import load_tag_table
+
+TABLE = load_tag_table()
+
+
+@pytest.fixture
+def targets():
+    return ReplayTargets(TABLE, ns_index=3)
+
+
+def _sample(node_id, name, data_type="Int32"):
+    return LogSample(node_id, name, data_type, 0, 1)
+
+
+def test_string_node_id_keeps_its_line_and_gets_server_namespace(targets):
+    resolved = targets.resolve(_sample("ns=2;s=Linha_2.Contadores_PLC.C_TOTAL", "C_TOTAL"))
+    assert resolved == ("ns=3;s=Linha_2.Contadores_PLC.C_TOTAL", "Int32")
+
+
+def test_legacy_numeric_node_id_resolves_by_name_with_table_type(targets):
+    # Log de polling antigo: NodeId numérico e inteiros gravados como Int64
+    tag = next(tag for tag in TABLE.tags if tag.name == "C_TOTAL")
+    resolved = targets.resolve(_sample("ns=2;i=7", "C_TOTAL", "Int64"))
+    assert resolved == (TABLE.node_id(tag, 3), "Int32")
+
+
+def test_wide_column_resolves_by_name_on_requested_root():
+    tag = next(tag for tag in TABLE.tags if tag.name == "C_TOTAL")
+    targets = ReplayTargets(TABLE, ns_index=2, root="Linha_5")
+    assert targets.resolve(_sample("C_TOTAL", "C_TOTAL", "")) == (TABLE.node_id(tag, 2, "Linha_5"), "Int32")
+
+
+def test_string_node_id_with_wrong_folder_falls_back_to_name(targets):
+    tag = next(tag for tag in TABLE.tags if tag.name == "C_TOTAL")
+    resolved = targets.resolve(_sample("ns=2;s=Linha_2.Outra_Pasta.C_TOTAL", "C_TOTAL"))
+    assert resolved == (TABLE.node_id(tag, 3), "Int32")
+
+
+def test_unknown_tag_is_none(targets):
+    assert targets.resolve(_sample("ns=2;i=999", "Nao_Existe")) is None
+    assert targets.resolve(_sample("ns=2;s=L.P.Nao_Existe", "Nao_Existe")) is None
+
+
+def _write_log(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def _row(t_s, value, name="C_TOTAL"):
+    return {"timestamp_utc": t_s, "node_id": f"ns=2;s=L.Contadores_PLC.{name}", "value": value,
+            "display_name": name, "data_type": "Int32"}
+
+
+@pytest.fixture
+def local_utc_minus_3(monkeypatch):
+    """ Hora local diferente de UTC, para que um limite lido como hora local caia fora. """
+    monkeypatch.setenv("TZ", "America/Sao_Paulo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_query_reads_naive_iso_bounds_as_utc(tmp_path, local_utc_minus_3):
+    path = str(tmp_path / "log.ndjson")
+    _write_log(path, [_row(1_700_000_000.0, 1), _row(1_700_000_060.0, 2)])
+    index = LogIndex.open(path)
+    # 1_700_000_060 = 2023-11-14T22:14:20 UTC
+    samples = index.query(["C_TOTAL"], "2023-11-14T22:14:20", "2023-11-14T22:14:20")
+    assert [sample.value for sample in samples] == [2]
+    assert [s.value for s in index.query(["C_TOTAL"], "2023-11-14T19:14:20-03:00", None)] == [2]
+
+
+def test_sidecar_is_reused_after_append_and_rebuilt_after_rewrite(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+    _write_log(path, [_row(1_700_000_000.0 + i, i) for i in range(10)])
+    LogIndex.open(path)
+    assert os.path.exists(path + ".idx.json")
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(_row(1_700_000_010.0, 10)) + "\n")
+    index = LogIndex.open(path)
+    assert [sample.value for sample in index.query(["C_TOTAL"])] == list(range(11))
+
+    # Outro log com o mesmo nome e tamanho maior: os offsets antigos não valem mais
+    _write_log(path, [_row(1_700_000_000.0 + i, 100 + i, "C_APROVADAS") for i in range(20)])
+    index = LogIndex.open(path)
+    assert index.query(["C_TOTAL"]) == []
+    assert [sample.value for sample in index.query(["C_APROVADAS"])] == [100 + i for i in range(20)]
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+
+import pytest
+
+from controller.NdjsonWriter import BufferedNdjsonWriter
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_in_order_on_close(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+    writer = BufferedNdjsonWriter(path, batch_size=3, flush_interval_s=10.0)
+    for i in range(10):
+        assert writer.write({"i": i})
+    writer.close()
+    assert [row["i"] for row in _read(path)] == list(range(10))
+    assert writer.written == 10 and writer.batches == 4 and writer.errors == 0
+
+
+def test_flush_interval_writes_without_close(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+    with BufferedNdjsonWriter(path, flush_interval_s=0.05) as writer:
+        writer.write({"i": 1})
+        deadline = time.monotonic() + 2.0
+        while writer.written == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert _read(path) == [{"i": 1}]
+
+
+def test_failing_record_does_not_kill_the_writer(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+
+    def formatter(record):
+        if record == "ruim":
+            raise ValueError("registro inválido")
+        return record
+
+    writer = BufferedNdjsonWriter(path, batch_size=2, formatter=formatter)
+    for record in ({"i": 1}, "ruim", {"i": 2}, {"i": 3}):
+        writer.write(record)
+    writer.close()
+    assert _read(path) == [{"i": 1}, {"i": 2}, {"i": 3}]
+    assert writer.errors == 1 and writer.written == 3
+
+
+def test_preformatted_lines_pass_through(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+    writer = BufferedNdjsonWriter(path, formatter=lambda event: '{"linha": %d}' % event)
+    writer.write(7)
+    writer.close()
+    assert _read(path) == [{"linha": 7}]
+
+
+def test_full_queue_and_closed_writer_drop(tmp_path):
+    release = threading.Event()
+
+    def slow(record):
+        release.wait(5.0)
+        return record
+
+    writer = BufferedNdjsonWriter(str(tmp_path / "log.ndjson"), max_queue=2, batch_size=1, formatter=slow)
+    writer.write({"i": 0})
+    deadline = time.monotonic() + 2.0
+    while writer._queue.qsize() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.write({"i": 1}) and writer.write({"i": 2})
+    assert not writer.write({"i": 3})
+    assert writer.dropped == 1
+    release.set()
+    writer.close()
+    assert writer.written == 3
+    assert not writer.write({"i": 4})
+    assert writer.dropped == 2
+
+
+def test_rotation_keeps_backups(tmp_path):
+    path = str(tmp_path / "log.ndjson")
+    writer = BufferedNdjsonWriter(path, batch_size=1, rotate_bytes=10, backup_count=2)
+    for i in range(6):
+        writer.write({"valor": i})
+        deadline = time.monotonic() + 2.0
+        while writer.written <= i and time.monotonic() < deadline:
+            time.sleep(0.005)
+    writer.close()
+    assert writer.rotations == 6
+    assert _read(path + ".1") == [{"valor": 5}]
+    assert _read(path + ".2") == [{"valor": 4}]
+
+
+def test_invalid_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        BufferedNdjsonWriter(str(tmp_path / "log.ndjson"), fsync="sempre")
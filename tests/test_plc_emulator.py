@@ -0,0 +1,141 @@
+from controller.PLCEmulator import (CYCLE_MS, TEMPO_PULSO_PUSHER_MS, TEMPO_TIMEOUT_CICLO_MS, PartStimulus, R_TRIG,
+                                    ScanEngine, TON, VirtualClock, process_image)
+
+
+def _engine():
+    engine = ScanEngine(io=process_image())
+    engine.io["Emergency_Stop_0"] = True  # Emergência liberada (contato NF)
+    return engine
+
+
+def _press(engine, button):
+    engine.io[button] = True
+    engine.scan()
+    engine.io[button] = False
+    engine.scan()
+
+
+def _part(engine, tall):
+    engine.io["Diffuse_Sensor_1"] = tall
+    engine.io["Diffuse_Sensor_0"] = True
+    engine.scan()
+    engine.io["Diffuse_Sensor_0"] = False
+
+
+def test_r_trig_is_true_for_one_scan():
+    trig = R_TRIG()
+    outputs = []
+    for clk in (False, True, True, False, True):
+        trig(clk)
+        outputs.append(trig.Q)
+    assert outputs == [False, True, False, False, True]
+
+
+def test_ton_counts_on_the_virtual_clock():
+    clock = VirtualClock()
+    timer = TON(clock, PT=30)
+    timer(IN=True)
+    assert timer.deadline_ms() == 30
+    clock.advance(20)
+    timer(IN=True)
+    assert (timer.Q, timer.ET) == (False, 20)
+    clock.advance(10)
+    timer(IN=True)
+    assert (timer.Q, timer.ET) == (True, 30) and timer.deadline_ms() is None
+    timer(IN=False)
+    assert (timer.Q, timer.ET) == (False, 0)
+
+
+def test_start_needs_the_emergency_released():
+    engine = ScanEngine(io=process_image())
+    _press(engine, "Start_Button_0")
+    assert not engine.io["Belt_Conveyor_6m_0"] and engine.io["Stack_Light_0_Red"]
+
+    engine.io["Emergency_Stop_0"] = True
+    _press(engine, "Start_Button_0")
+    io = engine.io
+    assert io["Belt_Conveyor_6m_0"] and io["Emitter_0_Emit"] and io["Remover_0_Remove"] and io["Remover_1_Remove"]
+    assert io["Stack_Light_0_Green"] and io["Start_Button_0_Light"] and not io["Stop_Button_0_Light"]
+
+    # Emergência pressionada derruba a linha; liberar não religa sem novo Start
+    io["Emergency_Stop_0"] = False
+    engine.scan()
+    io["Emergency_Stop_0"] = True
+    engine.scan()
+    assert not io["Belt_Conveyor_6m_0"] and io["Stop_Button_0_Light"]
+
+
+def test_stop_button_turns_the_line_off():
+    engine = _engine()
+    _press(engine, "Start_Button_0")
+    _press(engine, "Stop_Button_0")
+    assert not engine.io["Belt_Conveyor_6m_0"] and not engine.io["Stack_Light_0_Green"]
+
+
+def test_parts_are_counted_only_on_the_rising_edge_while_running():
+    engine = _engine()
+    _part(engine, tall=True)  # Linha parada: não conta
+    engine.scan()
+    _press(engine, "Start_Button_0")
+    _part(engine, tall=True)
+    engine.io["Diffuse_Sensor_0"] = True  # Sensor continua ativo: mesma peça
+    engine.run_for(5 * CYCLE_MS)
+    engine.io["Diffuse_Sensor_0"] = False
+    engine.scan()
+    _part(engine, tall=False)
+    engine.run_for(TEMPO_PULSO_PUSHER_MS + 2 * CYCLE_MS)
+    io = engine.io
+    assert (io["C_TOTAL"], io["C_APROVADAS"], io["C_REJEITADAS"]) == (2, 1, 1)
+    assert (io["Digital_Display_0"], io["Digital_Display_1"]) == (2, 1)
+
+
+def test_rejected_part_fires_a_500ms_pusher_pulse():
+    engine = _engine()
+    _press(engine, "Start_Button_0")
+    pusher = []
+    engine.after_scan = lambda io, now_ms: pusher.append(io["Pusher_0"])
+    _part(engine, tall=False)
+    engine.run_for(2 * TEMPO_PULSO_PUSHER_MS)
+    # Liga na varredura da detecção e desliga na primeira varredura após o TON vencer
+    assert pusher.index(False) * CYCLE_MS == TEMPO_PULSO_PUSHER_MS + CYCLE_MS
+    assert not any(pusher[pusher.index(False):])
+    assert not engine.io["Stack_Light_0_Red"]
+
+
+def test_approved_part_does_not_fire_the_pusher():
+    engine = _engine()
+    _press(engine, "Start_Button_0")
+    _part(engine, tall=True)
+    engine.scan()
+    # Só o timeout de falta de peça está contando
+    assert not engine.io["Pusher_0"] and engine.next_deadline_ms() == engine.clock.now_ms - CYCLE_MS + TEMPO_TIMEOUT_CICLO_MS
+
+
+def test_timeout_without_parts_and_reset():
+    engine = _engine()
+    _press(engine, "Start_Button_0")
+    _part(engine, tall=False)
+    engine.run_for(TEMPO_TIMEOUT_CICLO_MS - 5 * CYCLE_MS)
+    assert not engine.io["Warning_Light_0"]
+    engine.run_for(10 * CYCLE_MS)
+    io = engine.io
+    assert io["Warning_Light_0"] and io["Stack_Light_0_Yellow"] and not io["Stack_Light_0_Green"]
+
+    # Uma peça zera o timeout
+    _part(engine, tall=True)
+    engine.scan()
+    assert not io["Warning_Light_0"] and io["Stack_Light_0_Green"]
+
+    _press(engine, "Reset_Button_0")
+    assert (io["C_TOTAL"], io["C_APROVADAS"], io["C_REJEITADAS"]) == (0, 0, 0)
+    assert not io["Belt_Conveyor_6m_0"] and not io["Warning_Light_0"]
+
+
+def test_part_stimulus_runs_the_line():
+    engine = ScanEngine(io=process_image(), before_scan=PartStimulus(part_interval_ms=1000, approval_rate=0.5, seed=1))
+    engine.run_for(60_000)
+    io = engine.io
+    assert io["C_TOTAL"] == 59
+    assert io["C_APROVADAS"] + io["C_REJEITADAS"] == io["C_TOTAL"]
+    assert 0 < io["C_REJEITADAS"] < io["C_TOTAL"]
+    assert not io["Warning_Light_0"]
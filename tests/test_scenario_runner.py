@@ -0,0 +1,106 @@
+import json
+import sys
+
+import pytest
+
+from controller import ScenarioRunner
+from controller.ScenarioRunner import (_done_ids, expand_grid, load_results, run_scenarios, stored_entropy,
+                                       sweep_fingerprint)
+
+GRID = {"POISSON.lambda": [2.0, 5.0]}
+
+
+def _write_rows(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def test_same_seed_gives_same_sweep_and_seeds():
+    first = expand_grid(GRID, replicates=2, hours=0.01, base_seed=7)
+    second = expand_grid(GRID, replicates=2, hours=0.01, base_seed=7)
+    assert [s.seed for s in first] == [s.seed for s in second]
+    assert len({s.seed for s in first}) == 4
+    assert first[0].sweep == second[0].sweep
+    assert [(s.combination, s.replicate) for s in first] == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert first[2].params["POISSON"]["lambda"] == 5.0
+
+
+def test_fingerprint_changes_with_any_sweep_parameter():
+    base = sweep_fingerprint(GRID, 2, 0.01, 7)
+    assert sweep_fingerprint({"POISSON.lambda": [2, 5]}, 2, 0.01, 7) == base
+    assert sweep_fingerprint(GRID, 3, 0.01, 7) != base
+    assert sweep_fingerprint(GRID, 2, 0.02, 7) != base
+    assert sweep_fingerprint(GRID, 2, 0.01, 8) != base
+    assert expand_grid(GRID, 1, 0.01, base_seed=None)[0].sweep != expand_grid(GRID, 1, 0.01, base_seed=None)[0].sweep
+
+
+def test_unknown_parameter_is_rejected():
+    with pytest.raises(ValueError):
+        expand_grid({"POISSON.nao_existe": [1.0]})
+
+
+def test_resume_skips_done_scenarios_of_the_same_sweep(tmp_path):
+    path = str(tmp_path / "results.ndjson")
+    scenarios = expand_grid(GRID, replicates=1, hours=0.001, base_seed=3)
+    sweep = scenarios[0].sweep
+    _write_rows(path, [{"sweep": sweep, "scenario_id": 0, "combination": 0}])
+    assert _done_ids(path, sweep) == {0}
+
+    results = list(run_scenarios(scenarios, path, workers=1))
+    assert [result["scenario_id"] for result in results] == [1]
+    assert sorted(row["scenario_id"] for row in load_results(path, sweep)) == [0, 1]
+    # Tudo feito: nada a executar
+    assert list(run_scenarios(scenarios, path, workers=1)) == []
+
+
+def test_results_of_another_sweep_are_refused(tmp_path):
+    path = str(tmp_path / "results.ndjson")
+    _write_rows(path, [{"sweep": "outra", "scenario_id": 0}])
+    scenarios = expand_grid(GRID, replicates=1, hours=0.001, base_seed=3)
+    with pytest.raises(ValueError):
+        list(run_scenarios(scenarios, path, workers=1))
+    _write_rows(path, [{"scenario_id": 0}])
+    with pytest.raises(ValueError):
+        _done_ids(path, scenarios[0].sweep)
+
+
+def test_load_results_filters_by_sweep(tmp_path):
+    path = str(tmp_path / "results.ndjson")
+    _write_rows(path, [{"sweep": "a", "scenario_id": 0}, {"sweep": "b", "scenario_id": 0}, {"sweep": "a", "scenario_id": 1}])
+    assert [row["scenario_id"] for row in load_results(path, "a")] == [0, 1]
+
+
+def test_drawn_entropy_is_stored_and_reproduces_the_sweep(tmp_path):
+    path = str(tmp_path / "results.ndjson")
+    scenarios = expand_grid(GRID, replicates=1, hours=0.001)
+    list(run_scenarios(scenarios[:1], path, workers=1))
+    entropy = stored_entropy(path)
+    assert str(entropy) == scenarios[0].entropy
+    again = expand_grid(GRID, replicates=1, hours=0.001, base_seed=entropy)
+    assert again == scenarios
+    assert stored_entropy(str(tmp_path / "nao_existe.ndjson")) is None
+
+
+def test_main_resumes_without_seed(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "results.ndjson")
+    argv = ["ScenarioRunner", "--grid", "POISSON.lambda=1,2", "--hours", "0.001", "--workers", "1", "--out", path]
+    monkeypatch.setattr(sys, "argv", argv)
+    ScenarioRunner.main()
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(first)
+
+    ScenarioRunner.main()
+    assert "Retomando" in capsys.readouterr().out
+    rows = load_results(path, json.loads(first)["sweep"])
+    assert sorted(row["scenario_id"] for row in rows) == [0, 1]
+
+
+def test_main_warns_about_inert_parameters(tmp_path, monkeypatch, capsys):
+    argv = ["ScenarioRunner", "--grid", "EXPONENTIAL.lambda=2,5", "--hours", "0.001", "--workers", "1",
+            "--seed", "1", "--out", str(tmp_path / "results.ndjson")]
+    monkeypatch.setattr(sys, "argv", argv)
+    ScenarioRunner.main()
+    assert "EXPONENTIAL.lambda não altera a simulação" in capsys.readouterr().out
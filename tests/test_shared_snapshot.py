@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+import uuid
+
+import pytest
+
+from controller.SharedSnapshot import SnapshotReader, SnapshotWriter, snapshot_name
+from controller.TagRegistry import TagRegistry
+
+
+def _registry():
+    registry = TagRegistry()
+    registry.intern("ns=2;s=L.IOs.Sensor", "Boolean")
+    registry.intern("ns=2;s=L.Contadores_PLC.C_TOTAL", "Int32")
+    registry.intern("ns=2;s=L.Contadores_PLC.Energia", "Int64")
+    registry.intern("ns=2;s=L.Processo.Velocidade", "Double")
+    registry.intern("ns=2;s=L.Emissor.Peca", "String")
+    return registry
+
+
+@pytest.fixture
+def name():
+    return snapshot_name("test", uuid.uuid4().hex[:8])
+
+
+@pytest.fixture
+def writer(name):
+    registry = _registry()
+    writer = SnapshotWriter(name, [registry])
+    yield writer
+    writer.close()
+
+
+@pytest.fixture
+def reader(writer):
+    reader = SnapshotReader(writer.name)
+    yield reader
+    reader.close()
+
+
+def test_round_trip(writer, reader):
+    registry = writer.registries[0]
+    for key, value in (("Sensor", True), ("C_TOTAL", 151), ("Energia", 2 ** 40), ("Velocidade", 0.25), ("Peca", "Caixa")):
+        registry.set(registry.index(key), value)
+    sequence = reader.sequence
+    writer.publish()
+    assert reader.wait(sequence, timeout=1.0) == sequence + 2
+    assert reader.values(["Sensor", "C_TOTAL", "Energia", "Velocidade"]) == {
+        "Sensor": True, "C_TOTAL": 151, "Energia": 2 ** 40, "Velocidade": 0.25}
+    # Strings ficam fora do snapshot
+    assert "Peca" not in reader.names
+    snapshot = reader.read()
+    assert snapshot.sequence % 2 == 0
+    assert snapshot.blocks["updated_ns"][reader.locations[reader.index("C_TOTAL")][2]] == registry.updated[1]
+
+
+def test_tag_without_value_is_not_valid(writer, reader):
+    writer.publish()
+    assert reader.get("C_TOTAL") is None
+    assert reader.values() == {}
+
+
+def test_demoted_tag_is_published_as_invalid(writer, reader):
+    registry = writer.registries[0]
+    index = registry.index("C_TOTAL")
+    registry.set(index, 5)
+    writer.publish()
+    assert reader.get("C_TOTAL") == 5
+    registry.set(index, "falha")
+    writer.publish()
+    assert reader.get("C_TOTAL") is None
+
+
+def test_reader_retries_while_writer_is_inside_the_seqlock(writer, reader):
+    writer._counters[0] += 1
+    with pytest.raises(TimeoutError):
+        reader.read(retries=3)
+    writer._counters[0] += 1
+    assert reader.read(retries=3).sequence == writer._counters[0]
+
+
+def test_closed_segment_raises_connection_error(name):
+    writer = SnapshotWriter(name, [_registry()])
+    reader = SnapshotReader(name)
+    writer.close()
+    with pytest.raises(ConnectionError):
+        reader.sequence
+    reader.close()
+
+
+def test_live_writer_segment_is_not_replaced(writer):
+    # Segmento de outro processo ainda vivo (o pai do pytest)
+    writer._counters[3] = os.getppid()
+    with pytest.raises(FileExistsError):
+        SnapshotWriter(writer.name, [_registry()])
+
+
+def test_stale_segment_is_replaced(writer):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    writer._counters[3] = dead.pid
+    replacement = SnapshotWriter(writer.name, [_registry()])
+    try:
+        assert replacement._counters[3] == os.getpid()
+    finally:
+        replacement.close()
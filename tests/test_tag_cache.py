@@ -0,0 +1,85 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from opcuaServer import create_server
+
+SENSOR = "Diffuse_Sensor_0"     # Pasta de bordas: nenhuma transição pode se perder
+COUNTER = "C_TOTAL"
+
+
+@pytest.fixture
+def line():
+    server, lines = create_server("opc.tcp://127.0.0.2:4999", ["Linha_Teste"], seed=1)
+    return lines[0]
+
+
+def _server_value(line, name):
+    return line.nodes[name].get_value()
+
+
+def _watch(line, name):
+    """ Valores que chegam ao address space (callback interno de data change). """
+    seen = []
+    node_id = line.nodes[name].nodeid
+    line.cache._aspace.add_datachange_callback(node_id, line.cache._ua.AttributeIds.Value,
+                                               lambda handle, data_value: seen.append(data_value.Value.Value))
+    return seen
+
+
+def test_redundant_writes_are_suppressed(line):
+    cache = line.cache
+    assert not cache.set(COUNTER, _server_value(line, COUNTER))
+    assert cache.suppressed == 1 and not cache.pending
+    assert cache.flush() == 0 and cache.flushes == 0
+
+
+def test_changes_are_coalesced_until_flush(line):
+    cache = line.cache
+    seen = _watch(line, COUNTER)
+    for value in (1, 2, 3):
+        assert cache.set(COUNTER, value)
+    assert cache.get(COUNTER) == 3 and _server_value(line, COUNTER) == 0
+    assert cache.flush() == 1
+    assert seen == [3] and _server_value(line, COUNTER) == 3
+    assert (cache.writes, cache.flushes, cache.external) == (1, 1, 0)
+
+
+def test_edge_tags_keep_every_transition(line):
+    cache = line.cache
+    seen = _watch(line, SENSOR)
+    cache.set(COUNTER, 5)
+    cache.set(SENSOR, True)
+    cache.set(SENSOR, False)         # Segunda mudança no mesmo ciclo: flush antecipado
+    cache.flush()
+    assert seen == [True, False]
+    assert cache.edge_flushes == 1 and cache.flushes == 2
+    assert _server_value(line, COUNTER) == 5
+
+
+def test_flush_writes_typed_values_with_a_utc_timestamp(line):
+    cache = line.cache
+    before = datetime.datetime.now(datetime.timezone.utc)
+    cache.set(COUNTER, np.int32(7))
+    cache.set("Belt_Conveyor_6m_0", 1)
+    cache.flush()
+    data_value = line.nodes[COUNTER].get_data_value()
+    assert data_value.Value.Value == 7 and type(data_value.Value.Value) is int
+    assert data_value.Value.VariantType.name == "Int32"
+    assert _server_value(line, "Belt_Conveyor_6m_0") is True
+    assert data_value.SourceTimestamp.tzinfo is not None
+    assert before <= data_value.SourceTimestamp <= datetime.datetime.now(datetime.timezone.utc)
+
+
+def test_client_write_wins_over_a_pending_write(line):
+    cache = line.cache
+    cache.set(COUNTER, 10)
+    line.nodes[COUNTER].set_value(42, line.cache._ua.VariantType.Int32)   # Escrita de um cliente
+    assert cache.get(COUNTER) == 42 and cache.external == 1
+    assert not cache.pending
+    cache.flush()
+    assert _server_value(line, COUNTER) == 42
+    # Escrever de novo o valor do cliente é redundante
+    assert not cache.set(COUNTER, 42)
+    assert "suprimidas" in cache.report()
@@ -0,0 +1,65 @@
+from controller.TagRegistry import OBJECT_TYPECODE, TagRegistry
+from controller.TagTable import load_tag_table
+
+
+def test_set_get_previous():
+    registry = TagRegistry()
+    index = registry.intern("ns=2;s=L.Contadores_PLC.C_TOTAL", "Int32")
+    assert registry.get(index) is None and registry.previous(index) is None
+    registry.set(index, 1, now_ns=10)
+    registry.set(index, 2, now_ns=20)
+    assert registry.get(index) == 2
+    assert registry.previous(index) == 1
+    assert registry.updated[index] == 20
+    assert registry.snapshot() == {"ns=2;s=L.Contadores_PLC.C_TOTAL": 2}
+
+
+def test_intern_is_stable_and_indexes_by_name_and_alias():
+    registry = TagRegistry()
+    first = registry.intern("ns=2;s=L.IOs.Sensor", "Boolean")
+    assert registry.intern("ns=2;s=L.IOs.Sensor", "Boolean") == first
+    assert registry.index("Sensor") == first
+    registry.alias(("ns", 2, "Sensor"), first)
+    assert registry.index(("ns", 2, "Sensor")) == first
+    assert registry.get_index("Inexistente") is None
+    assert len(registry) == 1
+
+
+def test_boolean_column_returns_bool():
+    registry = TagRegistry()
+    index = registry.intern("ns=2;s=L.IOs.Sensor", "Boolean")
+    registry.set(index, True)
+    assert registry.get(index) is True
+    assert registry.layout() == [("b", 0)]
+
+
+def test_out_of_type_value_demotes_to_object_column():
+    registry = TagRegistry()
+    other = registry.intern("ns=2;s=L.A", "Int32")
+    index = registry.intern("ns=2;s=L.B", "Int32")
+    registry.set(other, 7)
+    registry.set(index, 5)
+    registry.set(index, "falha")
+    assert registry.demotions == 1
+    assert registry.get(index) == "falha"
+    assert registry.previous(index) == 5
+    assert registry.layout()[index][0] == OBJECT_TYPECODE
+    # As demais tags da coluna tipada não são afetadas
+    assert registry.get(other) == 7
+    registry.set(index, 6)
+    assert registry.get(index) == 6 and registry.previous(index) == "falha"
+
+
+def test_overflow_demotes():
+    registry = TagRegistry()
+    index = registry.intern("ns=2;s=L.C", "Int32")
+    registry.set(index, 2 ** 40)
+    assert registry.get(index) == 2 ** 40
+    assert registry.demotions == 1
+
+
+def test_from_table_keeps_table_order():
+    table = load_tag_table()
+    registry = TagRegistry.from_table(table)
+    assert registry.names == [tag.name for tag in table.tags]
+    assert registry.node_ids[0] == table.node_id(table.tags[0])
@@ -0,0 +1,60 @@
+import pytest
+
+from controller.TickScheduler import TickScheduler
+
+
+def _scheduler(*everies):
+    scheduler = TickScheduler(0.01)
+    for every in everies:
+        scheduler.add_task(lambda tick: None, every=every, name=f"a_cada_{every}")
+    return scheduler
+
+
+def _due(scheduler, tick):
+    return [task.name for task in scheduler.due(tick)]
+
+
+def test_tasks_run_on_their_multiples():
+    scheduler = _scheduler(1, 3)
+    assert [_due(scheduler, tick) for tick in range(7)] == [
+        ["a_cada_1", "a_cada_3"], ["a_cada_1"], ["a_cada_1"],
+        ["a_cada_1", "a_cada_3"], ["a_cada_1"], ["a_cada_1"],
+        ["a_cada_1", "a_cada_3"],
+    ]
+
+
+def test_task_missed_in_overrun_gap_runs_once_and_keeps_phase():
+    scheduler = _scheduler(1, 5)
+    assert _due(scheduler, 0) == ["a_cada_1", "a_cada_5"]
+    # Ciclos 1..6 pulados por um overrun: o múltiplo 5 caiu dentro do intervalo
+    assert _due(scheduler, 7) == ["a_cada_1", "a_cada_5"]
+    assert _due(scheduler, 8) == ["a_cada_1"]
+    assert _due(scheduler, 10) == ["a_cada_1", "a_cada_5"]
+
+
+def test_gap_covering_several_multiples_runs_task_once():
+    scheduler = _scheduler(2)
+    assert _due(scheduler, 0) == ["a_cada_2"]
+    assert _due(scheduler, 9) == ["a_cada_2"]
+    assert _due(scheduler, 9) == []
+    assert _due(scheduler, 10) == ["a_cada_2"]
+
+
+def test_run_calls_tasks_and_counts_ticks():
+    scheduler = TickScheduler(0.001)
+    calls = []
+    scheduler.add_task(calls.append)
+    scheduler.run(max_ticks=5)
+    assert calls and calls == sorted(set(calls)) and calls[-1] < 5
+    assert scheduler.ticks == len(calls)
+    assert scheduler.ticks + scheduler.skipped >= 5
+
+
+def test_invalid_period_and_every():
+    with pytest.raises(ValueError):
+        TickScheduler(0.0001)
+    with pytest.raises(ValueError):
+        TickScheduler(2.0)
+    with pytest.raises(ValueError):
+        TickScheduler(0.01).add_task(lambda tick: None, every=0)
+    assert TickScheduler(0.01).every_seconds(0.5) == 50
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+from controller.TagTable import load_tag_table  # noqa: E402
+
+# --- Configurações ---
+HOST = "127.0.0.2"
+PORTS = {"threaded": 4880, "asyncio": 4881}
+SERVER_SCRIPTS = {"threaded": "opcuaServer.py", "asyncio": "opcuaServerAsync.py"}
+PUBLISHING_INTERVAL_MS = 50
+
+TAG_TABLE = load_tag_table()
+
+
+class Counter(object):
+    """ Handler de assinatura que apenas conta as notificações. """
+    def __init__(self):
+        self.count = 0
+
+    def datachange_notification(self, node, val, data):
+        self.count += 1
+
+
+def start_server(stack, lines, period):
+    """ Inicia o servidor da pilha indicada em um subprocesso e espera a porta abrir. """
+    port = PORTS[stack]
+    command = [sys.executable, SERVER_SCRIPTS[stack], "--host", HOST, "--port", str(port), "--lines", str(lines),
+               "--period", str(period), "--emitter-period", str(period)]
+    process = subprocess.Popen(command, cwd=SRC_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=0.5).close()
+            time.sleep(0.5)
+            return process, f"opc.tcp://{HOST}:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Servidor {stack} não abriu a porta {port}.")
+
+
+def server_threads(process):
+    """ Número de threads do processo servidor (Linux, via /proc); None se indisponível. """
+    try:
+        return len(os.listdir(f"/proc/{process.pid}/task"))
+    except OSError:
+        return None
+
+
+def node_ids(lines):
+    names = [TAG_TABLE.root] if lines == 1 else [f"{TAG_TABLE.root}_{i:03d}" for i in range(lines)]
+    return [node_id for name in names for node_id in TAG_TABLE.node_ids(2, root=name)]
+
+
+def run_threaded_clients(endpoint, n_clients, lines, duration, process):
+    from opcua import Client
+
+    clients, counters = [], []
+    started = time.perf_counter()
+    for _ in range(n_clients):
+        try:
+            client = Client(endpoint)
+            client.connect()
+            clients.append(client)
+        except Exception:
+            break
+    connect_s = time.perf_counter() - started
+
+    try:
+        for client in clients:
+            counter = Counter()
+            subscription = client.create_subscription(PUBLISHING_INTERVAL_MS, counter)
+            subscription.subscribe_data_change([client.get_node(node_id) for node_id in node_ids(lines)])
+            counters.append(counter)
+
+        time.sleep(1.0)
+        before = sum(counter.count for counter in counters)
+        time.sleep(duration)
+        notifications = sum(counter.count for counter in counters) - before
+        return {
+            "clients_connected": len(clients),
+            "connect_time_s": connect_s,
+            "notifications_per_s": notifications / duration,
+            "client_threads": threading.active_count(),
+            "server_threads": server_threads(process),
+        }
+    finally:
+        for client in clients:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+
+async def run_async_clients(endpoint, n_clients, lines, duration, process):
+    from asyncua import Client
+
+    clients, counters = [], []
+    started = time.perf_counter()
+    for _ in range(n_clients):
+        try:
+            client = Client(endpoint)
+            await client.connect()
+            clients.append(client)
+        except Exception:
+            break
+    connect_s = time.perf_counter() - started
+
+    try:
+        for client in clients:
+            counter = Counter()
+            subscription = await client.create_subscription(PUBLISHING_INTERVAL_MS, counter)
+            await subscription.subscribe_data_change([client.get_node(node_id) for node_id in node_ids(lines)])
+            counters.append(counter)
+
+        await asyncio.sleep(1.0)
+        before = sum(counter.count for counter in counters)
+        await asyncio.sleep(duration)
+        notifications = sum(counter.count for counter in counters) - before
+        return {
+            "clients_connected": len(clients),
+            "connect_time_s": connect_s,
+            "notifications_per_s": notifications / duration,
+            "client_threads": threading.active_count(),
+            "server_threads": server_threads(process),
+        }
+    finally:
+        for client in clients:
+            try:
+                await client.disconnect()
+            except Exception:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara as pilhas OPC UA threaded (python-opcua) e asyncio (asyncua).")
+    parser.add_argument("--clients", type=int, default=50, help="Sessões simultâneas (cada uma com uma assinatura).")
+    parser.add_argument("--lines", type=int, default=1,
+                        help=f"Linhas no servidor ({len(TAG_TABLE.tags)} tags assinadas por linha).")
+    parser.add_argument("--period", type=float, default=0.01, help="Período do ciclo/emissor do servidor (s).")
+    parser.add_argument("--duration", type=float, default=10.0, help="Janela de medição (s).")
+    parser.add_argument("--json", default=None, help="Arquivo para salvar os resultados.")
+    args = parser.parse_args()
+
+    results = {}
+    for stack in ("threaded", "asyncio"):
+        process, endpoint = start_server(stack, args.lines, args.period)
+        try:
+            print(f"⏳ {stack}: {args.clients} clientes em {endpoint}...")
+            if stack == "threaded":
+                results[stack] = run_threaded_clients(endpoint, args.clients, args.lines, args.duration, process)
+            else:
+                results[stack] = asyncio.run(run_async_clients(endpoint, args.clients, args.lines, args.duration, process))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print(f"\n{'métrica':<22}{'threaded':>14}{'asyncio':>14}")
+    for metric in ("clients_connected", "connect_time_s", "notifications_per_s", "client_threads", "server_threads"):
+        row = [results[stack][metric] for stack in ("threaded", "asyncio")]
+        print(f"{metric:<22}" + "".join(f"{value:>14.1f}" if isinstance(value, float) else f"{str(value):>14}" for value in row))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+        print(f"\n📝 Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
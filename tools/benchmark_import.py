@@ -0,0 +1,59 @@
+import os
+import statistics
+import subprocess
+import sys
+
+# --- Configurações ---
+MODULE = "controller.EmitterController"
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+RUNS = 15
+BUDGET_MS = 25.0  # Orçamento para a mediana do tempo de importação
+
+# Código executado em um interpretador novo: mede apenas o import do módulo
+# e verifica se ele não escreveu nada nem puxou o NumPy.
+PROBE = f"""
+import sys, time, io, contextlib
+buffer = io.StringIO()
+t0 = time.perf_counter()
+with contextlib.redirect_stdout(buffer):
+    import {MODULE}
+elapsed = time.perf_counter() - t0
+sys.stdout.write(f"{{elapsed * 1000:.3f}} {{len(buffer.getvalue())}} {{int('numpy' in sys.modules)}}")
+"""
+
+
+def measure_import(runs: int = RUNS):
+    """
+    Importa o módulo em 'runs' processos novos e retorna a lista de tempos (ms).
+    Falha se o import imprimir algo ou carregar o NumPy.
+    """
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, PYTHONDONTWRITEBYTECODE="")
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True
+        ).stdout
+        elapsed_ms, printed_chars, numpy_loaded = output.split()
+        if int(printed_chars):
+            raise AssertionError(f"O import de {MODULE} escreveu {printed_chars} caracteres no stdout.")
+        if int(numpy_loaded):
+            raise AssertionError(f"O import de {MODULE} carregou o NumPy.")
+        timings.append(float(elapsed_ms))
+    return timings
+
+
+def main():
+    timings = measure_import()
+    median = statistics.median(timings)
+    print(f"Import de {MODULE} ({len(timings)} processos)")
+    print(f"  mediana: {median:.2f} ms | mín: {min(timings):.2f} ms | máx: {max(timings):.2f} ms")
+    print(f"  orçamento: {BUDGET_MS:.2f} ms")
+
+    if median > BUDGET_MS:
+        print("🚨 Import acima do orçamento.")
+        sys.exit(1)
+    print("✅ Import dentro do orçamento.")
+
+
+if __name__ == "__main__":
+    main()
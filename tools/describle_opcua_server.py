@@ -1,108 +1,323 @@
-from opcua import Client, Node, ua
+from opcua import Client, ua
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import hashlib
+import json
+import os
 import sys
+import time
 
 # --- Configurações ---
-URL_SERVIDOR = "opc.tcp://127.0.0.2:4840" 
-NODE_ID_INICIAL = "i=85" 
+URL_SERVIDOR = "opc.tcp://127.0.0.2:4840"
+NODE_ID_INICIAL = "i=85"
+
+# Nós por requisição Browse/Read (limitado pelos OperationLimits do servidor, se houver)
+BATCH_SIZE = 1000
+# Requisições em paralelo (lotes de subárvores diferentes no mesmo nível)
+MAX_CONCURRENCY = 4
+# Nó opcional cujo valor muda quando o modelo do servidor muda (ex.: versão da aplicação no CODESYS)
+MODEL_VERSION_NODE = None
+CACHE_VERSION = 1
 
 # Caracteres usados para desenhar a árvore
 LINE_PREFIX = "├── " # Prefixo para o nó atual
 LAST_PREFIX = "└── " # Prefixo para o último nó de uma lista
 INDENT_STEP = "    " # Espaço para cada nível de profundidade
 
-# --- Função de Navegação Recursiva ---
-def browse_and_read(node: Node, depth=0, parent_prefix=""):
+# Nós cujos filhos são navegados (como no browse recursivo original)
+EXPANDED_CLASSES = (ua.NodeClass.Object, ua.NodeClass.Method)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def operation_limits(client):
+    """ MaxNodesPerBrowse / MaxNodesPerRead do servidor (0 = sem limite, None = não informado). """
+    limits = []
+    for identifier in (ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerBrowse,
+                       ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead):
+        try:
+            limits.append(client.get_node(ua.NodeId(identifier)).get_value())
+        except Exception:
+            limits.append(None)
+    return limits
+
+
+def _batch_size(limit):
+    return min(BATCH_SIZE, limit) if limit else BATCH_SIZE
+
+
+# --- Navegação em Largura (BFS) com Browse em Lote ---
+def _browse_batch(client, node_ids):
     """
-    Navega recursivamente, imprime a estrutura em formato de árvore
-    e lê o valor das variáveis.
+    Um BrowseRequest para vários nós (referências hierárquicas para frente,
+    como Node.get_children()), seguindo os continuation points com BrowseNext.
     """
-    
-    # 1. Obter Nome e Classe
-    try:
-        display_name = node.get_display_name().Text
-    except ua.UaError:
-        display_name = str(node.nodeid)
-    
-    node_class = node.get_node_class()
+    params = ua.BrowseParameters()
+    for node_id in node_ids:
+        desc = ua.BrowseDescription()
+        desc.NodeId = node_id
+        desc.BrowseDirection = ua.BrowseDirection.Forward
+        desc.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HierarchicalReferences)
+        desc.IncludeSubtypes = True
+        desc.NodeClassMask = ua.NodeClass.Unspecified
+        desc.ResultMask = ua.BrowseResultMask.All
+        params.NodesToBrowse.append(desc)
 
-    # 2. Imprimir o Nó Atual
-    prefix = LAST_PREFIX if depth == 0 else LINE_PREFIX
-    
-    if node_class == ua.NodeClass.Variable:
+    results = client.uaclient.browse(params)
+    children, errors = [], []
+    for result in results:
+        refs, error = [], None
+        while True:
+            if not result.StatusCode.is_good():
+                error = result.StatusCode
+                break
+            refs.extend(result.References)
+            if not result.ContinuationPoint:
+                break
+            next_params = ua.BrowseNextParameters()
+            next_params.ContinuationPoints = [result.ContinuationPoint]
+            result = client.uaclient.browse_next(next_params)[0]
+        children.append(refs)
+        errors.append(error)
+    return children, errors
+
+
+def _read_batch(client, node_ids, attributes):
+    """ Um ReadRequest; attributes é um AttributeId para todos os nós ou um por nó. """
+    if not isinstance(attributes, (list, tuple)):
+        attributes = [attributes] * len(node_ids)
+    params = ua.ReadParameters()
+    for node_id, attribute in zip(node_ids, attributes):
+        rv = ua.ReadValueId()
+        rv.NodeId = node_id
+        rv.AttributeId = attribute
+        params.NodesToRead.append(rv)
+    return client.uaclient.read(params)
+
+
+def _map_batches(pool, func, items, size):
+    """ Aplica func a cada lote de items no pool e concatena os resultados, na ordem. """
+    results = []
+    for batch_result in pool.map(func, list(_chunks(items, size))):
+        results.extend(batch_result)
+    return results
+
+
+def browse_tree(client, start_node_id, pool, browse_limit=None):
+    """
+    Navega o address space nível a nível: cada nível é um conjunto de
+    BrowseRequests com até BATCH_SIZE nós, enviados em paralelo (pool).
+    O nome e a classe dos filhos vêm nas próprias ReferenceDescriptions, sem
+    leituras extras. Retorna {NodeId string: nó}, com a raiz em start_node_id.
+    """
+    root = ua.NodeId.from_string(start_node_id)
+    name_dv, class_dv = _read_batch(client, [root, root], [ua.AttributeIds.DisplayName, ua.AttributeIds.NodeClass])
+    display_name = name_dv.Value.Value.Text if name_dv.StatusCode.is_good() else root.to_string()
+    class_dv.StatusCode.check()
+    node_class = class_dv.Value.Value
+
+    tree = {root.to_string(): {"node_id": root.to_string(), "display_name": display_name,
+                               "node_class": node_class.name, "children": []}}
+    level = [root] if node_class in EXPANDED_CLASSES else []
+    size = _batch_size(browse_limit)
+
+    def browse(batch):
+        children, errors = _browse_batch(client, batch)
+        return list(zip(batch, children, errors))
+
+    while level:
+        next_level = []
+        for parent, refs, error in _map_batches(pool, browse, level, size):
+            entry = tree[parent.to_string()]
+            if error is not None:
+                entry["error"] = f"Erro ao buscar filhos: {error}"
+                continue
+            for ref in refs:
+                node_id = ref.NodeId.to_string()
+                entry["children"].append(node_id)
+                if node_id in tree:
+                    continue  # Já visitado (referências cruzadas não geram ciclos)
+                tree[node_id] = {"node_id": node_id, "display_name": ref.DisplayName.Text or node_id,
+                                 "node_class": ref.NodeClass.name, "children": []}
+                if ref.NodeClass in EXPANDED_CLASSES:
+                    next_level.append(ref.NodeId)
+        level = next_level
+    return tree
+
+
+def read_values(client, tree, pool, read_limit=None):
+    """ Lê o valor de todas as variáveis da árvore em ReadRequests de até BATCH_SIZE nós. """
+    variables = [node_id for node_id, entry in tree.items() if entry["node_class"] == "Variable"]
+    read = lambda batch: _read_batch(client, [ua.NodeId.from_string(node_id) for node_id in batch], ua.AttributeIds.Value)
+    for node_id, dv in zip(variables, _map_batches(pool, read, variables, _batch_size(read_limit))):
+        entry = tree[node_id]
         try:
-            # Tenta ler o valor da variável
-            value = node.get_value()
-            value_str = f"**{value}** ({type(value).__name__})"
-            
-            # Formato de Variável: Nome | Valor (Tipo) | [NodeID]
-            output = f"VARIÁVEL: {display_name} | Valor: {value_str}"
+            dv.StatusCode.check()
+            entry["value"] = dv.Value.Value
+            entry["type"] = type(dv.Value.Value).__name__
         except Exception as e:
-            # Formato de Erro: Nome | [ERRO] | [NodeID]
-            output = f"VARIÁVEL: {display_name} | Erro ao ler: {e}"
-        
-        # Imprime a linha da variável
-        print(f"{parent_prefix}{prefix}{output}")
-        # Opcional: imprimir o NodeID da variável abaixo
-        print(f"{parent_prefix}{INDENT_STEP}NodeID: {str(node.nodeid)}")
+            entry["error"] = f"Erro ao ler: {e}"
 
-    elif node_class == ua.NodeClass.Object or node_class == ua.NodeClass.Method:
-        # Formato de Pasta: Nome (Objeto) | [NodeID]
-        output = f"OBJETO/PASTA: {display_name}"
+
+# --- Cache da Estrutura ---
+def model_version(client, version_node=MODEL_VERSION_NODE):
+    """
+    Identifica a versão do modelo do servidor: instante de início do servidor,
+    NamespaceArray e, se configurado, o valor de version_node. Se
+    qualquer um mudar, o cache da estrutura é descartado.
+    """
+    parts = [
+        client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerStatus_StartTime)).get_value().isoformat(),
+        client.get_node(ua.NodeId(ua.ObjectIds.Server_NamespaceArray)).get_value(),
+    ]
+    if version_node:
+        parts.append(client.get_node(version_node).get_value())
+    return hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+
+def cache_path(cache_dir, url, start_node_id):
+    key = hashlib.sha1(f"{url}|{start_node_id}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"browse_{key}.json")
+
+
+def load_cache(path, version):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("cache_version") != CACHE_VERSION or data.get("model_version") != version:
+        return None
+    return data["tree"]
+
+
+def save_cache(path, version, tree):
+    # Só a estrutura: valores e erros de leitura são sempre lidos de novo
+    structure = {node_id: {key: entry[key] for key in ("node_id", "display_name", "node_class", "children")}
+                 for node_id, entry in tree.items()}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"cache_version": CACHE_VERSION, "model_version": version, "tree": structure}, f)
+    os.replace(temp_path, path)
+
+
+# --- Saída ---
+def print_tree(tree, node_id, depth=0, parent_prefix="", visited=None):
+    """ Imprime a árvore no mesmo formato do browse recursivo original. """
+    visited = set() if visited is None else visited
+    visited.add(node_id)
+    entry = tree[node_id]
+    display_name = entry["display_name"]
+    prefix = LAST_PREFIX if depth == 0 else LINE_PREFIX
+
+    if entry["node_class"] == "Variable":
+        if "error" in entry:
+            output = f"VARIÁVEL: {display_name} | {entry['error']}"
+        else:
+            output = f"VARIÁVEL: {display_name} | Valor: **{entry.get('value')}** ({entry.get('type')})"
         print(f"{parent_prefix}{prefix}{output}")
-        # Opcional: imprimir o NodeID da pasta abaixo
-        print(f"{parent_prefix}{INDENT_STEP}NodeID: {str(node.nodeid)}")
-        
-        # 3. Preparar para Navegar nos Filhos
-        try:
-            children = node.get_children()
-        except Exception as e:
-            print(f"{parent_prefix}{INDENT_STEP}Erro ao buscar filhos: {e}")
-            return # Sai da recursão se não puder buscar filhos
+        print(f"{parent_prefix}{INDENT_STEP}NodeID: {node_id}")
+
+    elif entry["node_class"] in ("Object", "Method"):
+        print(f"{parent_prefix}{prefix}OBJETO/PASTA: {display_name}")
+        print(f"{parent_prefix}{INDENT_STEP}NodeID: {node_id}")
+        if "error" in entry:
+            print(f"{parent_prefix}{INDENT_STEP}{entry['error']}")
+            return
 
-        # Define o novo prefixo de indentação para os filhos
-        # Se este nó não for o último filho do seu pai, a linha vertical continua.
-        new_parent_prefix = parent_prefix + (INDENT_STEP if prefix == LINE_PREFIX else "    ")
-        
-        # 4. Chamar Recursivamente para cada Filho
-        for i, child in enumerate(children):
-            # Passa o prefixo de indentação atualizado
-            browse_and_read(child, depth + 1, new_parent_prefix)
+        new_parent_prefix = parent_prefix + INDENT_STEP
+        for child in entry["children"]:
+            if child not in visited:
+                print_tree(tree, child, depth + 1, new_parent_prefix, visited)
+
+
+def export_json(tree, node_id, visited=None):
+    """ Árvore aninhada (dicts) a partir de node_id, pronta para json.dump. """
+    visited = set() if visited is None else visited
+    visited.add(node_id)
+    entry = dict(tree[node_id])
+    children = [child for child in entry.pop("children") if child not in visited]
+    if entry["node_class"] in ("Object", "Method"):
+        entry["children"] = [export_json(tree, child, visited) for child in children]
+    return entry
 
 
 # --- Função Principal ---
 def main():
     """Conecta ao servidor OPC UA do Codesys e inicia a leitura."""
-    
-    client = Client(URL_SERVIDOR)
-    
-    print(f"\n==========================================================================")
-    print(f"       Conectando a {URL_SERVIDOR}...")
-    print(f"==========================================================================\n")
-    
+    parser = argparse.ArgumentParser(description="Navega o address space de um servidor OPC UA e lê as variáveis.")
+    parser.add_argument("--url", default=URL_SERVIDOR, help="Endpoint do servidor.")
+    parser.add_argument("--start", default=NODE_ID_INICIAL, help="NodeId inicial.")
+    parser.add_argument("--cache-dir", default=None, help="Guarda a estrutura navegada neste diretório.")
+    parser.add_argument("--model-version-node", default=MODEL_VERSION_NODE,
+                        help="NodeId cujo valor muda junto com o modelo (invalida o cache).")
+    parser.add_argument("--json", default=None, metavar="ARQUIVO", help="Exporta a árvore em JSON em vez de imprimir.")
+    parser.add_argument("--no-values", action="store_true", help="Não lê os valores das variáveis.")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Requisições em paralelo.")
+    args = parser.parse_args()
+
+    client = Client(args.url)
+    # Com --json -, o JSON vai para stdout e as mensagens para stderr
+    out = sys.stderr if args.json == "-" else sys.stdout
+
+    print(f"\n==========================================================================", file=out)
+    print(f"       Conectando a {args.url}...", file=out)
+    print(f"==========================================================================\n", file=out)
+
     try:
         client.connect()
-        print("Conexão estabelecida com sucesso! \n")
-        
-        start_node = client.get_node(NODE_ID_INICIAL)
-        print(f"Iniciando a Árvore a partir do nó: {NODE_ID_INICIAL}\n")
-        
-        # Inicia a navegação (a profundidade inicial é 0)
-        browse_and_read(start_node)
-        
+        print("Conexão estabelecida com sucesso! \n", file=out)
+        browse_limit, read_limit = operation_limits(client)
+
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+            started = time.perf_counter()
+            tree, path, version = None, None, None
+            if args.cache_dir:
+                version = model_version(client, args.model_version_node)
+                path = cache_path(args.cache_dir, args.url, args.start)
+                tree = load_cache(path, version)
+            source = "cache" if tree is not None else "browse"
+            if tree is None:
+                tree = browse_tree(client, args.start, pool, browse_limit)
+                if path:
+                    save_cache(path, version, tree)
+            browsed = time.perf_counter()
+            if not args.no_values:
+                read_values(client, tree, pool, read_limit)
+            finished = time.perf_counter()
+
+        print(f"{len(tree)} nós ({source}: {browsed - started:.2f} s, leitura: {finished - browsed:.2f} s)\n", file=out)
+        start = ua.NodeId.from_string(args.start).to_string()
+        if args.json:
+            document = export_json(tree, start)
+            if args.json == "-":
+                json.dump(document, sys.stdout, ensure_ascii=False, indent=2, default=str)
+            else:
+                with open(args.json, "w", encoding="utf-8") as f:
+                    json.dump(document, f, ensure_ascii=False, indent=2, default=str)
+                print(f"Árvore exportada para {args.json}", file=out)
+        else:
+            print(f"Iniciando a Árvore a partir do nó: {args.start}\n")
+            print_tree(tree, start)
+
     except ConnectionRefusedError:
-        print(f"\nERRO DE CONEXÃO: O servidor OPC UA no endereço {URL_SERVIDOR} recusou a conexão.")
-        print("Verifique se o Codesys SoftPLC está rodando e o servidor OPC UA está ativo.")
+        print(f"\nERRO DE CONEXÃO: O servidor OPC UA no endereço {args.url} recusou a conexão.", file=out)
+        print("Verifique se o Codesys SoftPLC está rodando e o servidor OPC UA está ativo.", file=out)
     except Exception as e:
-        print(f"\nOcorreu um erro: {e}")
-        
+        print(f"\nOcorreu um erro: {e}", file=out)
+
     finally:
         try:
             client.disconnect()
-            print("\n==========================================================================")
-            print("Conexão OPC UA fechada.")
-            print("==========================================================================")
+            print("\n==========================================================================", file=out)
+            print("Conexão OPC UA fechada.", file=out)
+            print("==========================================================================", file=out)
         except:
-            pass 
+            pass
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,245 @@
+from asyncua import Client, ua
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+
+# Variante asyncio (asyncua) de describle_opcua_server.py, com a mesma saída:
+# a mesma navegação em largura com Browse/Read em lote (os lotes de um nível vão
+# em paralelo com asyncio.gather em vez do ThreadPoolExecutor) e o mesmo cache
+# da estrutura. A impressão e a exportação são as da versão threaded.
+from describle_opcua_server import (BATCH_SIZE, MAX_CONCURRENCY, MODEL_VERSION_NODE, _chunks, cache_path,
+                                    export_json, load_cache, print_tree, save_cache)
+
+# --- Configurações ---
+URL_SERVIDOR = "opc.tcp://127.0.0.2:4840"
+NODE_ID_INICIAL = "i=85"
+
+# Nós cujos filhos são navegados (como no browse recursivo original)
+EXPANDED_CLASSES = (ua.NodeClass.Object, ua.NodeClass.Method)
+
+
+async def operation_limits(client):
+    """ MaxNodesPerBrowse / MaxNodesPerRead do servidor (0 = sem limite, None = não informado). """
+    limits = []
+    for identifier in (ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerBrowse,
+                       ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead):
+        try:
+            limits.append(await client.get_node(ua.NodeId(identifier)).read_value())
+        except Exception:
+            limits.append(None)
+    return limits
+
+
+def _batch_size(limit):
+    return min(BATCH_SIZE, limit) if limit else BATCH_SIZE
+
+
+# --- Navegação em Largura (BFS) com Browse em Lote ---
+async def _browse_batch(client, node_ids):
+    """
+    Um BrowseRequest para vários nós (referências hierárquicas para frente,
+    como Node.get_children()), seguindo os continuation points com BrowseNext.
+    """
+    params = ua.BrowseParameters()
+    for node_id in node_ids:
+        desc = ua.BrowseDescription()
+        desc.NodeId = node_id
+        desc.BrowseDirection = ua.BrowseDirection.Forward
+        desc.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HierarchicalReferences)
+        desc.IncludeSubtypes = True
+        desc.NodeClassMask = ua.NodeClass.Unspecified
+        desc.ResultMask = ua.BrowseResultMask.All
+        params.NodesToBrowse.append(desc)
+
+    results = await client.uaclient.browse(params)
+    children, errors = [], []
+    for result in results:
+        refs, error = [], None
+        while True:
+            if not result.StatusCode.is_good():
+                error = result.StatusCode
+                break
+            refs.extend(result.References)
+            if not result.ContinuationPoint:
+                break
+            next_params = ua.BrowseNextParameters()
+            next_params.ContinuationPoints = [result.ContinuationPoint]
+            result = (await client.uaclient.browse_next(next_params))[0]
+        children.append(refs)
+        errors.append(error)
+    return children, errors
+
+
+async def _read_batch(client, node_ids, attributes):
+    """ Um ReadRequest; attributes é um AttributeId para todos os nós ou um por nó. """
+    if not isinstance(attributes, (list, tuple)):
+        attributes = [attributes] * len(node_ids)
+    params = ua.ReadParameters()
+    for node_id, attribute in zip(node_ids, attributes):
+        rv = ua.ReadValueId()
+        rv.NodeId = node_id
+        rv.AttributeId = attribute
+        params.NodesToRead.append(rv)
+    return await client.uaclient.read(params)
+
+
+async def _map_batches(semaphore, func, items, size):
+    """ Aplica func a cada lote de items (no máximo 'semaphore' em voo) e concatena os resultados, na ordem. """
+    async def run(batch):
+        async with semaphore:
+            return await func(batch)
+
+    results = []
+    for batch_result in await asyncio.gather(*(run(batch) for batch in _chunks(items, size))):
+        results.extend(batch_result)
+    return results
+
+
+async def browse_tree(client, start_node_id, semaphore, browse_limit=None):
+    """
+    Navega o address space nível a nível: cada nível é um conjunto de
+    BrowseRequests com até BATCH_SIZE nós, enviados em paralelo. O nome e a
+    classe dos filhos vêm nas próprias ReferenceDescriptions, sem leituras
+    extras. Retorna {NodeId string: nó}, com a raiz em start_node_id.
+    """
+    root = ua.NodeId.from_string(start_node_id)
+    name_dv, class_dv = await _read_batch(client, [root, root], [ua.AttributeIds.DisplayName, ua.AttributeIds.NodeClass])
+    display_name = name_dv.Value.Value.Text if name_dv.StatusCode.is_good() else root.to_string()
+    class_dv.StatusCode.check()
+    node_class = ua.NodeClass(class_dv.Value.Value)
+
+    tree = {root.to_string(): {"node_id": root.to_string(), "display_name": display_name,
+                               "node_class": node_class.name, "children": []}}
+    level = [root] if node_class in EXPANDED_CLASSES else []
+    size = _batch_size(browse_limit)
+
+    async def browse(batch):
+        children, errors = await _browse_batch(client, batch)
+        return list(zip(batch, children, errors))
+
+    while level:
+        next_level = []
+        for parent, refs, error in await _map_batches(semaphore, browse, level, size):
+            entry = tree[parent.to_string()]
+            if error is not None:
+                entry["error"] = f"Erro ao buscar filhos: {error}"
+                continue
+            for ref in refs:
+                node_id = ref.NodeId.to_string()
+                entry["children"].append(node_id)
+                if node_id in tree:
+                    continue  # Já visitado (referências cruzadas não geram ciclos)
+                tree[node_id] = {"node_id": node_id, "display_name": ref.DisplayName.Text or node_id,
+                                 "node_class": ref.NodeClass.name, "children": []}
+                if ref.NodeClass in EXPANDED_CLASSES:
+                    next_level.append(ref.NodeId)
+        level = next_level
+    return tree
+
+
+async def read_values(client, tree, semaphore, read_limit=None):
+    """ Lê o valor de todas as variáveis da árvore em ReadRequests de até BATCH_SIZE nós. """
+    variables = [node_id for node_id, entry in tree.items() if entry["node_class"] == "Variable"]
+
+    async def read(batch):
+        return await _read_batch(client, [ua.NodeId.from_string(node_id) for node_id in batch], ua.AttributeIds.Value)
+
+    for node_id, dv in zip(variables, await _map_batches(semaphore, read, variables, _batch_size(read_limit))):
+        entry = tree[node_id]
+        try:
+            dv.StatusCode.check()
+            entry["value"] = dv.Value.Value
+            entry["type"] = type(dv.Value.Value).__name__
+        except Exception as e:
+            entry["error"] = f"Erro ao ler: {e}"
+
+
+async def model_version(client, version_node=MODEL_VERSION_NODE):
+    """ Versão do modelo do servidor, como em describle_opcua_server.model_version. """
+    parts = [
+        (await client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerStatus_StartTime)).read_value()).isoformat(),
+        await client.get_node(ua.NodeId(ua.ObjectIds.Server_NamespaceArray)).read_value(),
+    ]
+    if version_node:
+        parts.append(await client.get_node(version_node).read_value())
+    return hashlib.sha1(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+
+# --- Função Principal ---
+async def main():
+    """Conecta ao servidor OPC UA do Codesys e inicia a leitura."""
+    parser = argparse.ArgumentParser(description="Navega o address space de um servidor OPC UA (asyncua) e lê as variáveis.")
+    parser.add_argument("--url", default=URL_SERVIDOR, help="Endpoint do servidor.")
+    parser.add_argument("--start", default=NODE_ID_INICIAL, help="NodeId inicial.")
+    parser.add_argument("--cache-dir", default=None, help="Guarda a estrutura navegada neste diretório.")
+    parser.add_argument("--model-version-node", default=MODEL_VERSION_NODE,
+                        help="NodeId cujo valor muda junto com o modelo (invalida o cache).")
+    parser.add_argument("--json", default=None, metavar="ARQUIVO", help="Exporta a árvore em JSON em vez de imprimir.")
+    parser.add_argument("--no-values", action="store_true", help="Não lê os valores das variáveis.")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="Requisições em paralelo.")
+    args = parser.parse_args()
+
+    client = Client(args.url)
+    # Com --json -, o JSON vai para stdout e as mensagens para stderr
+    out = sys.stderr if args.json == "-" else sys.stdout
+
+    print(f"\n==========================================================================", file=out)
+    print(f"       Conectando a {args.url}...", file=out)
+    print(f"==========================================================================\n", file=out)
+
+    try:
+        await client.connect()
+        print("Conexão estabelecida com sucesso! \n", file=out)
+        browse_limit, read_limit = await operation_limits(client)
+        semaphore = asyncio.Semaphore(max(1, args.concurrency))
+
+        started = time.perf_counter()
+        tree, path, version = None, None, None
+        if args.cache_dir:
+            version = await model_version(client, args.model_version_node)
+            path = cache_path(args.cache_dir, args.url, args.start)
+            tree = load_cache(path, version)
+        source = "cache" if tree is not None else "browse"
+        if tree is None:
+            tree = await browse_tree(client, args.start, semaphore, browse_limit)
+            if path:
+                save_cache(path, version, tree)
+        browsed = time.perf_counter()
+        if not args.no_values:
+            await read_values(client, tree, semaphore, read_limit)
+        finished = time.perf_counter()
+
+        print(f"{len(tree)} nós ({source}: {browsed - started:.2f} s, leitura: {finished - browsed:.2f} s)\n", file=out)
+        start = ua.NodeId.from_string(args.start).to_string()
+        if args.json:
+            document = export_json(tree, start)
+            if args.json == "-":
+                json.dump(document, sys.stdout, ensure_ascii=False, indent=2, default=str)
+            else:
+                with open(args.json, "w", encoding="utf-8") as f:
+                    json.dump(document, f, ensure_ascii=False, indent=2, default=str)
+                print(f"Árvore exportada para {args.json}", file=out)
+        else:
+            print(f"Iniciando a Árvore a partir do nó: {args.start}\n")
+            print_tree(tree, start)
+
+    except ConnectionRefusedError:
+        print(f"\nERRO DE CONEXÃO: O servidor OPC UA no endereço {args.url} recusou a conexão.", file=out)
+        print("Verifique se o Codesys SoftPLC está rodando e o servidor OPC UA está ativo.", file=out)
+    except Exception as e:
+        print(f"\nOcorreu um erro: {e}", file=out)
+
+    finally:
+        try:
+            await client.disconnect()
+            print("\n==========================================================================", file=out)
+            print("Conexão OPC UA fechada.", file=out)
+            print("==========================================================================", file=out)
+        except:
+            pass
+
+if __name__ == "__main__":
+    asyncio.run(main())
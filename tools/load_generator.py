@@ -0,0 +1,134 @@
+from opcua import Client, ua
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from controller.TagTable import load_tag_table  # noqa: E402
+
+# --- Configurações ---
+URL_SERVIDOR = "opc.tcp://127.0.0.2:4840"
+PUBLISHING_INTERVAL_MS = 50
+REPORT_INTERVAL_S = 5.0
+DRIVEN_TAG = "Diffuse_Sensor_0"  # Tag alternada pelo gerador em cada linha
+
+TAG_TABLE = load_tag_table()
+
+
+class LineCounter(object):
+    """ Conta as notificações de data change recebidas por linha. """
+    def __init__(self, line_of_node):
+        self.line_of_node = line_of_node
+        self.counts = {line: 0 for line in set(line_of_node.values())}
+
+    def datachange_notification(self, node, val, data):
+        self.counts[self.line_of_node[node.nodeid]] += 1
+
+
+def discover_lines(client):
+    """ Pastas raiz de linhas de triagem expostas pelo servidor. """
+    objects = client.get_objects_node()
+    names = [child.get_browse_name().Name for child in objects.get_children()]
+    return sorted(name for name in names if name.startswith(TAG_TABLE.root))
+
+
+def drive_writes(client, nodes, rate_hz, stop_event):
+    """ Alterna DRIVEN_TAG de cada linha 'rate_hz' vezes por segundo. """
+    period = 1.0 / rate_hz
+    state = False
+    deadline = time.perf_counter()
+    while not stop_event.is_set():
+        state = not state
+        for node in nodes:
+            node.set_value(ua.DataValue(ua.Variant(state, ua.VariantType.Boolean)))
+        deadline += period
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            stop_event.wait(delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera carga e mede a taxa de atualizações por linha de triagem.")
+    parser.add_argument("--endpoints", nargs="+", default=[URL_SERVIDOR], help="Endpoints (um por processo servidor).")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duração da medição (s).")
+    parser.add_argument("--write-rate", type=float, default=0.0, help=f"Escritas/s em {DRIVEN_TAG} por linha (0 = só observar).")
+    args = parser.parse_args()
+
+    clients, subscriptions, writers = [], [], []
+    stop_event = threading.Event()
+    counters = []
+
+    try:
+        # 1. Conexão, descoberta das linhas e assinatura de todas as tags
+        for endpoint in args.endpoints:
+            client = Client(endpoint)
+            client.connect()
+            clients.append(client)
+
+            ns_index = client.get_namespace_index(TAG_TABLE.namespace_uri)
+            lines = discover_lines(client)
+            line_of_node = {}
+            nodes = []
+            for line in lines:
+                for node_id in TAG_TABLE.node_ids(ns_index, root=line):
+                    node = client.get_node(node_id)
+                    line_of_node[node.nodeid] = line
+                    nodes.append(node)
+
+            counter = LineCounter(line_of_node)
+            subscription = client.create_subscription(PUBLISHING_INTERVAL_MS, counter)
+            subscription.subscribe_data_change(nodes)
+            subscriptions.append(subscription)
+            counters.append(counter)
+            print(f"✅ {endpoint}: {len(lines)} linha(s), {len(nodes)} tags assinadas")
+
+            if args.write_rate > 0:
+                driven = [client.get_node(f"ns={ns_index};s={line}.IOs_Sensores_Fisicos.{DRIVEN_TAG}") for line in lines]
+                writer = threading.Thread(target=drive_writes, args=(client, driven, args.write_rate, stop_event), daemon=True)
+                writer.start()
+                writers.append(writer)
+
+        # 2. Medição (descarta as notificações iniciais de cada assinatura)
+        time.sleep(1.0)
+        for counter in counters:
+            for line in counter.counts:
+                counter.counts[line] = 0
+
+        start = time.perf_counter()
+        last_report = start
+        while time.perf_counter() - start < args.duration:
+            time.sleep(min(REPORT_INTERVAL_S, args.duration - (time.perf_counter() - start)))
+            now = time.perf_counter()
+            total = sum(sum(counter.counts.values()) for counter in counters)
+            print(f"   t={now - start:6.1f}s | {total / (now - start):10.1f} atualizações/s no total")
+            last_report = now
+
+        # 3. Relatório: taxa sustentada por linha
+        elapsed = last_report - start
+        rates = {line: count / elapsed for counter in counters for line, count in counter.counts.items()}
+        print(f"\n📈 Taxa sustentada por linha em {elapsed:.1f}s ({len(rates)} linhas)")
+        for line in sorted(rates):
+            print(f"   - {line}: {rates[line]:.1f} atualizações/s")
+        values = list(rates.values())
+        print(f"\n   média: {statistics.mean(values):.1f} | mín: {min(values):.1f} | máx: {max(values):.1f} | total: {sum(values):.1f} atualizações/s")
+
+    except KeyboardInterrupt:
+        print("\nInterrupção pelo usuário detectada.")
+    finally:
+        stop_event.set()
+        for writer in writers:
+            writer.join(timeout=2)
+        for subscription in subscriptions:
+            try:
+                subscription.delete()
+            except Exception:
+                pass
+        for client in clients:
+            client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,31 @@
 from opcua import Client, ua
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import csv
+import fnmatch
+import sys
 
 # --- Configurações ---
 URL_SERVIDOR = "opc.tcp://127.0.0.1:4840" 
 NODE_ID_VARIAVEL = "ns=4;s=|var|CODESYS Control Win V3 x64.Application.GVL_TRAFFIC.light_red"
 
+# Modo em lote: nós por ReadRequest (limitado pelo MaxNodesPerRead do servidor, se houver)
+BATCH_SIZE = 1000
+# Nó inicial da navegação usada para expandir padrões glob
+NODE_ID_INICIAL_GLOB = "i=85"
+
+# Atributos lidos no modo em lote, na ordem das colunas
+BATCH_ATTRIBUTES = [
+    ("display_name", ua.AttributeIds.DisplayName),
+    ("value", ua.AttributeIds.Value),
+    ("data_type", ua.AttributeIds.DataType),
+    ("access_level", ua.AttributeIds.AccessLevel),
+    ("user_access_level", ua.AttributeIds.UserAccessLevel),
+    ("min_sampling_interval_ms", ua.AttributeIds.MinimumSamplingInterval),
+]
+CSV_COLUMNS = ["node_id", "display_name", "value", "python_type", "data_type", "access_level",
+               "user_access_level", "min_sampling_interval_ms", "errors"]
+
 def read_node_attributes_safely(client, node_id):
     """Lê e exibe os atributos padrão do nó, ignorando aqueles que falham."""
     
@@ -25,7 +47,7 @@ def read_node_attributes_safely(client, node_id):
         # 3. Tipo de Dado
         try:
             data_type_node = variavel_node.get_data_type()
-            data_type_name = variavel_node.get_browse_name().Name
+            data_type_name = client.get_node(data_type_node).get_browse_name().Name
             print(f"Tipo de Dado (OPC UA): {data_type_name}")
         except Exception as e:
             print(f"Tipo de Dado: N/A. FALHA: {e}")
@@ -51,11 +73,167 @@ def read_node_attributes_safely(client, node_id):
         print(f"🛑 Erro fatal ao obter o objeto do nó: {e}")
 
 
+# --- Modo em Lote ---
+def _read(client, pairs):
+    """ Um ReadRequest com vários pares (NodeId, AttributeId). """
+    params = ua.ReadParameters()
+    for node_id, attribute in pairs:
+        rv = ua.ReadValueId()
+        rv.NodeId = node_id
+        rv.AttributeId = attribute
+        params.NodesToRead.append(rv)
+    return client.uaclient.read(params)
+
+
+def _read_many(client, pairs, batch_size):
+    try:
+        limit = client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead)).get_value()
+    except Exception:
+        limit = 0
+    batch_size = min(batch_size, limit) if limit else batch_size
+    results = []
+    for i in range(0, len(pairs), batch_size):
+        results.extend(_read(client, pairs[i:i + batch_size]))
+    return results
+
+
+def access_level_str(mask):
+    """ 3 (CurrentRead | CurrentWrite) -> "CurrentRead|CurrentWrite" """
+    return "|".join(flag.name for flag in ua.AccessLevel if mask & (1 << flag.value)) or "-"
+
+
+def expand_node_ids(client, patterns, start_node_id=NODE_ID_INICIAL_GLOB):
+    """
+    NodeIds literais passam direto; padrões com * ? [ são comparados (fnmatch)
+    com os NodeIds das variáveis encontradas navegando a partir de
+    start_node_id (BFS em lote de describle_opcua_server). Sem repetições.
+    """
+    node_ids, browsed = [], None
+    for pattern in patterns:
+        if not any(char in pattern for char in "*?["):
+            node_ids.append(pattern)
+            continue
+        if browsed is None:
+            from describle_opcua_server import browse_tree
+
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                tree = browse_tree(client, start_node_id, pool)
+            browsed = [node_id for node_id, entry in tree.items() if entry["node_class"] == "Variable"]
+        matches = fnmatch.filter(browsed, pattern)
+        if not matches:
+            print(f"⚠️ Nenhuma variável corresponde a '{pattern}'.", file=sys.stderr)
+        node_ids.extend(matches)
+    return list(dict.fromkeys(node_ids))
+
+
+def read_attributes_batch(client, node_ids, batch_size=BATCH_SIZE):
+    """
+    Lê os BATCH_ATTRIBUTES de todos os nós em ReadRequests de até batch_size
+    itens, mais uma leitura em lote dos BrowseNames dos tipos de dado que não
+    são do namespace 0. Atributos que falham ficam vazios e o StatusCode vai
+    para 'errors'. Retorna uma linha (dict com CSV_COLUMNS) por nó.
+    """
+    ids = [ua.NodeId.from_string(node_id) for node_id in node_ids]
+    pairs = [(node_id, attribute) for node_id in ids for _, attribute in BATCH_ATTRIBUTES]
+    results = _read_many(client, pairs, batch_size)
+
+    rows = []
+    for i, node_id in enumerate(node_ids):
+        row = {"node_id": node_id, "errors": []}
+        for (column, _), dv in zip(BATCH_ATTRIBUTES, results[i * len(BATCH_ATTRIBUTES):(i + 1) * len(BATCH_ATTRIBUTES)]):
+            if dv.StatusCode.is_good():
+                row[column] = dv.Value.Value
+            else:
+                row[column] = None
+                row["errors"].append(f"{column}: {dv.StatusCode.name}")
+        rows.append(row)
+
+    # Nomes dos tipos de dado: namespace 0 pela tabela do SDK, os demais em uma leitura em lote
+    custom_types = list({row["data_type"] for row in rows
+                         if isinstance(row["data_type"], ua.NodeId) and row["data_type"].NamespaceIndex != 0})
+    names = {}
+    if custom_types:
+        for data_type, dv in zip(custom_types, _read_many(client, [(t, ua.AttributeIds.BrowseName) for t in custom_types], batch_size)):
+            names[data_type] = dv.Value.Value.Name if dv.StatusCode.is_good() else data_type.to_string()
+
+    for row in rows:
+        data_type = row["data_type"]
+        if isinstance(data_type, ua.NodeId):
+            row["data_type"] = names.get(data_type) or ua.ObjectIdNames.get(data_type.Identifier, data_type.to_string())
+        if row["display_name"] is not None:
+            row["display_name"] = row["display_name"].Text
+        row["python_type"] = type(row["value"]).__name__ if row["value"] is not None else ""
+        for column in ("access_level", "user_access_level"):
+            if row[column] is not None:
+                row[column] = access_level_str(row[column])
+        if len(row["errors"]) == len(BATCH_ATTRIBUTES) and len({e.split(": ")[1] for e in row["errors"]}) == 1:
+            row["errors"] = [row["errors"][0].split(": ")[1]]  # Ex.: BadNodeIdUnknown em todos os atributos
+        row["errors"] = "; ".join(row["errors"])
+    return rows
+
+
+# Largura máxima da coluna de valor na tabela (arrays longos são truncados)
+VALUE_WIDTH = 40
+
+
+def print_table(rows):
+    columns = ["node_id", "display_name", "value", "data_type", "access_level", "user_access_level",
+               "min_sampling_interval_ms", "errors"]
+    headers = ["NodeID", "Nome", "Valor", "Tipo", "Acesso", "Acesso (usuário)", "Min. Amostragem (ms)", "Falhas"]
+    cells = [[("" if row[column] is None else str(row[column])) for column in columns] for row in rows]
+    for line in cells:
+        if len(line[2]) > VALUE_WIDTH:
+            line[2] = line[2][:VALUE_WIDTH - 3] + "..."
+    widths = [max([len(header)] + [len(line[i]) for line in cells]) for i, header in enumerate(headers)]
+    print("  ".join(header.ljust(width) for header, width in zip(headers, widths)))
+    print("  ".join("-" * width for width in widths))
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip())
+
+
+def write_csv(rows, path):
+    f = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+    try:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({column: "" if row.get(column) is None else row[column] for column in CSV_COLUMNS})
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
 def main():
-    client = Client(URL_SERVIDOR)
+    parser = argparse.ArgumentParser(description="Diagnóstico dos atributos de variáveis OPC UA (um nó ou em lote).")
+    parser.add_argument("nodes", nargs="*", help="NodeIds ou padrões glob (ex.: 'ns=2;s=Linha_Triagem_IIoT.IOs_*').")
+    parser.add_argument("--url", default=URL_SERVIDOR, help="Endpoint do servidor.")
+    parser.add_argument("--file", default=None, help="Arquivo com um NodeId ou padrão por linha.")
+    parser.add_argument("--start", default=NODE_ID_INICIAL_GLOB, help="Nó inicial da navegação para os padrões glob.")
+    parser.add_argument("--csv", default=None, metavar="ARQUIVO", help="Grava o resultado em CSV ('-' = stdout).")
+    args = parser.parse_args()
+
+    patterns = list(args.nodes)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            patterns.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+    client = Client(args.url)
     try:
         client.connect()
-        read_node_attributes_safely(client, NODE_ID_VARIAVEL)
+        if not patterns:
+            # Sem argumentos: diagnóstico detalhado do nó configurado, como antes
+            read_node_attributes_safely(client, NODE_ID_VARIAVEL)
+            return
+        node_ids = expand_node_ids(client, patterns, args.start)
+        rows = read_attributes_batch(client, node_ids)
+        if args.csv:
+            write_csv(rows, args.csv)
+            if args.csv != "-":
+                print(f"📝 {len(rows)} nós gravados em {args.csv}")
+        else:
+            print_table(rows)
+            failed = sum(1 for row in rows if row["errors"])
+            print(f"\n{len(rows)} nós, {failed} com falhas de leitura.")
     except Exception as e:
         print(f"Erro de conexão: {e}")
     finally:
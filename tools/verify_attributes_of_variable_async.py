@@ -0,0 +1,204 @@
+from asyncua import Client, ua
+import argparse
+import asyncio
+import fnmatch
+import sys
+
+# Variante asyncio (asyncua) de verify_attributes_of_variable.py, com a mesma saída:
+# o diagnóstico detalhado de um nó e o modo em lote (ReadRequests de até
+# BATCH_SIZE atributos, padrões glob, tabela ou CSV). A formatação da saída é a
+# da versão threaded.
+from verify_attributes_of_variable import (BATCH_SIZE, NODE_ID_INICIAL_GLOB, access_level_str, print_table,
+                                           write_csv)
+
+# --- Configurações ---
+URL_SERVIDOR = "opc.tcp://127.0.0.1:4840"
+NODE_ID_VARIAVEL = "ns=4;s=|var|CODESYS Control Win V3 x64.Application.GVL_TRAFFIC.light_red"
+
+# Atributos lidos no modo em lote, na ordem das colunas
+BATCH_ATTRIBUTES = [
+    ("display_name", ua.AttributeIds.DisplayName),
+    ("value", ua.AttributeIds.Value),
+    ("data_type", ua.AttributeIds.DataType),
+    ("access_level", ua.AttributeIds.AccessLevel),
+    ("user_access_level", ua.AttributeIds.UserAccessLevel),
+    ("min_sampling_interval_ms", ua.AttributeIds.MinimumSamplingInterval),
+]
+
+async def read_node_attributes_safely(client, node_id):
+    """Lê e exibe os atributos padrão do nó, ignorando aqueles que falham."""
+
+    try:
+        variavel_node = client.get_node(node_id)
+        display_name = (await variavel_node.read_display_name()).Text
+        print(f"\n--- ATRIBUTOS DIAGNÓSTICO PARA O NÓ: {display_name} ---")
+        print(f"NodeID: {node_id}\n")
+
+        # 1. Nome de Exibição (Geralmente OK)
+        print(f"Nome (DisplayName): {display_name}")
+
+        # 2. Valor Atual
+        try:
+            value = await variavel_node.read_value()
+            print(f"Valor Atual: **{value}** (Tipo Python: {type(value).__name__})")
+        except Exception as e:
+            print(f"Valor Atual: N/A. FALHA: {e}")
+
+        # 3. Tipo de Dado (BrowseName do nó do tipo, não o da variável)
+        try:
+            data_type_node = await variavel_node.read_data_type()
+            data_type_name = (await client.get_node(data_type_node).read_browse_name()).Name
+            print(f"Tipo de Dado (OPC UA): {data_type_name}")
+        except Exception as e:
+            print(f"Tipo de Dado: N/A. FALHA: {e}")
+
+        # 4. Nível de Acesso (Crucial para R/W/Subscribe)
+        try:
+            access_level = await variavel_node.get_access_level()
+            print(f"Nível de Acesso (R/W/S): {access_level}")
+        except Exception as e:
+            print(f"Nível de Acesso: N/A. FALHA: {e}")
+
+        # 5. Mínimo Intervalo de Amostragem (Relevante para Subscrição)
+        try:
+            min_sampling_interval = (await variavel_node.read_attribute(ua.AttributeIds.MinimumSamplingInterval)).Value.Value
+            print(f"Min. Intervalo de Amostragem (ms): {min_sampling_interval}")
+        except Exception as e:
+            print(f"Min. Intervalo de Amostragem: N/A. FALHA: {e}")
+
+    except Exception as e:
+        print(f"🛑 Erro fatal ao obter o objeto do nó: {e}")
+
+
+# --- Modo em Lote ---
+async def _read(client, pairs):
+    """ Um ReadRequest com vários pares (NodeId, AttributeId). """
+    params = ua.ReadParameters()
+    for node_id, attribute in pairs:
+        rv = ua.ReadValueId()
+        rv.NodeId = node_id
+        rv.AttributeId = attribute
+        params.NodesToRead.append(rv)
+    return await client.uaclient.read(params)
+
+
+async def _read_many(client, pairs, batch_size):
+    try:
+        limit = await client.get_node(ua.NodeId(ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead)).read_value()
+    except Exception:
+        limit = 0
+    batch_size = min(batch_size, limit) if limit else batch_size
+    results = []
+    for i in range(0, len(pairs), batch_size):
+        results.extend(await _read(client, pairs[i:i + batch_size]))
+    return results
+
+
+async def expand_node_ids(client, patterns, start_node_id=NODE_ID_INICIAL_GLOB):
+    """
+    NodeIds literais passam direto; padrões com * ? [ são comparados (fnmatch)
+    com os NodeIds das variáveis encontradas navegando a partir de
+    start_node_id (BFS em lote de describle_opcua_server_async). Sem repetições.
+    """
+    node_ids, browsed = [], None
+    for pattern in patterns:
+        if not any(char in pattern for char in "*?["):
+            node_ids.append(pattern)
+            continue
+        if browsed is None:
+            from describle_opcua_server_async import browse_tree
+
+            tree = await browse_tree(client, start_node_id, asyncio.Semaphore(4))
+            browsed = [node_id for node_id, entry in tree.items() if entry["node_class"] == "Variable"]
+        matches = fnmatch.filter(browsed, pattern)
+        if not matches:
+            print(f"⚠️ Nenhuma variável corresponde a '{pattern}'.", file=sys.stderr)
+        node_ids.extend(matches)
+    return list(dict.fromkeys(node_ids))
+
+
+async def read_attributes_batch(client, node_ids, batch_size=BATCH_SIZE):
+    """
+    Lê os BATCH_ATTRIBUTES de todos os nós em ReadRequests de até batch_size
+    itens, mais uma leitura em lote dos BrowseNames dos tipos de dado que não
+    são do namespace 0. Atributos que falham ficam vazios e o StatusCode vai
+    para 'errors'. Retorna uma linha (dict com CSV_COLUMNS) por nó.
+    """
+    ids = [ua.NodeId.from_string(node_id) for node_id in node_ids]
+    pairs = [(node_id, attribute) for node_id in ids for _, attribute in BATCH_ATTRIBUTES]
+    results = await _read_many(client, pairs, batch_size)
+
+    rows = []
+    for i, node_id in enumerate(node_ids):
+        row = {"node_id": node_id, "errors": []}
+        for (column, _), dv in zip(BATCH_ATTRIBUTES, results[i * len(BATCH_ATTRIBUTES):(i + 1) * len(BATCH_ATTRIBUTES)]):
+            if dv.StatusCode.is_good():
+                row[column] = dv.Value.Value
+            else:
+                row[column] = None
+                row["errors"].append(f"{column}: {dv.StatusCode.name}")
+        rows.append(row)
+
+    # Nomes dos tipos de dado: namespace 0 pela tabela do SDK, os demais em uma leitura em lote
+    custom_types = list({row["data_type"] for row in rows
+                         if isinstance(row["data_type"], ua.NodeId) and row["data_type"].NamespaceIndex != 0})
+    names = {}
+    if custom_types:
+        dvs = await _read_many(client, [(t, ua.AttributeIds.BrowseName) for t in custom_types], batch_size)
+        for data_type, dv in zip(custom_types, dvs):
+            names[data_type] = dv.Value.Value.Name if dv.StatusCode.is_good() else data_type.to_string()
+
+    for row in rows:
+        data_type = row["data_type"]
+        if isinstance(data_type, ua.NodeId):
+            row["data_type"] = names.get(data_type) or ua.ObjectIdNames.get(data_type.Identifier, data_type.to_string())
+        if row["display_name"] is not None:
+            row["display_name"] = row["display_name"].Text
+        row["python_type"] = type(row["value"]).__name__ if row["value"] is not None else ""
+        for column in ("access_level", "user_access_level"):
+            if row[column] is not None:
+                row[column] = access_level_str(row[column])
+        if len(row["errors"]) == len(BATCH_ATTRIBUTES) and len({e.split(": ")[1] for e in row["errors"]}) == 1:
+            row["errors"] = [row["errors"][0].split(": ")[1]]  # Ex.: BadNodeIdUnknown em todos os atributos
+        row["errors"] = "; ".join(row["errors"])
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Diagnóstico dos atributos de variáveis OPC UA (asyncua; um nó ou em lote).")
+    parser.add_argument("nodes", nargs="*", help="NodeIds ou padrões glob (ex.: 'ns=2;s=Linha_Triagem_IIoT.IOs_*').")
+    parser.add_argument("--url", default=URL_SERVIDOR, help="Endpoint do servidor.")
+    parser.add_argument("--file", default=None, help="Arquivo com um NodeId ou padrão por linha.")
+    parser.add_argument("--start", default=NODE_ID_INICIAL_GLOB, help="Nó inicial da navegação para os padrões glob.")
+    parser.add_argument("--csv", default=None, metavar="ARQUIVO", help="Grava o resultado em CSV ('-' = stdout).")
+    args = parser.parse_args()
+
+    patterns = list(args.nodes)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            patterns.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+
+    client = Client(args.url)
+    try:
+        await client.connect()
+        if not patterns:
+            # Sem argumentos: diagnóstico detalhado do nó configurado, como antes
+            await read_node_attributes_safely(client, NODE_ID_VARIAVEL)
+            return
+        node_ids = await expand_node_ids(client, patterns, args.start)
+        rows = await read_attributes_batch(client, node_ids)
+        if args.csv:
+            write_csv(rows, args.csv)
+            if args.csv != "-":
+                print(f"📝 {len(rows)} nós gravados em {args.csv}")
+        else:
+            print_table(rows)
+            failed = sum(1 for row in rows if row["errors"])
+            print(f"\n{len(rows)} nós, {failed} com falhas de leitura.")
+    except Exception as e:
+        print(f"Erro de conexão: {e}")
+    finally:
+        await client.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())